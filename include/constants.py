@@ -36,6 +36,10 @@ CHROMA_ORG_ID = UUID("123e4567-e89b-12d3-a456-426614174027")
 FIRECRAWL_ORG_ID = UUID("123e4567-e89b-12d3-a456-426614174028")
 
 GITFILES_CACHE_DIR = f"{CACHE_DIR}/gitfiles"
+EMBEDDING_CACHE_FILE = f"{CACHE_DIR}/embeddings.sqlite3"
+EMBEDDING_CACHE_MAX_ENTRIES = 200000  # ~1.6GB of 2048-dim float32 vectors
+QUERY_EMBEDDING_CACHE_MAX_ENTRIES = 1024
+QUERY_EMBEDDING_CACHE_TTL_SECONDS = 3600  # None to keep query embeddings until evicted
 
 # Evaluation constants
 DEFAULT_TEST_TRAIN_RATIO = 0.2
@@ -45,6 +49,20 @@ EVAL_OUTPUT_FILE = "include/eval_output.csv"
 CLOSED = "closed"
 INDEX_WITH_GREPTILE = False
 GITHUB_API_BASE = "https://api.github.com"
+MAX_INDEXED_FILE_BYTES = 1_000_000  # Larger files are data or generated code, not worth embedding
+# Above this many files to fetch, download the repository archive in one request instead of
+# fetching each blob
+ARCHIVE_FETCH_MIN_FILES = 50
+INDEX_BATCH_FILES = 200  # Files chunked, embedded and upserted at a time when indexing a repository
+GITHUB_MAX_CONCURRENCY = 16  # GitHub requests in flight at once, and pooled connections kept alive
+GITHUB_MAX_RETRIES = 3  # Retries of GitHub requests failing to connect or with a 5xx
+GITHUB_RETRY_BACKOFF_SECONDS = 0.5
+# Bodies of GitHub GETs, revalidated with If-None-Match/If-Modified-Since. 304s are free of rate limit.
+GITHUB_HTTP_CACHE_FILE = f"{CACHE_DIR}/github_http.sqlite3"
+GITHUB_HTTP_CACHE_MAX_ENTRIES = 50000
+GITHUB_GRAPHQL_URL = f"{GITHUB_API_BASE}/graphql"
+GITHUB_GRAPHQL_ISSUES_PAGE_SIZE = 50  # Issues per GraphQL query, each with its first comments
+GITHUB_GRAPHQL_COMMENTS_PAGE_SIZE = 100  # GitHub's maximum page size
 
 # Prompt constants
 EVAL_AGENT_RESPONSE_PROMPT = "include/prompts/eval_agent_response.txt"
@@ -165,6 +183,45 @@ CODE_TOOL = [
     }
 ]
 
+EXECUTE_SEARCHES_TOOL = [
+    {
+        "name": "execute_searches",
+        "description": "Run several searches over the codebase, issues, documentation or web in one call. Prefer this over separate searches when looking something up from multiple angles.",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "searches": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "query": {
+                                "type": "string",
+                                "description": "A natural language query to search with",
+                            },
+                            "limit": {
+                                "type": "integer",
+                                "description": "The number of results to retrieve",
+                            },
+                            "knowledge_base": {
+                                "type": "string",
+                                "enum": ["codebase", "issues", "documentation", "web"],
+                                "description": "The knowledge base to search",
+                            },
+                            "traceback": {
+                                "type": "string",
+                                "description": "A traceback from the user, used to pull in the referenced code for codebase searches",
+                            },
+                        },
+                        "required": ["query", "limit", "knowledge_base"],
+                    },
+                },
+            },
+            "required": ["searches"],
+        },
+    }
+]
+
 EXAMPLE_CREATOR_BASE_TOOLS = (
     DOCUMENTATION_TOOL + CODE_TOOL + EXAMPLE_CREATOR_SEARCH_WEB_TOOL
 )
@@ -264,19 +321,97 @@ EXAMPLE_CREATOR_PR_TOOLS = EXAMPLE_CREATOR_BASE_TOOLS + EXAMPLE_CREATOR_RUN_CODE
 NVIDIA_EMBED = "nvidia/NV-Embed-v2"
 OPENAI_EMBED = "text-embedding-3-small"
 VOYAGE_CODE_EMBED = "voyage-code-3"
-SUPPORTED_MODELS = [NVIDIA_EMBED, OPENAI_EMBED, VOYAGE_CODE_EMBED]
+# Offline feature-hashing embedder over identifier tokens, used in DEBUG_MODE and for benchmarks
+HASHING_EMBED = "local/feature-hashing"
+SUPPORTED_MODELS = [NVIDIA_EMBED, OPENAI_EMBED, VOYAGE_CODE_EMBED, HASHING_EMBED]
 DIMENSION_OPENAI = 1536
 DIMENSION_NVIDIA = 4096
 DIMENSION_VOYAGE = 2048
 
+# Embedding batch limits, per provider. Token counts are estimated from character length.
+VOYAGE_MAX_BATCH_SIZE = 1000
+VOYAGE_MAX_BATCH_TOKENS = 120000
+OPENAI_MAX_BATCH_SIZE = 2048
+OPENAI_MAX_BATCH_TOKENS = 300000
+SENTENCE_TRANSFORMER_BATCH_SIZE = 32
+HASHING_EMBED_BATCH_SIZE = 512
+HASHING_EMBED_BIGRAM_WEIGHT = 0.5  # Weight of token bigram features, relative to single tokens
+HASHING_EMBED_TRIGRAM_WEIGHT = 0.25  # Weight of character trigram features
+CHARS_PER_TOKEN_ESTIMATE = 3
+
 # Vector DB constants
+MILVUS_BACKEND = "milvus"
+LOCAL_BACKEND = "local"
+LOCAL_VECTOR_DIR = f"{CACHE_DIR}/vectors"
+UPSERT_BATCH_SIZE = 128
+CHANGE_DETECTION_BATCH_SIZE = 1000
+QUERY_ITERATOR_BATCH_SIZE = 1000
 DOCUMENTATION = "documentation"
 RUNBOOK = "runbook"
 ISSUE = "issue"
 CODE = "code"
 
+# Vector storage modes. Each collection stores float32, float16 or int8 vectors, optionally truncated
+# to a smaller Matryoshka dimension, and optionally reranked against full-precision vectors kept in
+# a float32 companion collection of the same backend. Only applies when a collection is created.
+VECTOR_STORAGE_FLOAT32 = "float32"
+VECTOR_STORAGE_FLOAT16 = "float16"
+VECTOR_STORAGE_INT8 = "int8"
+VECTOR_STORAGE_MODES = [VECTOR_STORAGE_FLOAT32, VECTOR_STORAGE_FLOAT16, VECTOR_STORAGE_INT8]
+MATRYOSHKA_DIMENSIONS = [256, 512, 1024, 2048]
+RERANK_CANDIDATES_MULTIPLIER = 4  # Candidates fetched per result when reranking
+FULL_PRECISION_COLLECTION_SUFFIX = "_full_precision"  # Companion collection of a reranked one
+COLLECTION_VECTOR_STORAGE = {
+    ISSUE: {"mode": VECTOR_STORAGE_FLOAT32, "dimension": None, "rerank": False},
+    DOCUMENTATION: {"mode": VECTOR_STORAGE_FLOAT32, "dimension": None, "rerank": False},
+    CODE: {"mode": VECTOR_STORAGE_FLOAT32, "dimension": None, "rerank": False},
+}
+
+# org_id is the partition key of the issue, documentation and code collections, hashed into
+# ORG_NUM_PARTITIONS partitions. With isolation on, each org's rows also get their own index segments.
+ORG_NUM_PARTITIONS = 64
+ORG_PARTITION_KEY_ISOLATION = True
+
+# Lexical (BM25) code search, fused with vector search by reciprocal rank fusion
+LEXICAL_INDEX_DIR = f"{CACHE_DIR}/lexical"
+BM25_K1 = 1.2
+BM25_B = 0.75
+RRF_K = 60
+HYBRID_CANDIDATES_MULTIPLIER = 3  # Candidates fetched from each retriever per fused result
+
+# Chunking of code, documentation and issues before embedding. Chunks are cut at syntactic boundaries
+# (definitions, headings, comments), sized in tokens counted as for CONTEXT_TOKEN_ENCODING.
+CHUNK_MAX_TOKENS = 1024
+CHUNK_OVERLAP_TOKENS = 64  # Repeated from the previous chunk when a chunk is cut mid-definition
+CHUNK_MIN_FILL = 0.5  # Share of CHUNK_MAX_TOKENS a chunk must reach before it is cut at a boundary
+
+# Near-duplicate detection at ingestion. Chunks are fingerprinted with MinHash over token shingles
+# and indexed with LSH (MINHASH_BANDS bands of MINHASH_NUM_PERM / MINHASH_BANDS rows). Duplicates of a
+# stored chunk are linked to it instead of being embedded and stored again.
+DEDUP_INDEX_DIR = f"{CACHE_DIR}/dedup"
+MINHASH_NUM_PERM = 128
+MINHASH_BANDS = 16
+MINHASH_SHINGLE_SIZE = 5  # Tokens per shingle
+NEAR_DUPLICATE_THRESHOLD = 0.9  # Estimated Jaccard similarity above which chunks are duplicates
+
+# Tenant snapshots: an org's rows exported as a manifest plus compressed NPZ parts, restored with
+# batched inserts and no embedding calls
+SNAPSHOT_VERSION = 1
+SNAPSHOT_COLLECTIONS = [ISSUE, DOCUMENTATION, CODE]
+SNAPSHOT_PART_ROWS = 10000  # Rows per NPZ part
+SNAPSHOT_INSERT_BATCH_SIZE = 1000  # Rows per insert when restoring
+SNAPSHOT_IMPORT_WORKERS = 4  # Concurrent inserts when restoring
+
+# Packing knowledge base hits into tool results. Token counts use CONTEXT_TOKEN_ENCODING when it can
+# be loaded, and CHARS_PER_TOKEN_ESTIMATE otherwise.
+CONTEXT_TOKEN_ENCODING = "cl100k_base"
+CONTEXT_TOKEN_BUDGET = 6000  # Tokens of hit content per knowledge base search
+CONTEXT_MAX_HIT_TOKENS = 1500  # Tokens of a single hit, trimmed to the lines around the query terms
+CONTEXT_DUPLICATE_LINE_RATIO = 0.8  # Hits whose lines were mostly already packed are dropped
+
 # Poll constants
 POLL_INTERVAL = 10
+POLL_CURSOR_DIR = f"{CACHE_DIR}/poll"  # Per-repo issue sync cursors, so restarts resume polling
 BUG_LABELS = ["bug", "question"]
 ABHIGYA_USERNAME = "AbhigyaWangoo"
 CIRROE_USERNAME = "Cirr0e"
@@ -1,6 +1,4 @@
 from fastapi import FastAPI, Request, HTTPException
-from scripts.firecrawl_demo import get_pr_feedback_handler
-from scripts.firecrawl_demo import main
 from pydantic import BaseModel
 import traceback
 import logging
@@ -54,6 +52,9 @@ async def handle_pr_changes_webhook(request: Request):
 
         if payload["action"] in ACTIONS and "pull_request" in payload:
 
+            # Imported here since the handler pulls in every integration; the app itself starts without them
+            from scripts.firecrawl_demo import get_pr_feedback_handler
+
             # Add logic to handle comments on specific spots
             handler = get_pr_feedback_handler()
             response = handler.handle_pr_feedback(payload)
@@ -72,5 +73,7 @@ async def handle_pr_changes_webhook(request: Request):
 
 
 if __name__ == "__main__":
+    from scripts.firecrawl_demo import main
+
     main()
     # uvicorn.run(app, host="0.0.0.0", port=8000)
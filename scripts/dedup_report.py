@@ -0,0 +1,61 @@
+"""
+Reports how many ingested chunks were stored and how many were linked to an exact or near duplicate,
+per org, collection and source (repository or documentation site), from the persisted dedup indexes.
+
+    python -m scripts.dedup_report
+    python -m scripts.dedup_report --org 90a11a74-cfcf-4988-b97a-c4ab21edd0a1 --output dedup.json
+"""
+
+from include.constants import DEDUP_INDEX_DIR
+from src.storage.dedup import DedupIndex
+from typing import Dict
+import argparse
+import json
+import os
+
+
+def collect_reports(org_id: str = None) -> Dict[str, Dict[str, Dict[str, dict]]]:
+    """
+    Get the dedup report of every persisted index, as {org: {collection: {source: counts}}}.
+    """
+    reports = {}
+    if not os.path.isdir(DEDUP_INDEX_DIR):
+        return reports
+
+    orgs = [org_id] if org_id is not None else sorted(os.listdir(DEDUP_INDEX_DIR))
+    for org in orgs:
+        org_dir = os.path.join(DEDUP_INDEX_DIR, org)
+        if not os.path.isdir(org_dir):
+            continue
+
+        for collection_name in sorted(os.listdir(org_dir)):
+            index = DedupIndex(os.path.join(org_dir, collection_name))
+            reports.setdefault(org, {})[collection_name] = index.report()
+
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--org", help="Only report this org")
+    parser.add_argument("--output", help="Write the report as JSON to this file")
+    args = parser.parse_args()
+
+    reports = collect_reports(args.org)
+    for org, collections in reports.items():
+        print(org)
+        for collection_name, sources in collections.items():
+            for source, counts in sorted(sources.items()):
+                print(
+                    f"  {collection_name:<14} {source:<50} chunks={counts['chunks']:<7} "
+                    f"stored={counts['stored']:<7} exact={counts['exact']:<6} "
+                    f"near={counts['near']:<6} dedup_ratio={counts['dedup_ratio']:.1%}"
+                )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
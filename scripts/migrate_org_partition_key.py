@@ -0,0 +1,137 @@
+"""
+Moves the issue, documentation and code collections created before org_id was their partition key
+into partitioned copies. For each collection, a copy with the same schema, org_id as partition key
+and TENANT_COLLECTION_OPTIONS is created, every row is streamed into it, and the two are swapped
+by renaming. The original is kept as {collection}_legacy unless --drop-legacy is passed.
+
+Pause ingestion while this runs, rows written to a collection mid-copy may be missed.
+
+    python -m scripts.migrate_org_partition_key
+    python -m scripts.migrate_org_partition_key code --drop-legacy
+"""
+
+from include.constants import (
+    ISSUE,
+    DOCUMENTATION,
+    CODE,
+    QUERY_ITERATOR_BATCH_SIZE,
+    UPSERT_BATCH_SIZE,
+)
+from src.storage.vector import VectorDB, TENANT_COLLECTION_OPTIONS
+from typing import Any, Dict, List
+from uuid import UUID
+import argparse
+import logging
+
+logging.basicConfig(level=logging.INFO)
+
+# Any org works: the migration only uses the vector db's schema and index helpers.
+MIGRATION_ORG_ID = UUID(int=0)
+
+
+def is_partitioned(description: Dict[str, Any]) -> bool:
+    return any(
+        field["name"] == "org_id" and field.get("is_partition_key")
+        for field in description["fields"]
+    )
+
+
+def count_rows(client: Any, collection_name: str) -> int:
+    return client.query(collection_name, filter="", output_fields=["count(*)"])[0][
+        "count(*)"
+    ]
+
+
+def copy_rows(client: Any, source: str, target: str, field_names: List[str]) -> int:
+    """
+    Stream every row of source into target, UPSERT_BATCH_SIZE rows per upsert.
+    """
+    iterator = client.query_iterator(
+        collection_name=source,
+        batch_size=QUERY_ITERATOR_BATCH_SIZE,
+        filter="",
+        output_fields=field_names,
+    )
+
+    copied = 0
+    try:
+        while True:
+            rows = iterator.next()
+            if not rows:
+                break
+
+            for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+                client.upsert(target, data=rows[start : start + UPSERT_BATCH_SIZE])
+
+            copied += len(rows)
+            logging.info(f"Copied {copied} rows from {source} to {target}")
+    finally:
+        iterator.close()
+
+    return copied
+
+
+def migrate_collection(vector_db: VectorDB, collection_name: str, drop_legacy: bool):
+    from pymilvus import CollectionSchema
+
+    client = vector_db.client
+    description = client.describe_collection(collection_name)
+    if is_partitioned(description):
+        logging.info(f"{collection_name} is already partitioned by org_id, skipping")
+        return
+
+    target = f"{collection_name}_partitioned"
+    legacy = f"{collection_name}_legacy"
+
+    if not client.has_collection(target):
+        schema = description.copy()
+        schema["fields"] = [
+            {**field, "is_partition_key": True} if field["name"] == "org_id" else field
+            for field in description["fields"]
+        ]
+        client.create_collection(
+            target,
+            schema=CollectionSchema.construct_from_dict(schema),
+            **TENANT_COLLECTION_OPTIONS,
+        )
+        client.create_index(
+            target,
+            vector_db.vector_index_params(vector_db.vector_storage(collection_name)),
+        )
+    client.load_collection(target)
+
+    field_names = [field["name"] for field in description["fields"]]
+    copied = copy_rows(client, collection_name, target, field_names)
+
+    expected, actual = count_rows(client, collection_name), count_rows(client, target)
+    if actual < expected:
+        raise RuntimeError(
+            f"{target} has {actual} rows but {collection_name} has {expected}, not swapping"
+        )
+
+    client.release_collection(collection_name)
+    client.rename_collection(collection_name, legacy)
+    client.rename_collection(target, collection_name)
+    client.load_collection(collection_name)
+    logging.info(f"Migrated {copied} rows of {collection_name}, original kept as {legacy}")
+
+    if drop_legacy:
+        client.drop_collection(legacy)
+        logging.info(f"Dropped {legacy}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "collections", nargs="*", default=[ISSUE, DOCUMENTATION, CODE]
+    )
+    parser.add_argument("--drop-legacy", action="store_true")
+    args = parser.parse_args()
+
+    vector_db = VectorDB(MIGRATION_ORG_ID)
+    for collection_name in args.collections:
+        migrate_collection(vector_db, collection_name, args.drop_legacy)
+
+
+if __name__ == "__main__":
+    main()
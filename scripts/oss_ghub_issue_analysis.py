@@ -37,7 +37,9 @@ def analyze_github_issues(org_id: UUID) -> Dict:
     repo_name = data["repo_name"]
 
     github = GithubKnowledgeBase(org_id, org_name)
-    issues = github.get_all_issues_json(repo_name, state="closed", fetch_comments=False)
+    issues = github.get_all_issues_graphql(
+        repo_name, state="closed", fetch_comments=False
+    )
 
     time_deltas = []
     completion_times = {}
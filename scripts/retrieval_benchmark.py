@@ -0,0 +1,397 @@
+"""
+Measures issue retrieval quality and latency over the cached {repo}_closed_issues.json datasets the
+eval Orchestrator writes to CACHE_DIR, without any LLM calls.
+
+Each closed issue is indexed without its title, and two query sets are derived from the titles:
+    known_item: the title of an issue, whose relevant document is that issue
+    linked: the title of an issue, whose relevant documents are the other issues of the dataset
+        it references as #number in its body or comments
+
+For every configuration (chunk size in tokens, vector storage, k, vector or hybrid retrieval) recall@k, MRR
+and p50/p95 search latency are reported, and written as JSON that a later run can be compared
+against with --baseline. Storage modes other than the collection's own only apply to the local
+backend, where each configuration gets fresh in-memory collections. Pass --model local/feature-hashing
+(or set DEBUG_MODE) to run offline.
+
+    python -m scripts.retrieval_benchmark --output include/retrieval_baseline.json
+    python -m scripts.retrieval_benchmark --storage float32 int8 int8+rerank --chunk-sizes 512 1024
+    python -m scripts.retrieval_benchmark --baseline include/retrieval_baseline.json
+"""
+
+from include.constants import (
+    CACHE_DIR,
+    CHUNK_MAX_TOKENS,
+    ISSUE,
+    LOCAL_BACKEND,
+    MILVUS_BACKEND,
+    VOYAGE_CODE_EMBED,
+    DIMENSION_VOYAGE,
+    HYBRID_CANDIDATES_MULTIPLIER,
+)
+from src.storage.vector import VectorDB, VectorStorage, use_isolated_local_backend
+from src.storage.lexical import LexicalIndex, reciprocal_rank_fusion
+from src.storage.chunker import Chunker
+from src.model.issue import Issue, Comment
+from typing import Any, Dict, List, Optional, Set, Tuple
+from datetime import datetime, timezone
+from uuid import UUID, uuid4
+import numpy as np
+import argparse
+import logging
+import random
+import glob
+import json
+import time
+import sys
+import os
+import re
+
+logging.basicConfig(level=logging.WARNING)
+
+ISSUE_REFERENCE_PATTERN = re.compile(r"(?<![\w/])#(\d+)\b")
+KNOWN_ITEM = "known_item"
+LINKED = "linked"
+VECTOR = "vector"
+HYBRID = "hybrid"
+# Keys identifying the same configuration across runs
+CONFIG_KEYS = ["dataset", "query_set", "chunk_size", "storage", "k", "retriever"]
+METRICS = ["recall", "mrr", "p50_ms", "p95_ms"]
+
+
+def load_dataset(
+    file: str, max_issues: Optional[int], seed: int
+) -> List[Dict[str, Any]]:
+    """
+    Load the issues of a cached dataset that have a title and a body, sampling max_issues of them.
+    """
+    with open(file, "r", encoding="utf8") as fp:
+        issues = [
+            issue
+            for issue in json.load(fp)
+            if issue.get("title") and issue.get("body")
+        ]
+
+    if max_issues is not None and len(issues) > max_issues:
+        issues = random.Random(seed).sample(issues, max_issues)
+
+    return issues
+
+
+def issue_text(issue: Dict[str, Any]) -> str:
+    comments = [comment.get("body") or "" for comment in issue.get("comments", [])]
+    return " ".join([issue["body"]] + comments)
+
+
+def to_issue(issue: Dict[str, Any], org_id: UUID) -> Issue:
+    """
+    The Issue to index for a cached issue, without its title, which is the query.
+    """
+    return Issue(
+        primary_key=str(issue["id"]),
+        description=issue["body"],
+        comments=[
+            Comment(
+                requestor_name=comment["user"]["login"],
+                comment=comment.get("body") or "",
+            )
+            for comment in issue.get("comments", [])
+        ],
+        org_id=org_id,
+        ticket_number=str(issue["number"]),
+    )
+
+
+def derive_queries(
+    issues: List[Dict[str, Any]]
+) -> Dict[str, List[Tuple[str, Set[str]]]]:
+    """
+    Get the (query, relevant issue primary keys) pairs of each query set.
+    """
+    keys_by_number = {str(issue["number"]): str(issue["id"]) for issue in issues}
+
+    queries: Dict[str, List[Tuple[str, Set[str]]]] = {KNOWN_ITEM: [], LINKED: []}
+    for issue in issues:
+        key = str(issue["id"])
+        queries[KNOWN_ITEM].append((issue["title"], {key}))
+
+        linked = {
+            keys_by_number[number]
+            for number in ISSUE_REFERENCE_PATTERN.findall(issue_text(issue))
+            if number in keys_by_number
+        } - {key}
+        if linked:
+            queries[LINKED].append((issue["title"], linked))
+
+    return queries
+
+
+def parse_storage(spec: str) -> Optional[VectorStorage]:
+    """
+    Parse a storage spec like float32, int8:512 or float16+rerank. "default" keeps the collection's.
+    """
+    if spec == "default":
+        return None
+
+    rerank = spec.endswith("+rerank")
+    mode, _, dimension = spec.removesuffix("+rerank").partition(":")
+    return VectorStorage(
+        mode=mode, dimension=int(dimension) if dimension else None, rerank=rerank
+    )
+
+
+def chunk_issue_key(chunk_key: str) -> str:
+    """
+    The primary key of the issue a chunk belongs to, see VectorDB.add_issues.
+    """
+    return chunk_key.rsplit("-", 1)[0]
+
+
+def rank_issues(chunk_keys: List[str], k: int) -> List[str]:
+    """
+    Collapse ranked chunk keys into the first k distinct issues.
+    """
+    return list(dict.fromkeys(chunk_issue_key(key) for key in chunk_keys))[:k]
+
+
+def score(ranked: List[str], relevant: Set[str]) -> Tuple[float, float]:
+    """
+    The recall and reciprocal rank of a ranking.
+    """
+    recall = len(relevant.intersection(ranked)) / len(relevant)
+    rank = next((i for i, key in enumerate(ranked) if key in relevant), None)
+    return recall, 1 / (rank + 1) if rank is not None else 0.0
+
+
+def evaluate(
+    vector_db: VectorDB,
+    lexical_index: Optional[LexicalIndex],
+    queries: List[Tuple[str, Set[str]]],
+    query_vectors: List[List[float]],
+    k: int,
+) -> Dict[str, float]:
+    """
+    Run the queries one at a time, timing each search, and aggregate recall@k, MRR and latency.
+    Hybrid retrieval fuses the vector and BM25 rankings of HYBRID_CANDIDATES_MULTIPLIER * k issues.
+    """
+    recalls, reciprocal_ranks, latencies = [], [], []
+    candidates = k * HYBRID_CANDIDATES_MULTIPLIER if lexical_index is not None else k
+    for (query, relevant), query_vector in zip(queries, query_vectors):
+        start = time.perf_counter()
+        # Long issues have several chunks, so more chunks than issues are asked for
+        hits = vector_db.search_many([(ISSUE, query_vector, candidates * 2, None)])[0]
+        ranked = rank_issues(list(hits), candidates)
+        if lexical_index is not None:
+            fused = reciprocal_rank_fusion(
+                [ranked, [key for key, _ in lexical_index.search(query, candidates)]]
+            )
+            ranked = [key for key, _ in fused]
+        ranked = ranked[:k]
+        latencies.append((time.perf_counter() - start) * 1000)
+
+        recall, reciprocal_rank = score(ranked, relevant)
+        recalls.append(recall)
+        reciprocal_ranks.append(reciprocal_rank)
+
+    return {
+        "queries": len(queries),
+        "recall": round(float(np.mean(recalls)), 4),
+        "mrr": round(float(np.mean(reciprocal_ranks)), 4),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+    }
+
+
+def benchmark_dataset(
+    dataset: str,
+    issues: List[Dict[str, Any]],
+    args: argparse.Namespace,
+) -> List[Dict[str, Any]]:
+    """
+    Index a dataset once per chunk size and storage, and evaluate every k and retriever on it.
+    """
+    queries = derive_queries(issues)
+    results = []
+    for chunk_size in args.chunk_sizes:
+        for storage_spec in args.storage:
+            storage = parse_storage(storage_spec)
+            if args.backend == LOCAL_BACKEND:
+                use_isolated_local_backend()
+            elif storage is not None:
+                logging.warning(
+                    f"Storage can't be changed on {MILVUS_BACKEND}, using the collection's for {storage_spec}"
+                )
+
+            # A throwaway org, so that the benchmark's rows never mix with real ones
+            vector_db = VectorDB(uuid4(), args.model, args.dimension, args.backend)
+            vector_db.chunker = Chunker(max_tokens=chunk_size)
+            vector_db.ensure_collection(ISSUE, storage)
+
+            start = time.perf_counter()
+            indexed = [to_issue(issue, vector_db.user_id) for issue in issues]
+            vector_db.add_issues(indexed)
+            index_seconds = time.perf_counter() - start
+
+            lexical_index = LexicalIndex()
+            lexical_index.update(
+                {str(issue["id"]): issue_text(issue) for issue in issues}
+            )
+
+            try:
+                for query_set, set_queries in queries.items():
+                    if not set_queries:
+                        continue
+
+                    query_vectors = vector_db.embed_queries(
+                        [query for query, _ in set_queries]
+                    )
+                    for k in args.ks:
+                        for retriever in args.retrievers:
+                            metrics = evaluate(
+                                vector_db,
+                                lexical_index if retriever == HYBRID else None,
+                                set_queries,
+                                query_vectors,
+                                k,
+                            )
+                            results.append(
+                                {
+                                    "dataset": dataset,
+                                    "query_set": query_set,
+                                    "chunk_size": chunk_size,
+                                    "storage": storage_spec,
+                                    "k": k,
+                                    "retriever": retriever,
+                                    "index_seconds": round(index_seconds, 2),
+                                    **metrics,
+                                }
+                            )
+                            print(format_result(results[-1]))
+            finally:
+                if args.backend == MILVUS_BACKEND:
+                    vector_db.client.delete(ISSUE, filter=vector_db.org_filter())
+
+    return results
+
+
+def format_result(
+    result: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None
+) -> str:
+    line = (
+        f"{result['dataset']:<24} {result['query_set']:<10} chunk={result['chunk_size']:<6} "
+        f"{result['storage']:<14} k={result['k']:<3} {result['retriever']:<7} "
+        f"recall={result['recall']:.3f} mrr={result['mrr']:.3f} "
+        f"p50={result['p50_ms']:.1f}ms p95={result['p95_ms']:.1f}ms"
+    )
+    if baseline is not None:
+        line += " | " + " ".join(
+            f"{metric}{result[metric] - baseline[metric]:+.3f}" for metric in METRICS
+        )
+    return line
+
+
+def compare(
+    results: List[Dict[str, Any]], baseline_file: str, tolerance: float
+) -> List[Dict[str, Any]]:
+    """
+    Print each result against the baseline result of the same configuration.
+
+    Returns:
+        List[Dict[str, Any]]: The results whose recall or MRR dropped by more than tolerance
+    """
+    with open(baseline_file, "r", encoding="utf8") as fp:
+        baseline = {
+            tuple(result[key] for key in CONFIG_KEYS): result
+            for result in json.load(fp)["results"]
+        }
+
+    regressions = []
+    print(f"\nCompared to {baseline_file}:")
+    for result in results:
+        previous = baseline.get(tuple(result[key] for key in CONFIG_KEYS))
+        if previous is None:
+            print(f"{format_result(result)} | new")
+            continue
+
+        print(format_result(result, previous))
+        if any(
+            result[metric] < previous[metric] - tolerance for metric in ["recall", "mrr"]
+        ):
+            regressions.append(result)
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--datasets",
+        nargs="*",
+        default=sorted(glob.glob(os.path.join(CACHE_DIR, "*_closed_issues.json"))),
+    )
+    parser.add_argument("--max-issues", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--model", default=VOYAGE_CODE_EMBED)
+    parser.add_argument("--dimension", type=int, default=DIMENSION_VOYAGE)
+    parser.add_argument(
+        "--backend", choices=[LOCAL_BACKEND, MILVUS_BACKEND], default=LOCAL_BACKEND
+    )
+    parser.add_argument(
+        "--chunk-sizes", nargs="+", type=int, default=[CHUNK_MAX_TOKENS]
+    )
+    parser.add_argument(
+        "--storage",
+        nargs="+",
+        default=["default"],
+        help="Storage specs like float32, int8:512 or float16+rerank",
+    )
+    parser.add_argument("--ks", nargs="+", type=int, default=[5, 10])
+    parser.add_argument(
+        "--retrievers", nargs="+", choices=[VECTOR, HYBRID], default=[VECTOR, HYBRID]
+    )
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument(
+        "--baseline", help="Compare the results to those of an earlier --output"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.01,
+        help="Recall or MRR drop from the baseline above which the run fails",
+    )
+    args = parser.parse_args()
+
+    if not args.datasets:
+        sys.exit(
+            f"No cached *_closed_issues.json datasets in {CACHE_DIR}, run the eval Orchestrator first"
+        )
+
+    results = []
+    for file in args.datasets:
+        dataset = os.path.basename(file).removesuffix("_closed_issues.json")
+        issues = load_dataset(file, args.max_issues, args.seed)
+        results.extend(benchmark_dataset(dataset, issues, args))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf8") as fp:
+            json.dump(
+                {
+                    "created_at": datetime.now(timezone.utc).isoformat(),
+                    "model": args.model,
+                    "backend": args.backend,
+                    "max_issues": args.max_issues,
+                    "results": results,
+                },
+                fp,
+                indent=2,
+            )
+
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.tolerance)
+        if regressions:
+            sys.exit(
+                f"{len(regressions)} configurations regressed beyond {args.tolerance}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Measures how long our entry points take to import, using python's -X importtime.
+Each module is imported in a fresh interpreter, and the slowest imports under it are reported.
+
+    python -m scripts.startup_benchmark
+    python -m scripts.startup_benchmark src.core.event.poll --top 30
+"""
+
+from typing import List, Tuple
+import subprocess
+import argparse
+import sys
+import os
+
+ENTRY_MODULES = [
+    "main",
+    "scripts.firecrawl_demo",
+    "src.core.event.poll",
+    "src.core.tools",
+    "src.storage.vector",
+]
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """
+    Parse -X importtime output into (module, self us, cumulative us), indented by import depth.
+    """
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        modules.append((name.rstrip(), int(self_us), int(cumulative_us)))
+
+    return modules
+
+
+def benchmark_module(module: str) -> List[Tuple[str, int, int]]:
+    """
+    Import a module in a fresh interpreter and get its import times.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        last_line = result.stderr.strip().splitlines()[-1]
+        print(f"{module}: import failed ({last_line})")
+
+    return parse_importtime(result.stderr)
+
+
+def report(module: str, modules: List[Tuple[str, int, int]], top: int):
+    """
+    Print the total import time of a module, and its slowest imports by cumulative time.
+    """
+    total_us = sum(self_us for _, self_us, _ in modules)
+    print(f"\n{module}: {total_us / 1e6:.3f}s total, {len(modules)} modules")
+
+    for name, self_us, cumulative_us in sorted(
+        modules, key=lambda row: row[2], reverse=True
+    )[:top]:
+        print(
+            f"  {cumulative_us / 1e3:>10.1f}ms cumulative {self_us / 1e3:>9.1f}ms self  {name.strip()}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("modules", nargs="*", default=ENTRY_MODULES)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    for module in args.modules:
+        report(module, benchmark_module(module), args.top)
+
+
+if __name__ == "__main__":
+    main()
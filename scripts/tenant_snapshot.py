@@ -0,0 +1,43 @@
+"""
+Exports an org's issue, documentation and code rows (vectors included) to a snapshot directory, or
+restores one into an org without embedding anything, see VectorDB.export_snapshot.
+
+    python -m scripts.tenant_snapshot export <org_id> snapshots/acme
+    python -m scripts.tenant_snapshot import <org_id> snapshots/acme --collections code
+"""
+
+from include.constants import MILVUS_BACKEND, LOCAL_BACKEND
+from src.storage.vector import get_vector_db
+from uuid import UUID
+import argparse
+import logging
+import time
+
+logging.basicConfig(level=logging.INFO)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("action", choices=["export", "import"])
+    parser.add_argument("org_id", type=UUID)
+    parser.add_argument("path")
+    parser.add_argument("--collections", nargs="*")
+    parser.add_argument(
+        "--backend", choices=[MILVUS_BACKEND, LOCAL_BACKEND], default=MILVUS_BACKEND
+    )
+    args = parser.parse_args()
+
+    vector_db = get_vector_db(args.org_id, backend=args.backend)
+    start = time.perf_counter()
+    if args.action == "export":
+        counts = vector_db.export_snapshot(args.path, args.collections)
+    else:
+        counts = vector_db.import_snapshot(args.path, args.collections)
+
+    for collection_name, rows in counts.items():
+        print(f"{args.action}ed {rows} rows of {collection_name}")
+    print(f"Took {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
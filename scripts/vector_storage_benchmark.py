@@ -0,0 +1,188 @@
+"""
+Reports the recall and memory trade-off of each vector storage mode (float32/float16/int8, Matryoshka
+truncation, full-precision rerank) against exact float32 search.
+
+Uses the real embeddings in the persistent embedding cache when there are enough of them, and
+synthetic vectors with a decaying spectrum otherwise (only indicative for truncation).
+
+    python -m scripts.vector_storage_benchmark --corpus 20000 --queries 200 --k 10
+"""
+
+from include.constants import (
+    EMBEDDING_CACHE_FILE,
+    DIMENSION_VOYAGE,
+    VOYAGE_CODE_EMBED,
+    RERANK_CANDIDATES_MULTIPLIER,
+    VECTOR_STORAGE_FLOAT32,
+    VECTOR_STORAGE_FLOAT16,
+    VECTOR_STORAGE_INT8,
+)
+from src.storage.vector import VectorStorage, to_stored_vectors, rerank_hits
+from typing import List, Optional, Tuple
+from array import array
+import numpy as np
+import argparse
+import sqlite3
+import json
+import os
+
+STORAGE_CONFIGS = [
+    VectorStorage(mode=VECTOR_STORAGE_FLOAT32),
+    VectorStorage(mode=VECTOR_STORAGE_FLOAT16),
+    VectorStorage(mode=VECTOR_STORAGE_INT8),
+    VectorStorage(mode=VECTOR_STORAGE_INT8, rerank=True),
+    VectorStorage(mode=VECTOR_STORAGE_FLOAT32, dimension=1024),
+    VectorStorage(mode=VECTOR_STORAGE_FLOAT16, dimension=1024),
+    VectorStorage(mode=VECTOR_STORAGE_FLOAT16, dimension=512, rerank=True),
+    VectorStorage(mode=VECTOR_STORAGE_INT8, dimension=512),
+    VectorStorage(mode=VECTOR_STORAGE_INT8, dimension=256, rerank=True),
+]
+
+BYTES_PER_VALUE = {
+    VECTOR_STORAGE_FLOAT32: 4,
+    VECTOR_STORAGE_FLOAT16: 2,
+    VECTOR_STORAGE_INT8: 1,
+}
+
+
+def load_cached_embeddings(limit: int, dimension: int) -> Optional[np.ndarray]:
+    """
+    Load up to limit document embeddings of the default model from the persistent embedding cache.
+    """
+    if not os.path.exists(EMBEDDING_CACHE_FILE):
+        return None
+
+    conn = sqlite3.connect(EMBEDDING_CACHE_FILE)
+    rows = conn.execute(
+        "SELECT vector FROM embeddings WHERE model = ? AND dimension = ? AND input_type = '' LIMIT ?",
+        (VOYAGE_CODE_EMBED, dimension, limit),
+    ).fetchall()
+    conn.close()
+
+    vectors = []
+    for (blob,) in rows:
+        vector = array("f")
+        vector.frombytes(blob)
+        vectors.append(vector)
+
+    return np.asarray(vectors, dtype=np.float32) if vectors else None
+
+
+def synthetic_embeddings(n: int, dimension: int, seed: int = 0) -> np.ndarray:
+    """
+    Clustered vectors whose variance decays along the dimensions, like Matryoshka embeddings.
+    """
+    rng = np.random.default_rng(seed)
+    scale = 1 / np.sqrt(1 + np.arange(dimension) / 64)
+    centers = rng.standard_normal((max(n // 50, 1), dimension)) * scale
+    noise = rng.standard_normal((n, dimension)) * scale * 0.6
+    return (centers[rng.integers(0, len(centers), n)] + noise).astype(np.float32)
+
+
+def top_k(
+    corpus: np.ndarray, queries: np.ndarray, k: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Exact cosine top-k ids of each query, best first, and the scores of every query against the
+    whole corpus.
+    """
+    corpus = corpus.astype(np.float32)
+    queries = queries.astype(np.float32)
+    corpus = corpus / np.maximum(np.linalg.norm(corpus, axis=1, keepdims=True), 1e-12)
+    queries = queries / np.maximum(
+        np.linalg.norm(queries, axis=1, keepdims=True), 1e-12
+    )
+    scores = queries @ corpus.T
+
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.take_along_axis(scores, top, axis=1).argsort(axis=1)[:, ::-1]
+    return np.take_along_axis(top, order, axis=1), scores
+
+
+def benchmark(
+    corpus: np.ndarray, queries: np.ndarray, k: int, storage: VectorStorage
+) -> dict:
+    """
+    Measure recall@k of a storage mode against exact float32 search, and its memory footprint.
+    """
+    truth, _ = top_k(corpus, queries, k)
+
+    candidates = k * RERANK_CANDIDATES_MULTIPLIER if storage.rerank else k
+    found, scores = top_k(
+        to_stored_vectors(corpus, storage),
+        to_stored_vectors(queries, storage),
+        candidates,
+    )
+
+    if storage.rerank:
+        reranked = []
+        for query, ids, query_scores in zip(queries, found, scores):
+            hits = [{"id": int(i), "distance": float(query_scores[i])} for i in ids]
+            full_vectors = {int(i): corpus[i] for i in ids}
+            reranked.append(
+                [hit["id"] for hit in rerank_hits(hits, query, full_vectors, k)]
+            )
+        found = np.asarray(reranked)
+
+    recall = np.mean(
+        [len(set(t.tolist()) & set(f.tolist())) / k for t, f in zip(truth, found)]
+    )
+    dimension = storage.dimension or corpus.shape[1]
+    bytes_per_vector = dimension * BYTES_PER_VALUE[storage.mode]
+
+    return {
+        "mode": storage.mode,
+        "dimension": dimension,
+        "rerank": storage.rerank,
+        f"recall@{k}": round(float(recall), 4),
+        "milvus_bytes_per_vector": bytes_per_vector,
+        "milvus_mb": round(bytes_per_vector * len(corpus) / 2**20, 2),
+        "full_precision_mb": (
+            round(corpus.shape[1] * 4 * len(corpus) / 2**20, 2)
+            if storage.rerank
+            else 0
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--corpus", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--dimension", type=int, default=DIMENSION_VOYAGE)
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    vectors = load_cached_embeddings(args.corpus + args.queries, args.dimension)
+    if vectors is None or len(vectors) < 2 * args.queries:
+        print("Not enough cached embeddings, using synthetic vectors")
+        vectors = synthetic_embeddings(args.corpus + args.queries, args.dimension)
+
+    # Queries are held-out vectors with a little noise, so their neighbours are realistic
+    rng = np.random.default_rng(1)
+    queries = vectors[: args.queries]
+    queries = queries + rng.standard_normal(queries.shape).astype(np.float32) * (
+        np.abs(queries).mean() * 0.5
+    )
+    corpus = vectors[args.queries :]
+
+    results: List[dict] = [
+        benchmark(corpus, queries, args.k, storage) for storage in STORAGE_CONFIGS
+    ]
+
+    print(f"{len(corpus)} vectors, {len(queries)} queries")
+    for result in results:
+        print(
+            f"{result['mode']:>8} dim={result['dimension']:<5} rerank={str(result['rerank']):<5} "
+            f"recall@{args.k}={result[f'recall@{args.k}']:.3f} "
+            f"milvus={result['milvus_mb']}MB full_precision={result['full_precision_mb']}MB"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,19 +5,21 @@
 
 from include.constants import (
     POLL_INTERVAL,
+    POLL_CURSOR_DIR,
     BUG_LABELS,
     REQUIRES_DEV_TEAM_PROMPT,
     CIRROE_USERNAME,
     ABHIGYA_USERNAME,
 )
 from src.integrations.kbs.github_kb import GithubKnowledgeBase, Repository
+from src.integrations.kbs.github_http import github_cache_stats
 from src.core.event.tool_actions.handle_issue import HandleIssue
 from src.model.issue import Issue, OpenIssueRequest
 from include.finetune import DatasetCollector
-from datetime import datetime, timedelta
+from datetime import datetime, timezone
 from src.storage.supa import SupaClient
-from cerebras.cloud.sdk import Cerebras
-from typing import List, Optional
+from pydantic import BaseModel
+from typing import Any, Dict, List, Optional
 from uuid import UUID
 import requests
 import logging
@@ -26,47 +28,104 @@ import json
 import time
 import os
 
-cerebras_client = Cerebras(api_key=os.getenv("CEREBRAS_API_KEY"))
 disc_token = os.getenv("DISCORD_TOKEN")
-dataset_collector = DatasetCollector()
 
+# Clients are built on first use rather than at import, so importing this module stays cheap and
+# doesn't require every API key to be set.
+_cerebras_client = None
+_dataset_collector = None
 
-def get_issues_created_or_updated_recently(
-    repo_name: str, github_kb: GithubKnowledgeBase
-) -> List[Issue]:
+
+def get_cerebras_client() -> Any:
+    """
+    Get the shared Cerebras client, creating it on first use.
+    """
+    global _cerebras_client
+    if _cerebras_client is None:
+        from cerebras.cloud.sdk import Cerebras
+
+        _cerebras_client = Cerebras(api_key=os.getenv("CEREBRAS_API_KEY"))
+
+    return _cerebras_client
+
+
+def get_dataset_collector() -> DatasetCollector:
+    """
+    Get the shared finetuning dataset collector, creating it on first use.
+    """
+    global _dataset_collector
+    if _dataset_collector is None:
+        _dataset_collector = DatasetCollector()
+
+    return _dataset_collector
+
+
+class IssueSyncCursor(BaseModel):
+    """
+    How far polling a repository's issues got, persisted so that restarts resume from it rather
+    than handling every open issue again.
+    """
+
+    since: str  # updated_at of the most recently updated issue handled, e.g. 2024-01-01T00:00:00Z
+    # Numbers of the handled issues updated at exactly `since`, which GitHub's since filter
+    # includes, so they aren't handled again
+    seen: List[int] = []
+
+    def advance(self, issues: List[Dict[str, Any]]):
+        """
+        Move the cursor past handled issues.
+        """
+        for issue in issues:
+            if issue["updated_at"] > self.since:
+                self.since, self.seen = issue["updated_at"], [issue["number"]]
+            elif issue["updated_at"] == self.since and issue["number"] not in self.seen:
+                self.seen.append(issue["number"])
+
+
+def issue_cursor_path(org_id: UUID, repo_name: str) -> str:
     """
-    Get all issues created in the last POLL_INTERVAL seconds in the provided repo.
+    Path of the issue sync cursor of an org's repository.
     """
-    # Get all issues from repo
-    issues = github_kb.get_all_issues_json(repo_name, state="open")
+    return os.path.join(POLL_CURSOR_DIR, str(org_id), f"{repo_name}.json")
 
-    # Get current time in seconds
-    current_time = datetime.now()
 
-    # Convert POLL_INTERVAL to a timedelta
-    poll_interval_timedelta = timedelta(seconds=POLL_INTERVAL)
+def load_issue_cursor(org_id: UUID, repo_name: str) -> Optional[IssueSyncCursor]:
+    """
+    Load the issue sync cursor of a repository, or None if it was never polled.
+    """
+    path = issue_cursor_path(org_id, repo_name)
+    if not os.path.exists(path):
+        return None
 
-    # Filter to only issues created/updated in last POLL_INTERVAL seconds
-    recent_issues = []
-    for issue in issues:
-        # Convert issue timestamps to seconds since epoch
-        created_time = issue["created_at"]
-        updated_time = issue["updated_at"]
+    with open(path, "r") as f:
+        return IssueSyncCursor(**json.load(f))
 
-        created_time = datetime.strptime(created_time, "%Y-%m-%dT%H:%M:%SZ")
-        updated_time = datetime.strptime(updated_time, "%Y-%m-%dT%H:%M:%SZ")
 
-        # Check if issue was created or updated within interval
-        if (
-            current_time - created_time <= poll_interval_timedelta
-            or current_time - updated_time <= poll_interval_timedelta
-        ):
-            recent_issues.append(issue)
+def save_issue_cursor(org_id: UUID, repo_name: str, cursor: IssueSyncCursor):
+    """
+    Persist the issue sync cursor of a repository, replacing the previous one atomically.
+    """
+    path = issue_cursor_path(org_id, repo_name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.tmp", "w") as f:
+        f.write(cursor.model_dump_json())
+    os.replace(f"{path}.tmp", path)
 
-    # Convert to Issue objects
-    recent_issues = [Issue(**issue) for issue in recent_issues]
 
-    return recent_issues
+def get_issues_updated_since(
+    repo_name: str, github_kb: GithubKnowledgeBase, cursor: IssueSyncCursor
+) -> List[Dict[str, Any]]:
+    """
+    Get the open issues created or updated since the cursor, with their comments. Only those
+    issues are listed, and only their comments fetched, so a poll costs O(changed issues)
+    requests.
+    """
+    issues = github_kb.get_all_issues_json(repo_name, state="open", since=cursor.since)
+    return [
+        issue
+        for issue in issues
+        if not (issue["updated_at"] == cursor.since and issue["number"] in cursor.seen)
+    ]
 
 
 def issue_needs_dev_team(
@@ -88,7 +147,7 @@ def issue_needs_dev_team(
     with open(REQUIRES_DEV_TEAM_PROMPT, "r") as f:
         prompt = f.read()
 
-    chat_completion = cerebras_client.chat.completions.create(
+    chat_completion = get_cerebras_client().chat.completions.create(
         messages=[
             {"role": "system", "content": prompt},
             {
@@ -129,7 +188,7 @@ def issue_needs_dev_team(
 
     # For later model training
     # completion_comment = completed.comment
-    # dataset_collector.collect_needs_dev_team_output(
+    # get_dataset_collector().collect_needs_dev_team_output(
     #     issue, actual_decision=decision, additional_info=completion_comment
     # )
 
@@ -147,7 +206,9 @@ def poll_for_issues(
     it will be handled by the issue handler. Then, we will comment on the issue with the response, guarded
     by humanlayer.
 
-    TODO issue fetches are slowing this function down, we should most likely try to cache existing issues or only query by time period per poll.
+    Each poll only fetches the issues updated since the repository's IssueSyncCursor, which is
+    persisted, so a restart picks up where the last poll left off. Only the first poll of a
+    repository handles every open issue.
     """
 
     org_name = SupaClient(org_id).get_user_data("org_name", debug=debug)["org_name"]
@@ -156,22 +217,29 @@ def poll_for_issues(
         org_name,
         repos=[Repository(remote="github.com", repository=repo_name, branch="main")],
     )
-    on_init = True
+    cursor = load_issue_cursor(org_id, repo_name)
     handle_issue = HandleIssue(org_id)
 
     while True:
         processing_start_time = time.time()
         logging.info("Polling for issues")
 
-        # 1. Get all issues created or modified in the last POLL_INTERVAL seconds. If this is the first time we're polling, we want to get all unsolved issues, regardless of time.
-        if not on_init:
-            issues = get_issues_created_or_updated_recently(repo_name, github_kb)
+        # 1. Get all issues created or modified since the last poll. If this is the first time we're polling this repo, we want to get all unsolved issues, regardless of time.
+        if cursor is not None:
+            issues = get_issues_updated_since(repo_name, github_kb, cursor)
         else:
-            issues = github_kb.get_all_issues_json(repo_name, state="open")
+            sweep_start = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+            issues = github_kb.get_all_issues_graphql(repo_name, state="open")
             logging.info(
                 f"Polling for EVERY issue in {repo_name}. Found {len(issues)} issues."
             )
-            on_init = False
+            cursor = IssueSyncCursor(
+                since=max(
+                    [issue["updated_at"] for issue in issues], default=sweep_start
+                )
+            )
+
+        logging.info(f"GitHub response cache: {github_cache_stats()}")
 
         # 2. call debug_issue for each issue.
         issue_objs = github_kb.json_issues_to_issues(issues)
@@ -211,6 +279,9 @@ def poll_for_issues(
             # 3. comment on the issue with the response, guarded by humanlayer. TODO untested, but this shouldn't block the main thread. It should just fire off the coroutine.
             asyncio.run(comment_on_issue(org_name, repo_name, issue, text_response))
 
+        cursor.advance(issues)
+        save_issue_cursor(org_id, repo_name, cursor)
+
         if debug:
             break
 
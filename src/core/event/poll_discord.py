@@ -40,8 +40,11 @@ class CirroeDiscordBot(commands.Bot):
         """
         Generate AI response using an AI service API
         Replace with your preferred AI service (OpenAI, Anthropic, etc.)
+        The handler blocks on LLM calls and searches, so it runs in a worker thread to keep the
+        bot responsive to other threads meanwhile.
         """
-        response = self.discord_msg_handler.handle_discord_message(
+        response = await asyncio.to_thread(
+            self.discord_msg_handler.handle_discord_message,
             DiscordMessage(
                 content=content,
                 author=author,
@@ -49,7 +52,7 @@ class CirroeDiscordBot(commands.Bot):
                     (attachment.url, attachment.content_type)
                     for attachment in attachments
                 ],
-            )
+            ),
         )
 
         return response["response"]
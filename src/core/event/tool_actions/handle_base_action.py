@@ -1,6 +1,5 @@
 from typing import Dict, List, Any, Tuple, Optional, Union
 from typeguard import typechecked
-import anthropic
 import logging
 import traceback
 import time
@@ -19,7 +18,7 @@ class BaseActionHandler:
 
     def __init__(
         self,
-        client: anthropic.Anthropic,
+        client: Any,
         system_prompt_file: str,
         tools: List[Dict],
         tools_map: Dict,
@@ -29,6 +28,7 @@ class BaseActionHandler:
         Initialize the action handler
 
         Args:
+            client: Anthropic client
             system_prompt_file: Path to system prompt file
             tools: List of available tools and their schemas
             tools_map: Mapping of tool names to their implementation functions
@@ -91,6 +91,9 @@ class BaseActionHandler:
         Returns:
             Dict containing final response and collected knowledge base responses
         """
+        # The client's module, imported here so that importing this one doesn't load the SDK
+        import anthropic
+
         # Load system prompt
         system_messages = (
             system_prompt if system_prompt and isinstance(system_prompt, List) else None
@@ -1,7 +1,6 @@
 from typing import List, Dict, Any, Tuple
 from include.utils import get_base64_from_url
 import logging
-import anthropic
 from dotenv import load_dotenv
 import os
 
@@ -13,6 +12,7 @@ from src.integrations.kbs.github_kb import Repository
 from include.constants import (
     DEBUG_DISCORD_FILE,
     EXAMPLE_CREATOR_BASE_TOOLS,
+    EXECUTE_SEARCHES_TOOL,
     MODEL_HEAVY,
     ORG_NAME,
     REPO_NAME,
@@ -37,12 +37,15 @@ class DiscordMessageHandler(BaseActionHandler):
         search_tools = SearchTools(self.org_id, [repo])
         self.tools_map = {
             "execute_search": search_tools.execute_search,
+            "execute_searches": search_tools.execute_searches,
         }
 
+        from anthropic import Anthropic
+
         super().__init__(
-            anthropic.Anthropic(api_key=ANTHROPIC_API_KEY),
+            Anthropic(api_key=ANTHROPIC_API_KEY),
             DEBUG_DISCORD_FILE,
-            EXAMPLE_CREATOR_BASE_TOOLS,
+            EXAMPLE_CREATOR_BASE_TOOLS + EXECUTE_SEARCHES_TOOL,
             self.tools_map,
             MODEL_HEAVY,
         )
@@ -5,7 +5,6 @@ from src.model.issue import Issue
 from dotenv import load_dotenv
 from logger import logger
 from uuid import UUID
-import anthropic
 import traceback
 import base64
 import httpx
@@ -21,6 +20,7 @@ from src.core.tools import SearchTools
 from include.constants import (
     DEBUG_ISSUE_FILE,
     EXAMPLE_CREATOR_BASE_TOOLS,
+    EXECUTE_SEARCHES_TOOL,
     DEBUG_ISSUE_FINAL_PROMPT,
     MODEL_HEAVY,
     ORG_NAME,
@@ -43,12 +43,17 @@ class HandleIssue(BaseActionHandler):
             remote="github.com", repository=userdata[REPO_NAME], branch="main"
         )
         search_tools = SearchTools(self.org_id, [repo])
-        self.tools_map = {"execute_search": search_tools.execute_search}
+        self.tools_map = {
+            "execute_search": search_tools.execute_search,
+            "execute_searches": search_tools.execute_searches,
+        }
+
+        from anthropic import Anthropic
 
         super().__init__(
-            anthropic.Anthropic(api_key=ANTHROPIC_API_KEY),
+            Anthropic(api_key=ANTHROPIC_API_KEY),
             DEBUG_ISSUE_FILE,
-            EXAMPLE_CREATOR_BASE_TOOLS,
+            EXAMPLE_CREATOR_BASE_TOOLS + EXECUTE_SEARCHES_TOOL,
             self.tools_map,
             MODEL_HEAVY,
         )
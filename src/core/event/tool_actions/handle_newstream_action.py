@@ -1,8 +1,6 @@
 from typing import Dict, List, Any, Tuple
-import openai
 from pydantic import BaseModel
 import json
-from cerebras.cloud.sdk import Cerebras
 from include.file_cache import file_cache, DISABLE_CACHE
 import os
 import time
@@ -19,7 +17,6 @@ from include.constants import (
 )
 import random
 import re
-import anthropic
 from include.utils import format_prompt, get_content_between_tags
 from src.model.news import News
 from src.integrations.kbs.github_kb import GithubKnowledgeBase
@@ -33,7 +30,7 @@ class NewStreamActionHandler(BaseActionHandler):
 
     def __init__(
         self,
-        client: anthropic.Anthropic,
+        client: Any,
         tools: List[Dict],
         tools_map: Dict,
         model: str,
@@ -77,6 +74,10 @@ class NewStreamActionHandler(BaseActionHandler):
         self.preamble = None
 
         self.plan_generation_prompt = None
+        # Imported here so that importing this module doesn't pay for either SDK
+        from cerebras.cloud.sdk import Cerebras
+        import openai
+
         self.thinking_model = "o1-mini"
         self.thinking_client = openai.OpenAI()
 
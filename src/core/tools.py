@@ -1,15 +1,32 @@
 from uuid import UUID
-from typing import List, Tuple, Optional
+from typing import Any, Dict, List, Tuple, Optional
 from typeguard import typechecked
+import logging
+import asyncio
 
-from src.integrations.kbs.github_kb import GithubKnowledgeBase, Repository
-from src.integrations.kbs.issue_kb import IssueKnowledgeBase, KnowledgeBaseResponse
-from src.integrations.kbs.documentation_kb import DocumentationKnowledgeBase
-from src.integrations.kbs.web_kb import WebKnowledgeBase
+from src.integrations.kbs.base_kb import run_sync
+from src.integrations.kbs.github_kb import Repository
+from src.integrations.kbs.issue_kb import KnowledgeBaseResponse
+from src.integrations.kbs.registry import get_knowledge_bases
 
 from src.storage.supa import SupaClient
 
-from include.constants import ORG_NAME, KnowledgeBaseType
+from include.constants import (
+    ORG_NAME,
+    INDEX_WITH_GREPTILE,
+    HYBRID_CANDIDATES_MULTIPLIER,
+    CODE,
+    ISSUE,
+    DOCUMENTATION,
+    KnowledgeBaseType,
+)
+
+# Knowledge bases backed by a vector db collection, whose searches can be batched together.
+VECTOR_KB_COLLECTIONS = {
+    KnowledgeBaseType.CODEBASE: CODE,
+    KnowledgeBaseType.ISSUES: ISSUE,
+    KnowledgeBaseType.DOCUMENTATION: DOCUMENTATION,
+}
 
 
 @typechecked
@@ -22,13 +39,14 @@ class SearchTools:
         self.supa = SupaClient(user_id=self.requestor_id)
         self.org_name = self.get_org_name()
 
-        self.github = GithubKnowledgeBase(
-            org_id=self.requestor_id, org_name=self.org_name, repos=github_repos
+        # Knowledge bases and their vector db are shared by every handler of this org
+        knowledge_bases = get_knowledge_bases(
+            self.requestor_id, self.org_name, github_repos
         )
-
-        self.issue_kb = IssueKnowledgeBase(self.requestor_id)
-        self.documentation_kb = DocumentationKnowledgeBase(self.requestor_id)
-        self.web_kb = WebKnowledgeBase(self.requestor_id)
+        self.github = knowledge_bases.github
+        self.issue_kb = knowledge_bases.issue_kb
+        self.documentation_kb = knowledge_bases.documentation_kb
+        self.web_kb = knowledge_bases.web_kb
 
     def get_org_name(self):
         userdata = self.supa.get_user_data(ORG_NAME, debug=True)
@@ -56,11 +74,36 @@ class SearchTools:
             user_setup_details (Optional[str]): The user setup details to use for cleaning the results
             git_repo (Optional[str]): The github repo to use for the search
         """
+        return run_sync(
+            self.aexecute_search(
+                query,
+                limit,
+                knowledge_base,
+                traceback,
+                user_provided_code,
+                setup_details,
+                git_repo,
+            )
+        )
+
+    async def aexecute_search(
+        self,
+        query: str,
+        limit: int,
+        knowledge_base: str | KnowledgeBaseType,
+        traceback: Optional[str] = None,
+        user_provided_code: Optional[str] = None,
+        setup_details: Optional[str] = None,
+        git_repo: Optional[str] = None,
+    ) -> Tuple[List[KnowledgeBaseResponse], str]:
+        """
+        Async version of execute_search.
+        """
         if isinstance(knowledge_base, str):
             knowledge_base = KnowledgeBaseType(knowledge_base)
 
         if knowledge_base == KnowledgeBaseType.CODEBASE:
-            return self.github.query(
+            return await self.github.aquery(
                 query,
                 limit,
                 traceback,
@@ -69,7 +112,7 @@ class SearchTools:
                 git_repo=git_repo,
             )
         elif knowledge_base == KnowledgeBaseType.ISSUES:
-            return self.issue_kb.query(
+            return await self.issue_kb.aquery(
                 query,
                 limit,
                 traceback,
@@ -77,7 +120,7 @@ class SearchTools:
                 user_setup_details=setup_details,
             )
         elif knowledge_base == KnowledgeBaseType.DOCUMENTATION:
-            return self.documentation_kb.query(
+            return await self.documentation_kb.aquery(
                 query,
                 limit,
                 traceback,
@@ -85,4 +128,127 @@ class SearchTools:
                 user_setup_details=setup_details,
             )
         elif knowledge_base == KnowledgeBaseType.WEB:
-            return self.web_kb.query(query, limit, traceback)
+            return await self.web_kb.aquery(query, limit, traceback)
+
+    def execute_searches(
+        self, searches: List[Dict[str, Any]]
+    ) -> Tuple[List[KnowledgeBaseResponse], str]:
+        """
+        Execute several searches at once. All vector knowledge base queries are embedded in a single
+        call and searched with one round trip per collection; web searches run alongside them.
+
+        Args:
+            searches (List[Dict[str, Any]]): Each with a "query", "limit" and "knowledge_base", and
+                optionally a "traceback" for codebase searches.
+        """
+        return run_sync(self.aexecute_searches(searches))
+
+    async def aexecute_searches(
+        self, searches: List[Dict[str, Any]]
+    ) -> Tuple[List[KnowledgeBaseResponse], str]:
+        """
+        Async version of execute_searches.
+        """
+        vector_indices, other_indices = [], []
+        for i, search in enumerate(searches):
+            knowledge_base = KnowledgeBaseType(search["knowledge_base"])
+            if knowledge_base in VECTOR_KB_COLLECTIONS and not (
+                knowledge_base == KnowledgeBaseType.CODEBASE and INDEX_WITH_GREPTILE
+            ):
+                vector_indices.append(i)
+            else:
+                other_indices.append(i)
+
+        vector_responses, *other_responses = await asyncio.gather(
+            self.__execute_vector_searches([searches[i] for i in vector_indices]),
+            *(
+                self.aexecute_search(
+                    searches[i]["query"],
+                    searches[i].get("limit", 5),
+                    searches[i]["knowledge_base"],
+                    searches[i].get("traceback"),
+                )
+                for i in other_indices
+            ),
+        )
+
+        responses: List[Optional[str]] = [None] * len(searches)
+        for i, search_response in zip(vector_indices, vector_responses):
+            responses[i] = search_response
+        for i, (_, search_response) in zip(other_indices, other_responses):
+            responses[i] = search_response
+
+        response = ""
+        for i, (search, search_response) in enumerate(zip(searches, responses)):
+            response += f"<search_{i}_query>{search['query']}</search_{i}_query>"
+            response += f"<search_{i}_results>{search_response}</search_{i}_results>"
+
+        return [], response
+
+    async def __execute_vector_searches(
+        self, searches: List[Dict[str, Any]]
+    ) -> List[str]:
+        """
+        Run searches over vector knowledge bases, embedding all their queries in a single call and
+        searching each collection in one round trip.
+
+        Returns:
+            List[str]: The formatted results of each search, in order
+        """
+        if not searches:
+            return []
+
+        try:
+            vector_db = self.github.async_vector_db
+            query_vectors = await vector_db.embed_queries(
+                [search["query"] for search in searches]
+            )
+            results = await vector_db.search_many(
+                [
+                    (
+                        VECTOR_KB_COLLECTIONS[KnowledgeBaseType(search["knowledge_base"])],
+                        query_vector,
+                        search.get("limit", 5)
+                        * (
+                            HYBRID_CANDIDATES_MULTIPLIER
+                            if search["knowledge_base"] == KnowledgeBaseType.CODEBASE
+                            else 1
+                        ),
+                        None,
+                    )
+                    for search, query_vector in zip(searches, query_vectors)
+                ]
+            )
+
+            responses = []
+            for search, result in zip(searches, results):
+                knowledge_base = KnowledgeBaseType(search["knowledge_base"])
+                if knowledge_base == KnowledgeBaseType.CODEBASE:
+                    result = await self.github.afuse_with_lexical(
+                        search["query"],
+                        result,
+                        search.get("limit", 5),
+                        search.get("traceback"),
+                    )
+                    # Cleaning the traceback scans code pages with the blocking client
+                    responses.append(
+                        await asyncio.to_thread(
+                            self.github.format_results,
+                            result,
+                            search.get("traceback"),
+                            search["query"],
+                        )
+                    )
+                elif knowledge_base == KnowledgeBaseType.ISSUES:
+                    responses.append(
+                        self.issue_kb.format_results(result, search["query"])
+                    )
+                else:
+                    responses.append(
+                        self.documentation_kb.format_results(result, search["query"])
+                    )
+
+            return responses
+        except Exception as e:
+            logging.error(f"Failed to execute batched searches: {str(e)}")
+            return [str(e)] * len(searches)
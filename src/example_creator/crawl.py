@@ -9,7 +9,7 @@ from bs4 import BeautifulSoup
 from datetime import datetime, timedelta
 from src.model.news import News, NewsSource, RedditNews
 from include.constants import SUBREDDIT_LIST, GITHUB_API_BASE
-import requests
+from src.integrations.kbs.github_http import get_github_session
 import os
 import logging
 import uuid
@@ -36,6 +36,7 @@ class Crawl:
             "Accept": "application/vnd.github.v3+json",
             "X-GitHub-Api-Version": "2022-11-28",
         }
+        self.session = get_github_session()
 
         # Reddit crawling stuff
         self.rkb = RedditKnowledgeBase(uuid.uuid4())
@@ -115,7 +116,7 @@ class Crawl:
 
         try:
             url = f"{GITHUB_URL}/trending"
-            response = requests.get(url)
+            response = self.session.get(url)
             soup = BeautifulSoup(response.content, "html.parser")
 
             # Find all repository articles
@@ -136,12 +137,12 @@ class Crawl:
 
                 # Get readme content
                 url = f"{GITHUB_API_BASE}/repos{relative_url}/contents/README.md"
-                readme_response = requests.get(url, headers=self.github_headers)
+                readme_response = self.session.get(url, headers=self.github_headers)
 
                 if readme_response.status_code == 200:
 
                     body = readme_response.json()
-                    content_response = requests.get(
+                    content_response = self.session.get(
                         body["download_url"], headers=self.github_headers
                     )
                     content_response.raise_for_status()
@@ -3,6 +3,7 @@ This file is used to test the example creator tools by executing code examples i
 """
 
 from include.constants import GITHUB_API_BASE
+from src.integrations.kbs.github_http import get_github_session
 from e2b import Sandbox as e2b_sandbox
 from src.model.code import ExecutionResult
 from typing import Tuple, Dict, List
@@ -41,6 +42,7 @@ class Sandbox:
             "Accept": "application/vnd.github.v3+json",
             "X-GitHub-Api-Version": "2022-11-28",
         }
+        self.session = get_github_session()
         self.sanbox_env_file = ".env"  # This is just going to have a ton of different env variables. If an env variable is not found during execution, I need to be pinged to add it
         self.sandbox_file_content = self.load_env_file()
 
@@ -305,14 +307,14 @@ class Sandbox:
 
             # Get default branch
             url = f"{GITHUB_API_BASE}/repos/{repo_name}"
-            response = requests.get(url, headers=self.github_headers)
+            response = self.session.get(url, headers=self.github_headers)
             response.raise_for_status()
             repo_data = response.json()
             base_branch = repo_data["default_branch"]
 
             # Get base branch SHA
             url = f"{GITHUB_API_BASE}/repos/{repo_name}/git/refs/heads/{base_branch}"
-            response = requests.get(url, headers=self.github_headers)
+            response = self.session.get(url, headers=self.github_headers)
             response.raise_for_status()
             base_sha = response.json()["object"]["sha"]
 
@@ -320,13 +322,15 @@ class Sandbox:
             url = f"{GITHUB_API_BASE}/repos/{repo_name}/git/refs"
             payload = {"ref": f"refs/heads/{branch_name}", "sha": base_sha}
             try:
-                response = requests.post(url, headers=self.github_headers, json=payload)
+                response = self.session.post(
+                    url, headers=self.github_headers, json=payload
+                )
                 response.raise_for_status()
             except requests.exceptions.HTTPError as e:
                 if e.response.status_code == 422:  # Branch already exists
                     # Update existing branch to point to base_sha
                     url = f"{GITHUB_API_BASE}/repos/{repo_name}/git/refs/heads/{branch_name}"
-                    response = requests.patch(
+                    response = self.session.patch(
                         url,
                         headers=self.github_headers,
                         json={"sha": base_sha, "force": True},
@@ -342,7 +346,7 @@ class Sandbox:
                 # Create a blob for each file
                 url = f"{GITHUB_API_BASE}/repos/{repo_name}/git/blobs"
                 blob_payload = {"content": content, "encoding": "utf-8"}
-                blob_response = requests.post(
+                blob_response = self.session.post(
                     url, headers=self.github_headers, json=blob_payload
                 )
                 blob_response.raise_for_status()
@@ -361,7 +365,7 @@ class Sandbox:
             # Create a tree with all changes
             url = f"{GITHUB_API_BASE}/repos/{repo_name}/git/trees"
             tree_payload = {"base_tree": base_sha, "tree": tree_items}
-            tree_response = requests.post(
+            tree_response = self.session.post(
                 url, headers=self.github_headers, json=tree_payload
             )
             tree_response.raise_for_status()
@@ -370,7 +374,7 @@ class Sandbox:
             # Check if commit with same message exists
             url = f"{GITHUB_API_BASE}/repos/{repo_name}/commits"
             params = {"sha": branch_name}
-            commits_response = requests.get(
+            commits_response = self.session.get(
                 url, headers=self.github_headers, params=params
             )
             commits_response.raise_for_status()
@@ -392,7 +396,7 @@ class Sandbox:
                     "tree": new_tree_sha,
                     "parents": [base_sha],
                 }
-                commit_response = requests.patch(
+                commit_response = self.session.patch(
                     url, headers=self.github_headers, json=commit_payload
                 )
                 commit_response.raise_for_status()
@@ -405,7 +409,7 @@ class Sandbox:
                     "tree": new_tree_sha,
                     "parents": [base_sha],
                 }
-                commit_response = requests.post(
+                commit_response = self.session.post(
                     url, headers=self.github_headers, json=commit_payload
                 )
                 commit_response.raise_for_status()
@@ -416,7 +420,7 @@ class Sandbox:
                     f"{GITHUB_API_BASE}/repos/{repo_name}/git/refs/heads/{branch_name}"
                 )
                 ref_payload = {"sha": new_commit_sha}
-                ref_response = requests.patch(
+                ref_response = self.session.patch(
                     url, headers=self.github_headers, json=ref_payload
                 )
                 ref_response.raise_for_status()
@@ -465,14 +469,16 @@ class Sandbox:
         }
 
         if pr_number:
-            response = requests.patch(
+            response = self.session.patch(
                 url,
                 headers=self.github_headers,
                 params={"number": pr_number},
                 json=payload,
             )
         else:
-            response = requests.post(url, headers=self.github_headers, json=payload)
+            response = self.session.post(
+                url, headers=self.github_headers, json=payload
+            )
 
         response.raise_for_status()
         pr_data = response.json()
@@ -2,7 +2,7 @@ from src.integrations.cleaners.base_cleaner import BaseCleaner
 from src.storage.vector import VectorDB
 from src.model.code import CodePage
 from pydantic import BaseModel
-from typing import List
+from typing import Iterator, List
 
 
 class TracebackStep(BaseModel):
@@ -48,15 +48,13 @@ class TracebackCleaner(BaseCleaner):
 
         return file_paths
 
-    def __get_code_pages_from_file_paths(self, file_paths: List[str]) -> List[CodePage]:
+    def __get_code_pages_from_file_paths(self, file_path: str) -> Iterator[CodePage]:
         """
-        Get the code pages from a list of file paths.
+        Stream the code pages matching a file path.
 
         TODO: Right now, we haven't tested the positive case, so not sure if this will work.
         """
-        pages = self.vector_db.get_code_pages(filename_filter=file_paths)
-
-        return pages
+        return self.vector_db.iter_code_pages(filename_filter=file_path)
 
     def __get_chunks_from_traceback(self, tb: str) -> List[TracebackStep]:
         """
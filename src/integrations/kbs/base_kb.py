@@ -1,7 +1,9 @@
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Coroutine, Dict, List, Optional, Tuple
 from pydantic import BaseModel
 from uuid import UUID
+import threading
+import asyncio
 
 
 class KnowledgeBaseResponse(BaseModel):
@@ -15,6 +17,28 @@ class KnowledgeBaseResponse(BaseModel):
     )
 
 
+_sync_loop: Optional[asyncio.AbstractEventLoop] = None
+_sync_loop_lock = threading.Lock()
+
+
+def run_sync(coroutine: Coroutine[Any, Any, Any]) -> Any:
+    """
+    Run a coroutine to completion from blocking code, on an event loop kept running in a background
+    thread. Works whether or not the calling thread has a running loop of its own, and lets the
+    async clients created on the loop be reused across calls.
+    """
+    global _sync_loop
+
+    with _sync_loop_lock:
+        if _sync_loop is None:
+            _sync_loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=_sync_loop.run_forever, name="kb-sync-loop", daemon=True
+            ).start()
+
+    return asyncio.run_coroutine_threadsafe(coroutine, _sync_loop).result()
+
+
 class BaseKnowledgeBase(ABC):
     """
     Abstract base class for knowledge base integrations.
@@ -44,7 +68,7 @@ class BaseKnowledgeBase(ABC):
         pass
 
     @abstractmethod
-    def query(
+    async def aquery(
         self, query: str, limit: int = 5, tb: Optional[str] = None, **kwargs
     ) -> Tuple[List[KnowledgeBaseResponse], str]:
         """
@@ -60,6 +84,14 @@ class BaseKnowledgeBase(ABC):
         """
         pass
 
+    def query(
+        self, query: str, limit: int = 5, tb: Optional[str] = None, **kwargs
+    ) -> Tuple[List[KnowledgeBaseResponse], str]:
+        """
+        Blocking version of aquery, for scripts and other code without an event loop.
+        """
+        return run_sync(self.aquery(query, limit, tb, **kwargs))
+
     def get_tool_description(self) -> str:
         """
         Get description of this knowledge base for use as a tool
@@ -1,7 +1,7 @@
 import subprocess
 import json
 import os
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Tuple
 from src.storage.supa import SupaClient
 from logger import logger
 from src.integrations.kbs.base_kb import BaseKnowledgeBase, KnowledgeBaseResponse
@@ -112,8 +112,8 @@ class CloudIntegration(BaseKnowledgeBase):
         """
         return False
 
-    def query(
-        self, query: str, limit: int = 5
+    async def aquery(
+        self, query: str, limit: int = 5, tb: Optional[str] = None, **kwargs
     ) -> Tuple[List[KnowledgeBaseResponse], str]:
         """
         Not implemented for cloud integration.
@@ -0,0 +1,191 @@
+from include.constants import (
+    CONTEXT_TOKEN_BUDGET,
+    CONTEXT_MAX_HIT_TOKENS,
+    CONTEXT_DUPLICATE_LINE_RATIO,
+)
+from src.storage.lexical import tokenize_code
+from src.storage.tokens import count_tokens
+from typing import List, Set, Tuple
+from pydantic import BaseModel
+import re
+
+ELISION = "..."
+# Lines longer than this are split into pieces, so that single-line content (minified code, cleaned
+# html) can still be trimmed to a window
+MAX_SEGMENT_CHARS = 400
+# Shorter lines (braces, blank lines, `else:`) are ignored when looking for duplicate hits
+MIN_DUPLICATE_LINE_CHARS = 8
+
+SEGMENT_PATTERN = re.compile(r"[^\n]*\n|[^\n]+$")
+
+
+def split_segments(text: str) -> List[str]:
+    """
+    Split text into lines, keeping their newlines, with lines longer than MAX_SEGMENT_CHARS split
+    at whitespace. Joining the segments gives back the text.
+    """
+    segments = []
+    for line in SEGMENT_PATTERN.findall(text):
+        while len(line) > MAX_SEGMENT_CHARS:
+            cut = line.rfind(" ", MAX_SEGMENT_CHARS // 2, MAX_SEGMENT_CHARS) + 1
+            cut = cut or MAX_SEGMENT_CHARS
+            segments.append(line[:cut])
+            line = line[cut:]
+
+        if line:
+            segments.append(line)
+
+    return segments
+
+
+def relevant_window(text: str, terms: Set[str], max_tokens: int) -> Tuple[str, int]:
+    """
+    Trim text to the run of consecutive lines that fits in max_tokens and holds the most
+    occurrences of the query terms, marking trimmed ends with an ellipsis. Text without any query
+    term is trimmed to its beginning.
+
+    Returns:
+        Tuple[str, int]: The window, and its token count
+    """
+    if max_tokens <= 0 or not text:
+        return "", 0
+
+    segments = split_segments(text)
+    tokens = count_tokens(segments)
+    if sum(tokens) <= max_tokens:
+        return text, sum(tokens)
+
+    scores = [
+        sum(1 for token in tokenize_code(segment) if token in terms)
+        for segment in segments
+    ]
+
+    # Two pointers: for each end, the longest window ending there that fits
+    best_score, candidates = 0, []
+    start, window_tokens, window_score = 0, 0, 0
+    for end in range(len(segments)):
+        window_tokens += tokens[end]
+        window_score += scores[end]
+        while window_tokens > max_tokens and start <= end:
+            window_tokens -= tokens[start]
+            window_score -= scores[start]
+            start += 1
+
+        if start > end:
+            continue
+        if window_score > best_score:
+            best_score, candidates = window_score, []
+        if window_score == best_score:
+            candidates.append((start, end + 1))
+
+    if not candidates:
+        return "", 0
+
+    # Of the windows holding as many query terms, the middle one has the most context around them.
+    # Without any, the longest one from the start.
+    start, end = (
+        candidates[len(candidates) // 2]
+        if best_score > 0
+        else max(candidate for candidate in candidates if candidate[0] == 0)
+    )
+    window = "".join(segments[start:end])
+    if start > 0:
+        window = f"{ELISION}\n{window}"
+    if end < len(segments):
+        window = f"{window.rstrip()}\n{ELISION}"
+
+    return window, sum(tokens[start:end])
+
+
+def significant_lines(text: str) -> Set[str]:
+    """
+    Get the whitespace-normalized lines of text that are long enough to tell hits apart.
+    """
+    lines = (" ".join(line.split()) for line in text.splitlines())
+    return {
+        line
+        for line in lines
+        if len(line) >= MIN_DUPLICATE_LINE_CHARS and line != ELISION
+    }
+
+
+class ContextHit(BaseModel):
+    """
+    A ranked knowledge base hit to pack, emitted as a <{tag}_similarity> element followed by one
+    <{tag}_{name}> element per section.
+    """
+
+    tag: str
+    similarity: float
+    sections: List[Tuple[str, str]]  # (name, text) pairs, trimmed in order
+
+
+class ContextPacker:
+    """
+    Packs ranked knowledge base hits into the string handed to the agent, within a token budget.
+    Hits are taken best first, each trimmed to the window around the query terms that fits its
+    share of the budget, and hits mostly repeating lines already packed are dropped.
+    """
+
+    def __init__(
+        self,
+        budget: int = CONTEXT_TOKEN_BUDGET,
+        max_hit_tokens: int = CONTEXT_MAX_HIT_TOKENS,
+        duplicate_line_ratio: float = CONTEXT_DUPLICATE_LINE_RATIO,
+    ):
+        """
+        Args:
+            budget: Tokens of hit content to pack in total
+            max_hit_tokens: Tokens of content to pack from a single hit
+            duplicate_line_ratio: Share of a hit's lines already packed above which it is dropped
+        """
+        self.budget = budget
+        self.max_hit_tokens = max_hit_tokens
+        self.duplicate_line_ratio = duplicate_line_ratio
+
+    def pack(
+        self, query: str, hits: List[ContextHit], root: str, extra: str = ""
+    ) -> str:
+        """
+        Pack hits into a <root> element.
+
+        Args:
+            query: The search query, whose identifiers the hits are trimmed around
+            hits: The hits, best first
+            root: The tag wrapping the packed hits
+            extra: Content appended after the hits inside the root element, as is
+
+        Returns:
+            str: The packed hits
+        """
+        terms = set(tokenize_code(query))
+        remaining = self.budget
+        packed_lines: Set[str] = set()
+
+        parts = [f"<{root}>"]
+        for hit in hits:
+            if remaining <= 0:
+                break
+
+            hit_budget = min(self.max_hit_tokens, remaining)
+            windows, hit_tokens = [], 0
+            for name, text in hit.sections:
+                window, tokens = relevant_window(text, terms, hit_budget - hit_tokens)
+                windows.append((name, window))
+                hit_tokens += tokens
+
+            lines = set().union(*(significant_lines(window) for _, window in windows))
+            duplicates = len(lines & packed_lines)
+            if lines and duplicates >= self.duplicate_line_ratio * len(lines):
+                continue
+
+            packed_lines |= lines
+            remaining -= hit_tokens
+
+            parts.append(f"<{hit.tag}_similarity>{hit.similarity}</{hit.tag}_similarity>")
+            for name, window in windows:
+                parts.append(f"<{hit.tag}_{name}>{window}</{hit.tag}_{name}>")
+
+        parts.append(extra)
+        parts.append(f"</{root}>")
+        return "".join(parts)
@@ -1,14 +1,14 @@
 from src.integrations.kbs.base_kb import BaseKnowledgeBase, KnowledgeBaseResponse
+from src.integrations.kbs.context_packer import ContextPacker, ContextHit
 from src.integrations.cleaners.html_cleaner import HTMLCleaner
 from src.model.documentation import DocumentationPage
 from include.constants import (
     NVIDIA_EMBED,
     DIMENSION_NVIDIA,
 )
-from typing import List, Tuple, Optional
-from src.storage.vector import VectorDB
+from typing import Any, Dict, List, Tuple, Optional
+from src.storage.vector import VectorDB, AsyncVectorDB, get_vector_db
 from urllib.parse import urljoin
-from anthropic import Anthropic
 from bs4 import BeautifulSoup
 from lxml import etree
 from uuid import UUID
@@ -21,9 +21,14 @@ import tqdm
 
 
 class DocumentationKnowledgeBase(BaseKnowledgeBase):
-    def __init__(self, org_id: UUID):
-        self.vector_db = VectorDB(org_id)
+    def __init__(self, org_id: UUID, vector_db: Optional[VectorDB] = None):
+        self.vector_db = vector_db or get_vector_db(org_id)
+        self.async_vector_db = AsyncVectorDB(self.vector_db)
+        self.context_packer = ContextPacker()
         self.html_cleaner = HTMLCleaner()
+
+        from anthropic import Anthropic
+
         self.client = Anthropic()
         super().__init__(org_id)
 
@@ -88,30 +93,31 @@ class DocumentationKnowledgeBase(BaseKnowledgeBase):
         url_hash = hashlib.sha3_256(url.encode()).digest()
         return url_hash.hex()
 
-    def _index_links(self, links: List[str]):
+    def _index_links(self, links: List[str], source: Optional[str] = None):
         """
         Index the list of links into the knowledge base by adding each page to the vector database.
+        source is where the links were found, for the dedup report.
         """
         logging.info("Indexing list of links into vector database")
 
-        for url in tqdm.tqdm(links, desc="Indexing links"):
-            content = self._fetch_page_content(url)
-
+        pages = []
+        for url in tqdm.tqdm(links, desc="Fetching links"):
             try:
-                logging.debug(f"Adding page {url} to vector database")
-                page = DocumentationPage(
-                    primary_key=self._get_page_primary_key(url),
-                    url=url,
-                    content=content,
+                content = self._fetch_page_content(url)
+                pages.append(
+                    DocumentationPage(
+                        primary_key=self._get_page_primary_key(url),
+                        url=url,
+                        content=content,
+                    )
                 )
-                self.vector_db.add_documentation_page(page)
-                logging.debug(f"Successfully added {url} to vector database")
             except Exception as e:
-                logging.error(
-                    f"Failed to add {url} to vector database: {str(e)}. Skipping..."
-                )
+                logging.error(f"Failed to fetch {url}: {str(e)}. Skipping...")
                 continue
 
+        logging.debug(f"Adding {len(pages)} pages to vector database")
+        self.vector_db.add_documentation_pages(pages, source=source)
+
         logging.info("Finished indexing list of links")
 
     def _get_links_with_generic_dfs(self, base_url: str) -> List[str]:
@@ -164,7 +170,7 @@ class DocumentationKnowledgeBase(BaseKnowledgeBase):
                 logging.error(traceback.format_exc())
                 links = self._get_links_with_generic_dfs(url)
 
-            self._index_links(links)
+            self._index_links(links, source=url)
 
             return True
 
@@ -174,7 +180,7 @@ class DocumentationKnowledgeBase(BaseKnowledgeBase):
 
             return False
 
-    def query(
+    async def aquery(
         self, query: str, limit: int = 5, tb: Optional[str] = None, **kwargs
     ) -> Tuple[List[KnowledgeBaseResponse], str]:
         """
@@ -189,21 +195,41 @@ class DocumentationKnowledgeBase(BaseKnowledgeBase):
                       String answer to the query
         """
         try:
-            query_vector = self.vector_db.vanilla_embed(query)
-            results = self.vector_db.get_top_k_documentation(limit, query_vector)
-
-            response = "<documentation_pages>"
-            for result in results.values():
-                doc = DocumentationPage(**json.loads(result["metadata"]))
-                similarity = result["similarity"]
-
-                response += f"<documentation_page_{doc.url}_similarity>{similarity}</documentation_page_{doc.url}_similarity>"
-                response += f"<documentation_page_{doc.url}_content>{doc.content}</documentation_page_{doc.url}_content>"
-
-            response += "</documentation_pages>"
-            return [], response
+            query_vector = await self.async_vector_db.embed_query(query)
+            results = await self.async_vector_db.get_top_k_documentation(
+                limit, query_vector
+            )
+            return [], self.format_results(results, query)
 
         except Exception as e:
             logging.error(f"Failed to query documentation: {str(e)}")
             logging.error(traceback.format_exc())
             return [], str(e)
+
+    def format_results(self, results: Dict[str, Any], query: str = "") -> str:
+        """
+        Format the results of a documentation search into the string handed to the agent, within
+        the context packer's token budget.
+
+        Args:
+            results: The {id: {similarity, metadata}} mapping returned by VectorDB.get_top_k_documentation
+            query: The search query, whose terms each page is trimmed around
+
+        Returns:
+            str: The formatted documentation pages
+        """
+        hits = []
+        for result in results.values():
+            doc = DocumentationPage(**json.loads(result["metadata"]))
+            sections = [("content", doc.content)]
+            if doc.start_line is not None:
+                sections.insert(0, ("lines", f"{doc.start_line}-{doc.end_line}"))
+            hits.append(
+                ContextHit(
+                    tag=f"documentation_page_{doc.url}",
+                    similarity=result["similarity"],
+                    sections=sections,
+                )
+            )
+
+        return self.context_packer.pack(query, hits, "documentation_pages")
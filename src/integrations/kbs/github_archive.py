@@ -0,0 +1,97 @@
+from include.constants import MAX_INDEXED_FILE_BYTES
+from src.model.code import CodePage, CodePageType
+from typing import BinaryIO, Container, Iterator, Optional
+import tarfile
+import hashlib
+import logging
+
+# Non-text files, never indexed
+SKIPPED_EXTENSIONS = (
+    ".png",
+    ".jpg",
+    ".jpeg",
+    ".gif",
+    ".bmp",
+    ".tiff",
+    ".ico",
+    ".webp",
+)
+# Like git, content with a NUL byte in its first 8000 bytes is binary
+BINARY_SNIFF_BYTES = 8000
+
+
+def git_blob_sha(content: bytes) -> str:
+    """
+    Get the sha git (and the GitHub trees API) identifies a file's content by.
+    """
+    return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+
+
+def is_indexable(path: str, content: bytes) -> bool:
+    """
+    Whether a file is worth indexing: text, and not too large to be source code.
+    """
+    return (
+        not path.lower().endswith(SKIPPED_EXTENSIONS)
+        and len(content) <= MAX_INDEXED_FILE_BYTES
+        and b"\0" not in content[:BINARY_SNIFF_BYTES]
+    )
+
+
+def read_archive(
+    fileobj: BinaryIO, org_id: str, paths: Optional[Container[str]] = None
+) -> Iterator[CodePage]:
+    """
+    Stream the files of a repository tar archive (optionally compressed), one member at a time, so
+    the archive is never held in memory or written to disk. Archives from GitHub put every file
+    under a `{owner}-{repo}-{sha}/` directory, so when the first member is a directory, it is
+    stripped from the paths.
+
+    Args:
+        fileobj: The archive, e.g. a streamed HTTP response body
+        org_id: The org the pages belong to
+        paths: Only read the files with these paths, e.g. those changed since the last index
+
+    Yields:
+        CodePage: The indexable files (see is_indexable), with their git blob sha
+    """
+    with tarfile.open(fileobj=fileobj, mode="r|*") as archive:
+        root = None
+        for member in archive:
+            if root is None:
+                root = member.name.rstrip("/") + "/" if member.isdir() else ""
+            if not member.isfile():
+                continue
+
+            path = member.name
+            if root and path.startswith(root):
+                path = path[len(root) :]
+            if paths is not None and path not in paths:
+                continue
+            if member.size > MAX_INDEXED_FILE_BYTES or path.lower().endswith(
+                SKIPPED_EXTENSIONS
+            ):
+                continue
+
+            content = archive.extractfile(member).read()
+            if not is_indexable(path, content):
+                continue
+
+            yield CodePage(
+                primary_key=path,
+                content=content.decode("utf8", errors="replace"),
+                org_id=org_id,
+                page_type=CodePageType.CODE,
+                sha=git_blob_sha(content),
+            )
+            logging.info(f"Read code file from archive: {path}")
+
+
+def read_archive_file(
+    path: str, org_id: str, paths: Optional[Container[str]] = None
+) -> Iterator[CodePage]:
+    """
+    Stream the files of a local repository tar archive, e.g. from `git archive`, see read_archive.
+    """
+    with open(path, "rb") as fileobj:
+        yield from read_archive(fileobj, org_id, paths)
@@ -0,0 +1,115 @@
+from include.constants import GITHUB_API_BASE
+from typing import Any, Dict, List, Optional
+
+# Fields of an issue comment, named after the REST API ones they're converted to
+COMMENT_FIELDS = """
+    databaseId
+    body
+    createdAt
+    updatedAt
+    url
+    author { login }
+"""
+
+ISSUES_QUERY = f"""
+query($owner: String!, $name: String!, $states: [IssueState!], $labels: [String!],
+      $pageSize: Int!, $commentsPageSize: Int!, $withComments: Boolean!, $after: String) {{
+  repository(owner: $owner, name: $name) {{
+    issues(first: $pageSize, after: $after, states: $states, labels: $labels,
+           orderBy: {{field: CREATED_AT, direction: DESC}}) {{
+      pageInfo {{ hasNextPage endCursor }}
+      nodes {{
+        id
+        databaseId
+        number
+        title
+        body
+        state
+        createdAt
+        updatedAt
+        closedAt
+        url
+        author {{ login }}
+        labels(first: 100) {{ nodes {{ name color description }} }}
+        comments(first: $commentsPageSize) @include(if: $withComments) {{
+          totalCount
+          pageInfo {{ hasNextPage endCursor }}
+          nodes {{ {COMMENT_FIELDS} }}
+        }}
+      }}
+    }}
+  }}
+}}
+"""
+
+ISSUE_COMMENTS_QUERY = f"""
+query($id: ID!, $commentsPageSize: Int!, $after: String) {{
+  node(id: $id) {{
+    ... on Issue {{
+      comments(first: $commentsPageSize, after: $after) {{
+        pageInfo {{ hasNextPage endCursor }}
+        nodes {{ {COMMENT_FIELDS} }}
+      }}
+    }}
+  }}
+}}
+"""
+
+
+def graphql_user(author: Optional[Dict[str, Any]]) -> Dict[str, str]:
+    """
+    Convert a GraphQL author to a REST user. Deleted accounts have no author, and are shown as
+    "ghost" by GitHub.
+    """
+    return {"login": author["login"] if author else "ghost"}
+
+
+def graphql_comment_to_json(comment: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Convert a GraphQL issue comment to the shape of the REST API's.
+    """
+    return {
+        "id": comment["databaseId"],
+        "body": comment["body"],
+        "user": graphql_user(comment["author"]),
+        "created_at": comment["createdAt"],
+        "updated_at": comment["updatedAt"],
+        "html_url": comment["url"],
+    }
+
+
+def graphql_issue_to_json(
+    issue: Dict[str, Any],
+    repo_path: str,
+    comments: Optional[List[Dict[str, Any]]] = None,
+) -> Dict[str, Any]:
+    """
+    Convert a GraphQL issue to the shape of the REST API's, as consumed by json_issues_to_issues.
+
+    Args:
+        issue: The issue node
+        repo_path: The repository, as "owner/name"
+        comments: All of the issue's comment nodes, if they were fetched. The REST API only
+            gives a count under "comments", so the key is left out otherwise.
+    """
+    converted = {
+        "id": issue["databaseId"],
+        "node_id": issue["id"],
+        "number": issue["number"],
+        "title": issue["title"],
+        "body": issue["body"],
+        "state": issue["state"].lower(),
+        "created_at": issue["createdAt"],
+        "updated_at": issue["updatedAt"],
+        "closed_at": issue["closedAt"],
+        "html_url": issue["url"],
+        "comments_url": (
+            f"{GITHUB_API_BASE}/repos/{repo_path}/issues/{issue['number']}/comments"
+        ),
+        "user": graphql_user(issue["author"]),
+        "labels": issue["labels"]["nodes"],
+    }
+    if comments is not None:
+        converted["comments"] = [graphql_comment_to_json(comment) for comment in comments]
+
+    return converted
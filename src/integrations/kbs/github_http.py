@@ -0,0 +1,253 @@
+from include.constants import (
+    GITHUB_MAX_CONCURRENCY,
+    GITHUB_MAX_RETRIES,
+    GITHUB_RETRY_BACKOFF_SECONDS,
+    GITHUB_HTTP_CACHE_FILE,
+    GITHUB_HTTP_CACHE_MAX_ENTRIES,
+)
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple, TypeVar
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.util.retry import Retry
+import requests
+import threading
+import hashlib
+import sqlite3
+import json
+import time
+import os
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+_session: Optional["CachingSession"] = None
+_executor: Optional[ThreadPoolExecutor] = None
+_lock = threading.Lock()
+
+
+class ResponseCache:
+    """
+    Persistent cache of GET response bodies with their validators (ETag, Last-Modified), keyed
+    by (url with query, Accept header, sha256 of the Authorization header) so that different
+    tokens and media types never share an entry. Stored in sqlite; once the cache holds more
+    than max_entries responses, the least recently used ones are evicted.
+    """
+
+    def __init__(
+        self,
+        path: str = GITHUB_HTTP_CACHE_FILE,
+        max_entries: int = GITHUB_HTTP_CACHE_MAX_ENTRIES,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0  # 304s answered from the cache
+        self.misses = 0  # Full responses
+        self.lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                headers TEXT NOT NULL,
+                body BLOB NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)"
+        )
+        self.conn.commit()
+
+        self.num_entries = self.conn.execute(
+            "SELECT COUNT(*) FROM responses"
+        ).fetchone()[0]
+
+    @staticmethod
+    def key(url: str, headers: Dict[str, str]) -> str:
+        """
+        Get the cache key of a GET request.
+        """
+        headers = CaseInsensitiveDict(headers)
+        authorization = hashlib.sha256(
+            headers.get("Authorization", "").encode("utf-8")
+        ).hexdigest()
+        return f"{url} {headers.get('Accept', '')} {authorization}"
+
+    def get(self, key: str) -> Optional[Tuple[Dict[str, str], bytes]]:
+        """
+        Look up the headers and body of a cached response.
+        """
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT headers, body FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            self.conn.execute(
+                "UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key)
+            )
+            self.conn.commit()
+            return json.loads(row[0]), row[1]
+
+    def put(self, key: str, headers: Dict[str, str], body: bytes):
+        """
+        Store a response, evicting the least recently used entries if needed.
+        """
+        with self.lock:
+            before = self.conn.total_changes
+            exists = self.conn.execute(
+                "SELECT 1 FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            self.conn.execute(
+                """
+                INSERT OR REPLACE INTO responses (key, headers, body, last_access)
+                VALUES (?, ?, ?, ?)
+                """,
+                (key, json.dumps(dict(headers)), body, time.time()),
+            )
+            if exists is None:
+                self.num_entries += self.conn.total_changes - before
+
+            if self.num_entries > self.max_entries:
+                self.conn.execute(
+                    """
+                    DELETE FROM responses WHERE rowid IN (
+                        SELECT rowid FROM responses ORDER BY last_access ASC LIMIT ?
+                    )
+                    """,
+                    (self.num_entries - self.max_entries,),
+                )
+                self.num_entries = self.max_entries
+
+            self.conn.commit()
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Get the hit/miss counters of this cache since it was opened.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": self.num_entries,
+        }
+
+
+class CachingSession(requests.Session):
+    """
+    Session making GETs conditional: a response with an ETag or Last-Modified is cached, and
+    later GETs of the same url send it back as If-None-Match/If-Modified-Since. GitHub answers
+    304 Not Modified when nothing changed, without counting it against the rate limit, and the
+    cached body is returned as a 200. Data is always revalidated, so it is never stale.
+
+    Streamed GETs (e.g. archives) and other methods are not cached.
+    """
+
+    def __init__(self, cache: Optional[ResponseCache] = None):
+        super().__init__()
+        self.cache = cache
+
+    def request(self, method: str, url: str, **kwargs: Any) -> requests.Response:
+        if self.cache is None or method.upper() != "GET" or kwargs.get("stream"):
+            return super().request(method, url, **kwargs)
+
+        headers = dict(kwargs.pop("headers", None) or {})
+        full_url = requests.Request(
+            "GET", url, params=kwargs.get("params")
+        ).prepare().url
+        key = self.cache.key(full_url, {**self.headers, **headers})
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            cached_headers = CaseInsensitiveDict(cached[0])
+            if "ETag" in cached_headers:
+                headers["If-None-Match"] = cached_headers["ETag"]
+            if "Last-Modified" in cached_headers:
+                headers["If-Modified-Since"] = cached_headers["Last-Modified"]
+
+        response = super().request(method, url, headers=headers, **kwargs)
+
+        if response.status_code == 304 and cached is not None:
+            self.cache.hits += 1
+            # The 304 carries fresh rate limit headers, the cached response everything else
+            cached_headers.update(response.headers)
+            response.status_code = 200
+            response.reason = "OK"
+            response.headers = cached_headers
+            response._content = cached[1]
+            response.encoding = requests.utils.get_encoding_from_headers(cached_headers)
+            return response
+
+        self.cache.misses += 1
+        if response.status_code == 200 and (
+            "ETag" in response.headers or "Last-Modified" in response.headers
+        ):
+            self.cache.put(key, response.headers, response.content)
+
+        return response
+
+
+def get_github_session() -> CachingSession:
+    """
+    Get the process-wide session GitHub requests go through. It keeps up to
+    GITHUB_MAX_CONCURRENCY connections per host alive, so requests skip the TCP and TLS
+    handshakes, and retries idempotent requests that fail to connect or get a 502/503/504.
+    GETs are conditional on a persistent ResponseCache, see CachingSession.
+    """
+    global _session
+
+    with _lock:
+        if _session is None:
+            retries = Retry(
+                total=GITHUB_MAX_RETRIES,
+                backoff_factor=GITHUB_RETRY_BACKOFF_SECONDS,
+                status_forcelist=[502, 503, 504],
+                allowed_methods=["GET", "HEAD"],
+                raise_on_status=False,
+            )
+            adapter = HTTPAdapter(
+                pool_connections=GITHUB_MAX_CONCURRENCY,
+                pool_maxsize=GITHUB_MAX_CONCURRENCY,
+                max_retries=retries,
+            )
+            _session = CachingSession(ResponseCache())
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+
+        return _session
+
+
+def github_cache_stats() -> Dict[str, float]:
+    """
+    Get the hit/miss counters of the GitHub response cache, hits being GETs answered with
+    304 Not Modified.
+    """
+    return get_github_session().cache.stats()
+
+
+def github_map(fn: Callable[[T], R], items: Iterable[T]) -> Iterator[R]:
+    """
+    Apply fn (typically a GitHub request) to items concurrently, with at most
+    GITHUB_MAX_CONCURRENCY calls in flight across the process. Results come in the order of
+    items, and the first exception raised by fn is raised when its result is reached.
+
+    fn must not call github_map itself, since it runs on the threads github_map waits for.
+    """
+    global _executor
+
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=GITHUB_MAX_CONCURRENCY, thread_name_prefix="github"
+            )
+
+    return _executor.map(fn, items)
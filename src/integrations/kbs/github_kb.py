@@ -1,24 +1,52 @@
 import os
 import tqdm
 import json
+import asyncio
 import traceback
 import time
 from uuid import UUID
 import requests
 import logging
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Container, Dict, Iterator, List, Any, Optional, Tuple
+from collections import Counter
+from itertools import islice
 from pydantic import BaseModel
 from bs4 import BeautifulSoup
 from datetime import datetime
 
 from src.integrations.cleaners.traceback_cleaner import TracebackCleaner
 from src.integrations.kbs.base_kb import BaseKnowledgeBase, KnowledgeBaseResponse
+from src.integrations.kbs.context_packer import ContextPacker, ContextHit
+from src.integrations.kbs.github_http import get_github_session, github_map
+from src.integrations.kbs.github_graphql import (
+    ISSUES_QUERY,
+    ISSUE_COMMENTS_QUERY,
+    graphql_issue_to_json,
+)
+from src.integrations.kbs.github_archive import (
+    SKIPPED_EXTENSIONS,
+    is_indexable,
+    read_archive,
+)
 from src.model.code import CodePage, CodePageType
-from include.constants import INDEX_WITH_GREPTILE, GITHUB_API_BASE, GITFILES_CACHE_DIR
+from include.constants import (
+    INDEX_WITH_GREPTILE,
+    GITHUB_API_BASE,
+    GITFILES_CACHE_DIR,
+    ARCHIVE_FETCH_MIN_FILES,
+    INDEX_BATCH_FILES,
+    GITHUB_GRAPHQL_URL,
+    GITHUB_GRAPHQL_ISSUES_PAGE_SIZE,
+    GITHUB_GRAPHQL_COMMENTS_PAGE_SIZE,
+    HYBRID_CANDIDATES_MULTIPLIER,
+    CODE,
+)
 from src.model.issue import Issue, Comment
 from src.model.news import News, NewsSource
 
-from src.storage.vector import VectorDB
+from src.storage.lexical import get_lexical_index, reciprocal_rank_fusion
+from src.storage.dedup import get_dedup_index
+from src.storage.vector import VectorDB, AsyncVectorDB, get_vector_db
 
 
 class Repository(BaseModel):
@@ -27,6 +55,17 @@ class Repository(BaseModel):
     branch: str = "main"
 
 
+class RepositoryManifest(BaseModel):
+    """
+    What was last indexed from a repository, to only fetch and embed what changed since.
+    """
+
+    commit: str  # Sha of the indexed commit
+    tree: str  # Sha of its root tree
+    files: Dict[str, str] = {}  # Path -> blob sha of each indexed file
+    chunks: Dict[str, int] = {}  # Path -> number of chunks the file is stored as
+
+
 class LinkGithubRequest(BaseModel):
     org_id: UUID
     org_name: str
@@ -42,6 +81,7 @@ class GithubKnowledgeBase(BaseKnowledgeBase):
         org_id: UUID,
         org_name: str,
         repos: Optional[List[Repository]] = None,
+        vector_db: Optional[VectorDB] = None,
     ):
         """
         Initialize Github integration for an organization
@@ -49,6 +89,7 @@ class GithubKnowledgeBase(BaseKnowledgeBase):
         Args:
             org_id: Organization ID to scope the integration
             org_name: Organization name for GitHub API calls
+            vector_db: Vector db to search and index code with. Defaults to the org's shared one.
         """
         super().__init__(org_id)
         self.org_name = org_name
@@ -68,9 +109,13 @@ class GithubKnowledgeBase(BaseKnowledgeBase):
             "Accept": "application/vnd.github.v3+json",
             "X-GitHub-Api-Version": "2022-11-28",
         }
+        self.session = get_github_session()
         self.repos = repos
-        self.vector_db = VectorDB(self.org_id)
+        self.vector_db = vector_db or get_vector_db(self.org_id)
+        self.async_vector_db = AsyncVectorDB(self.vector_db)
+        self.lexical_index = get_lexical_index(self.org_id)
         self.traceback_cleaner = TracebackCleaner(self.vector_db)
+        self.context_packer = ContextPacker()
 
     def get_github_token(self, org_id: str) -> str:
         """
@@ -88,7 +133,7 @@ class GithubKnowledgeBase(BaseKnowledgeBase):
 
         try:
             url = f"{GITHUB_URL}/trending"
-            response = requests.get(url)
+            response = self.session.get(url)
             soup = BeautifulSoup(response.content, "html.parser")
 
             # Find all repository articles
@@ -104,7 +149,7 @@ class GithubKnowledgeBase(BaseKnowledgeBase):
                 description = description.text.strip() if description else ""
 
                 # Get readme content
-                readme_response = requests.get(
+                readme_response = self.session.get(
                     f"{GITHUB_API_BASE}/repos{relative_url}/README.md",
                     headers={"Accept": "application/vnd.github.raw"},
                 )
@@ -170,6 +215,7 @@ class GithubKnowledgeBase(BaseKnowledgeBase):
         labels: Optional[List[str]] = None,
         fetch_comments: bool = True,
         include_prs: bool = False,
+        since: Optional[str] = None,
     ) -> Dict[str, Any]:
         """
         Get all issues (excluding pull requests) for some provided repository.
@@ -178,8 +224,12 @@ class GithubKnowledgeBase(BaseKnowledgeBase):
             repo_name: Name of repository to fetch issues from
             state: Optional filter for issue state (open, closed)
             labels: Optional list of label names to filter issues by
-            fetch_comments: Whether to fetch comments for each issue
+            fetch_comments: Whether to fetch comments for each issue. Issues without any get an
+                empty list, without a request.
             include_prs: Whether to include pull requests in the response
+            since: Only get issues updated at or after this time (e.g. "2024-01-01T00:00:00Z"),
+                least recently updated first. Each next page is queried from the last update time
+                of the previous one rather than by number, see below.
         """
         if "github.com" in repo_name:
             repo_name = "/".join(repo_name.split("/")[-2:])
@@ -190,13 +240,46 @@ class GithubKnowledgeBase(BaseKnowledgeBase):
         params = {"per_page": 100, "page": 1}
         if state is not None:
             params["state"] = state
+        if since is not None:
+            params.update(since=since, sort="updated", direction="asc")
 
         url = f"{GITHUB_API_BASE}/repos/{self.org_name}/{repo_name}/issues"
 
+        def fetch_comments_of(issue: Dict[str, Any]) -> Dict[str, Any]:
+            """
+            Fetch the comments of an issue.
+            """
+            # The list gives the number of comments, so issues without any need no request
+            if not issue.get("comments"):
+                issue["comments"] = []
+                return issue
+
+            for _ in range(3):
+                try:
+                    comments_response = self.session.get(
+                        issue["comments_url"], headers=self.github_headers
+                    )
+                    comments_response.raise_for_status()
+
+                    # Add comments to the issue object
+                    issue["comments"] = comments_response.json()
+                    break
+                except requests.exceptions.Timeout as e:
+                    logging.error(
+                        f"request timed out or was rate limited. Sleeping for a few secs then retrying. {e}"
+                    )
+                    logging.error(traceback.format_exc())
+                    time.sleep(10)
+
+            return issue
+
         all_issues = []
+        seen = set()
         while True:
             try:
-                response = requests.get(url, headers=self.github_headers, params=params)
+                response = self.session.get(
+                    url, headers=self.github_headers, params=params
+                )
                 response.raise_for_status()
                 content = response.json()
             except (
@@ -209,73 +292,149 @@ class GithubKnowledgeBase(BaseKnowledgeBase):
                     logging.warning(f"Request failed for {url}: {str(e)}")
                 content = []
 
-            # Filter out pull requests from the response
+            # Filter out issues already returned by a previous page, pull requests, and issues
+            # without any of the labels, which the list already gives
             issues = [
-                issue for issue in content if include_prs or "pull_request" not in issue
+                issue
+                for issue in content
+                if issue["id"] not in seen
+                and (include_prs or "pull_request" not in issue)
+                and (
+                    labels is None
+                    or set(labels).intersection(
+                        label["name"] for label in issue.get("labels", [])
+                    )
+                )
             ]
-            final_issues = []
-
-            # Fetch comments for each issue
-            for i in tqdm.tqdm(
-                range(len(issues)),
-                desc=f"Fetching comments and/or labels for {len(issues)} issues",
-            ):
-
-                # Get labels if they exist, and remove this from the set if it doesn't satisfy label constraints
-                issue_number = issues[i]["number"]
-                comments_url = issues[i]["comments_url"]
-                if fetch_comments:
-                    try:
-                        comments_response = requests.get(
-                            comments_url, headers=self.github_headers
-                        )
-                        comments_response.raise_for_status()
-
-                        # Add comments to the issue object
-                        issues[i]["comments"] = comments_response.json()
-                    except (
-                        requests.exceptions.Timeout,
-                        requests.exceptions.ReadTimeout,
-                        requests.exceptions.ConnectTimeout,
-                    ) as e:  # TODO this handler and catch is untested.
-                        logging.error(
-                            f"request timed out or was rate limited. Sleeping for a few secs then retrying. {e}"
-                        )
-                        logging.error(traceback.format_exc())
-                        time.sleep(10)
-                        i -= 1
-
-                should_add = True
-                if labels is not None:
-                    should_add = False
-
-                    for _ in range(3):
-                        try:
-                            issue_labels = set(self.get_labels(issue_number, url))
-                            break
-                        except Exception as e:
-                            logging.error(
-                                f"Failed to get labels for issue {issue_number}: {str(e)}. Sleeping for 10 seconds."
-                            )
-                            logging.error(traceback.format_exc())
-                            time.sleep(10)
-
-                    if set(labels).intersection(issue_labels):
-                        should_add = True
 
-                if should_add:
-                    final_issues.append(issues[i])
+            # Fetch the comments of the page's issues concurrently
+            if fetch_comments:
+                issues = tqdm.tqdm(
+                    github_map(fetch_comments_of, issues),
+                    total=len(issues),
+                    desc=f"Fetching comments for {len(issues)} issues",
+                )
 
-            all_issues.extend(final_issues)
+            all_issues.extend(issues)
+            seen.update(issue["id"] for issue in content)
 
             # Check if we've received all issues
             if len(content) < params["per_page"]:
                 break
 
-            params["page"] += 1
+            # Sorted by update time, an issue updated while paging moves past the pages left,
+            # shifting the others back, so the next numbered page would skip one. Querying again
+            # from the last update time seen only repeats issues instead. A full page updated all
+            # at that time can't move it forward, so then the next page is taken by number.
+            last_updated = content[-1]["updated_at"]
+            if since is not None and last_updated != params["since"]:
+                params.update(since=last_updated, page=1)
+            else:
+                params["page"] += 1
 
         return all_issues
 
+    def graphql(self, query: str, variables: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Run a query against the GitHub GraphQL API.
+
+        Returns:
+            Dict[str, Any]: The data of the response
+        """
+        response = self.session.post(
+            GITHUB_GRAPHQL_URL,
+            headers=self.github_headers,
+            json={"query": query, "variables": variables},
+        )
+        response.raise_for_status()
+
+        result = response.json()
+        if result.get("errors"):
+            raise Exception(f"GraphQL query failed: {result['errors']}")
+
+        return result["data"]
+
+    def get_all_issues_graphql(
+        self,
+        repo_name: str,
+        state: Optional[str] = None,
+        labels: Optional[List[str]] = None,
+        fetch_comments: bool = True,
+    ) -> List[Dict[str, Any]]:
+        """
+        Get all issues (excluding pull requests) of a repository like get_all_issues_json, in the
+        same REST-shaped dicts, but in bulk GraphQL queries: one per
+        GITHUB_GRAPHQL_ISSUES_PAGE_SIZE issues with their labels and first
+        GITHUB_GRAPHQL_COMMENTS_PAGE_SIZE comments, plus one per further page of comments of
+        issues with more.
+
+        Args:
+            repo_name: Name of repository to fetch issues from, or its url
+            state: Optional filter for issue state (open, closed, all). Defaults to open, like
+                the REST API.
+            labels: Optional list of label names, issues with any of them are fetched
+            fetch_comments: Whether to fetch comments for each issue
+        """
+        if "github.com" in repo_name:
+            repo_name = "/".join(repo_name.split("/")[-2:])
+        owner, name = (
+            repo_name.split("/") if "/" in repo_name else (self.org_name, repo_name)
+        )
+
+        states = {
+            None: ["OPEN"],
+            "open": ["OPEN"],
+            "closed": ["CLOSED"],
+            "all": ["OPEN", "CLOSED"],
+        }[state]
+        variables = {
+            "owner": owner,
+            "name": name,
+            "states": states,
+            "labels": labels,
+            "pageSize": GITHUB_GRAPHQL_ISSUES_PAGE_SIZE,
+            "commentsPageSize": GITHUB_GRAPHQL_COMMENTS_PAGE_SIZE,
+            "withComments": fetch_comments,
+            "after": None,
+        }
+
+        nodes = []
+        while True:
+            issues = self.graphql(ISSUES_QUERY, variables)["repository"]["issues"]
+            nodes.extend(issues["nodes"])
+            logging.info(f"Fetched {len(nodes)} issues from {owner}/{name}")
+
+            if not issues["pageInfo"]["hasNextPage"]:
+                break
+            variables["after"] = issues["pageInfo"]["endCursor"]
+
+        if not fetch_comments:
+            return [graphql_issue_to_json(node, f"{owner}/{name}") for node in nodes]
+
+        def all_comments(node: Dict[str, Any]) -> List[Dict[str, Any]]:
+            """
+            Get all the comments of an issue, fetching the pages after the first one.
+            """
+            comments = node["comments"]
+            fetched = list(comments["nodes"])
+            while comments["pageInfo"]["hasNextPage"]:
+                comments = self.graphql(
+                    ISSUE_COMMENTS_QUERY,
+                    {
+                        "id": node["id"],
+                        "commentsPageSize": GITHUB_GRAPHQL_COMMENTS_PAGE_SIZE,
+                        "after": comments["pageInfo"]["endCursor"],
+                    },
+                )["node"]["comments"]
+                fetched.extend(comments["nodes"])
+
+            return fetched
+
+        return [
+            graphql_issue_to_json(node, f"{owner}/{name}", comments)
+            for node, comments in zip(nodes, github_map(all_comments, nodes))
+        ]
+
     def get_labels(self, issue_number: int, base_url: str) -> List[str]:
         """
         Get the labels for an issue.
@@ -283,7 +442,7 @@ class GithubKnowledgeBase(BaseKnowledgeBase):
         Accepts a base url to the issues endpoint (e.g. https://api.github.com/repos/{org_name}/{repo_name}/issues), and the issue number.
         """
         label_url = f"{base_url}/{issue_number}/labels"
-        label_response = requests.get(label_url, headers=self.github_headers)
+        label_response = self.session.get(label_url, headers=self.github_headers)
         label_response.raise_for_status()
 
         return [label["name"] for label in label_response.json()]
@@ -306,7 +465,7 @@ class GithubKnowledgeBase(BaseKnowledgeBase):
         page = 1
         repos = []
         while True:
-            response = requests.get(
+            response = self.session.get(
                 url, headers=self.github_headers, params={"per_page": 100, "page": page}
             )
             if response.status_code != 200:
@@ -323,15 +482,22 @@ class GithubKnowledgeBase(BaseKnowledgeBase):
         # Trim to max_repos if we exceeded it
         repos = repos[:max_repos]
 
-        repos_rv = {}
-        for github_repo in repos:
-            # Skip if repo_names is specified and this repo is not in the list
-            if repo_names and github_repo["name"] not in repo_names:
-                continue
-
-            url = f"{self.api_base}/repositories/{github_repo['id']}"
-            response = requests.get(url, headers=self.github_headers)
+        # Skip if repo_names is specified and this repo is not in the list
+        repos = [
+            github_repo
+            for github_repo in repos
+            if not repo_names or github_repo["name"] in repo_names
+        ]
+        responses = github_map(
+            lambda github_repo: self.session.get(
+                f"{self.api_base}/repositories/{github_repo['id']}",
+                headers=self.github_headers,
+            ),
+            repos,
+        )
 
+        repos_rv = {}
+        for response in responses:
             if response.status_code == 200:
                 repo_data = response.json()
                 name = repo_data["repository"]
@@ -370,7 +536,7 @@ class GithubKnowledgeBase(BaseKnowledgeBase):
 
     def get_files(self, repository: str) -> List[CodePage]:
         """
-        Get a list of all the files' contents in the repo by recursively fetching from GitHub API
+        Get a list of all the files' contents in the repo's default branch, from its archive
 
         Args:
             repository: Repository name
@@ -378,31 +544,10 @@ class GithubKnowledgeBase(BaseKnowledgeBase):
         Returns:
             List of CodePage objects containing file contents and metadata
         """
-        code_pages = []
-
-        # 1. Get all the files in the repo from cache if already exists
-        # TODO get and cache the current sha so you can track changes
-        # if os.path.exists(f"{GITFILES_CACHE_DIR}/{repository}"):
-        #     with open(f"{GITFILES_CACHE_DIR}/{repository}", "r") as f:
-        #         code_json = json.load(f)
-        #         code_pages = [
-        #             CodePage(**code_page) for code_page in code_json["code_pages"]
-        #         ]
-        #     return code_pages
-        logging.info(f"Fetching and indexing contents for {repository}")
+        logging.info(f"Fetching contents for {repository}")
 
         try:
-            self.fetch_contents(repository, code_pages)
-
-            # Cache the files for future use
-            os.makedirs(GITFILES_CACHE_DIR, exist_ok=True)
-            with open(f"{GITFILES_CACHE_DIR}/{repository}", "w") as f:
-                code_json = {
-                    "code_pages": [code_page.model_dump() for code_page in code_pages]
-                }
-                json.dump(code_json, f)
-
-            return code_pages
+            return list(self.stream_archive(repository))
 
         except Exception as e:
             logging.error(f"Failed to fetch repository contents: {str(e)}")
@@ -425,7 +570,7 @@ class GithubKnowledgeBase(BaseKnowledgeBase):
             path: Current path being fetched
         """
         url = f"{GITHUB_API_BASE}/repos/{self.org_name}/{repository}/contents/{path}"
-        response = requests.get(url, headers=self.github_headers)
+        response = self.session.get(url, headers=self.github_headers)
         response.raise_for_status()
 
         contents = response.json()
@@ -434,37 +579,37 @@ class GithubKnowledgeBase(BaseKnowledgeBase):
         if not isinstance(contents, list):
             contents = [contents]
 
+        def download(item: Dict[str, Any]) -> str:
+            """
+            Get raw file content
+            """
+            content_response = self.session.get(
+                item["download_url"], headers=self.github_headers
+            )
+            content_response.raise_for_status()
+            return content_response.text
+
+        # If file is non-text data, skip it
+        files = [
+            item
+            for item in contents
+            if item["type"] == "file"
+            and not item["name"].lower().endswith(SKIPPED_EXTENSIONS)
+        ]
+        # Download the files of the directory concurrently
+        downloaded = dict(
+            zip([item["path"] for item in files], github_map(download, files))
+        )
+
         for item in contents:
             if item["type"] == "file":
-                # If file is non-text data, skip it
-                if (
-                    item["name"]
-                    .lower()
-                    .endswith(
-                        (
-                            ".png",
-                            ".jpg",
-                            ".jpeg",
-                            ".gif",
-                            ".bmp",
-                            ".tiff",
-                            ".ico",
-                            ".webp",
-                        )
-                    )
-                ):
+                if item["path"] not in downloaded:
                     continue
 
-                # Get raw file content
-                content_response = requests.get(
-                    item["download_url"], headers=self.github_headers
-                )
-                content_response.raise_for_status()
-
                 code_pages.append(
                     CodePage(
                         primary_key=item["path"],
-                        content=content_response.text,
+                        content=downloaded[item["path"]],
                         org_id=str(self.org_id),
                         page_type=CodePageType.CODE,
                         sha=item["sha"],
@@ -486,19 +631,289 @@ class GithubKnowledgeBase(BaseKnowledgeBase):
                     )
                 self.fetch_contents(repository, code_pages, item["path"], include_dirs)
 
+    def manifest_path(self, repository: str) -> str:
+        """
+        Path of the manifest of what was last indexed from a repository of this org.
+        """
+        return os.path.join(
+            GITFILES_CACHE_DIR, str(self.org_id), self.org_name, f"{repository}.json"
+        )
+
+    def load_manifest(self, repository: str) -> Optional[RepositoryManifest]:
+        """
+        Load the manifest of a repository, or None if it was never indexed.
+        """
+        path = self.manifest_path(repository)
+        if not os.path.exists(path):
+            return None
+
+        with open(path, "r") as f:
+            return RepositoryManifest(**json.load(f))
+
+    def save_manifest(self, repository: str, manifest: RepositoryManifest):
+        """
+        Persist the manifest of a repository, replacing the previous one atomically.
+        """
+        path = self.manifest_path(repository)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(f"{path}.tmp", "w") as f:
+            f.write(manifest.model_dump_json())
+        os.replace(f"{path}.tmp", path)
+
+    def get_head(self, repository: str, branch: str) -> Tuple[str, str]:
+        """
+        Get the sha of the latest commit on a branch and of its root tree.
+        """
+        url = f"{GITHUB_API_BASE}/repos/{self.org_name}/{repository}/commits/{branch}"
+        response = self.session.get(url, headers=self.github_headers)
+        response.raise_for_status()
+
+        commit = response.json()
+        return commit["sha"], commit["commit"]["tree"]["sha"]
+
+    def get_tree(self, repository: str, tree: str, prefix: str = "") -> Dict[str, str]:
+        """
+        Get the path and blob sha of every text file in a tree, listing the whole tree in one
+        request when GitHub doesn't truncate it, and directory by directory otherwise.
+
+        Args:
+            repository: Repository name
+            tree: Sha of the tree
+            prefix: Path of the tree in the repository
+
+        Returns:
+            Dict[str, str]: Path -> blob sha
+        """
+        url = f"{GITHUB_API_BASE}/repos/{self.org_name}/{repository}/git/trees/{tree}"
+        response = self.session.get(
+            url, headers=self.github_headers, params={"recursive": "1"}
+        )
+        response.raise_for_status()
+        listing = response.json()
+
+        if listing.get("truncated"):
+            response = self.session.get(url, headers=self.github_headers)
+            response.raise_for_status()
+            listing = response.json()
+
+        files = {}
+        for item in listing["tree"]:
+            path = f"{prefix}{item['path']}"
+            if item["type"] == "blob":
+                if not path.lower().endswith(SKIPPED_EXTENSIONS):
+                    files[path] = item["sha"]
+            elif item["type"] == "tree" and listing.get("truncated"):
+                files.update(self.get_tree(repository, item["sha"], f"{path}/"))
+
+        return files
+
+    def fetch_blobs(self, repository: str, files: Dict[str, str]) -> Iterator[CodePage]:
+        """
+        Fetch the contents of files by blob sha, one request per file, concurrently.
+
+        Args:
+            repository: Repository name
+            files: Path -> blob sha of the files to fetch
+
+        Yields:
+            CodePage: The indexable files (see is_indexable)
+        """
+        headers = {**self.github_headers, "Accept": "application/vnd.github.raw+json"}
+
+        def fetch(sha: str) -> bytes:
+            url = f"{GITHUB_API_BASE}/repos/{self.org_name}/{repository}/git/blobs/{sha}"
+            response = self.session.get(url, headers=headers)
+            response.raise_for_status()
+            return response.content
+
+        for (path, sha), content in zip(files.items(), github_map(fetch, files.values())):
+            if not is_indexable(path, content):
+                continue
+
+            yield CodePage(
+                primary_key=path,
+                content=content.decode("utf8", errors="replace"),
+                org_id=str(self.org_id),
+                page_type=CodePageType.CODE,
+                sha=sha,
+            )
+            logging.info(f"Fetched code file: {path}")
+
+    def stream_archive(
+        self,
+        repository: str,
+        ref: Optional[str] = None,
+        paths: Optional[Container[str]] = None,
+    ) -> Iterator[CodePage]:
+        """
+        Stream the files of a repository from its tarball, downloaded in a single request and
+        decompressed on the fly, see read_archive.
+
+        Args:
+            repository: Repository name
+            ref: Commit, branch or tag to get the files at. Defaults to the default branch.
+            paths: Only read the files with these paths
+        """
+        url = f"{GITHUB_API_BASE}/repos/{self.org_name}/{repository}/tarball"
+        if ref is not None:
+            url = f"{url}/{ref}"
+
+        with self.session.get(
+            url, headers=self.github_headers, stream=True
+        ) as response:
+            response.raise_for_status()
+            # Only matters if the archive is sent with a Content-Encoding; read_archive
+            # decompresses the archive itself
+            response.raw.decode_content = True
+            yield from read_archive(response.raw, str(self.org_id), paths)
+
+    def fetch_files(
+        self, repository: str, commit: str, files: Dict[str, str]
+    ) -> Iterator[CodePage]:
+        """
+        Fetch the contents of files at a commit: blob by blob for a few files, and from the
+        archive of the commit for more than ARCHIVE_FETCH_MIN_FILES.
+
+        Args:
+            repository: Repository name
+            commit: Sha of the commit
+            files: Path -> blob sha of the files to fetch
+        """
+        if len(files) > ARCHIVE_FETCH_MIN_FILES:
+            return self.stream_archive(repository, commit, files)
+
+        return self.fetch_blobs(repository, files)
+
+    def reindex_orphans(self) -> List[Tuple[str, str]]:
+        """
+        Ingest again the files holding duplicates whose canonical chunk was changed or removed
+        (see DedupIndex.pop_orphans), in every repository of this org with a manifest, at its
+        indexed commit. Their content isn't stored anywhere anymore, so they would be missing
+        from search until their own repository changes. Chunks that failed to be stored are
+        orphans too, so they are retried here. Orphans of files no longer in their repository's
+        manifest, or that the files no longer produce, are forgotten.
+
+        Returns:
+            List[Tuple[str, str]]: The (primary key, content) of the chunks stored
+        """
+        dedup_index = get_dedup_index(self.org_id, CODE)
+        stored = []
+        for source, keys in dedup_index.orphans_by_source().items():
+            manifest = self.load_manifest(source) if source is not None else None
+            if manifest is None:
+                continue
+
+            paths = {key.rsplit("-", 1)[0] for key in keys}
+            files = {path: manifest.files[path] for path in paths if path in manifest.files}
+            dedup_index.remove(
+                [key for key in keys if key.rsplit("-", 1)[0] not in files]
+            )
+            if not files:
+                continue
+
+            logging.info(
+                f"Re-indexing {len(files)} files of {source} with orphaned duplicates"
+            )
+            chunks = [
+                (page, key, chunk)
+                for page in self.fetch_files(source, manifest.commit, files)
+                for key, chunk in self.vector_db.code_chunks(page)
+            ]
+            stored += self.vector_db.add_code_chunks(chunks, source=source)
+            # Orphans the files no longer produce (e.g. they stopped being indexable). Those
+            # that failed to be stored again stay orphans, for the next index.
+            produced = {key for _, key, _ in chunks}
+            dedup_index.remove([key for key in keys if key not in produced])
+
+        dedup_index.save()
+        return stored
+
     def index_custom(self, repository: Repository) -> bool:
         """
-        Get a list of all the files in the repo, index each file with the vector DB
+        Sync the index with the head of the repository's branch. Only the files added or modified
+        since the last indexed commit (see RepositoryManifest) are fetched and embedded, and the
+        chunks of deleted files are removed, so re-indexing after a small push is cheap. The
+        first index of a repository, or one without a manifest, fetches every file.
         """
 
         try:
-            # 1. Get all the files in the repo
-            files = self.get_files(repository.repository)
+            name = repository.repository
+            dedup_index = get_dedup_index(self.org_id, CODE)
+
+            # 1. Diff the tree of the head commit against the manifest of the last index
+            manifest = self.load_manifest(name)
+            commit, tree = self.get_head(name, repository.branch)
+            if manifest is not None and manifest.commit == commit:
+                logging.info(f"{name} is already indexed at {commit}")
+                # Its duplicates may still have been orphaned by changes to other repositories
+                stored = self.reindex_orphans()
+                if stored:
+                    self.lexical_index.update(dict(stored))
+                    self.lexical_index.save()
+                return True
+
+            indexed = manifest.files if manifest is not None else {}
+            chunk_counts = dict(manifest.chunks) if manifest is not None else {}
+            files = self.get_tree(name, tree)
+            changed = {
+                path: sha for path, sha in files.items() if indexed.get(path) != sha
+            }
+            deleted = [path for path in indexed if path not in files]
+            logging.info(
+                f"Syncing {name} to {commit}: {len(changed)} added or modified, {len(deleted)} deleted files"
+            )
 
-            # 2. Add each file to the vector db
-            for file in tqdm.tqdm(files, desc=f"Indexing code files for {repository}"):
-                self.vector_db.add_code_file(file)
+            # 2. Remove the chunks of deleted files
+            removed = [
+                f"{path}-{i}" for path in deleted for i in range(chunk_counts.pop(path, 0))
+            ]
+            self.vector_db.remove_code_chunks(removed)
+
+            # 3. Stream the changed files into the vector db in batches, embedding and upserting
+            # their chunks in bulk
+            pages = self.fetch_files(name, commit, changed)
+            stored, new_counts = [], Counter()
+            while batch := list(islice(pages, INDEX_BATCH_FILES)):
+                chunks = [
+                    (page, key, chunk)
+                    for page in batch
+                    for key, chunk in self.vector_db.code_chunks(page)
+                ]
+                new_counts.update(page.primary_key for page, _, _ in chunks)
+                logging.info(f"Indexing {len(batch)} code files for {repository}")
+                stored += self.vector_db.add_code_chunks(chunks, source=name)
+
+            # 4. Remove the chunks past the end of shrunk files, and of files no longer indexable
+            stale = []
+            for path in changed:
+                stale.extend(
+                    f"{path}-{i}"
+                    for i in range(new_counts[path], chunk_counts.get(path, 0))
+                )
+                chunk_counts[path] = new_counts[path]
+            self.vector_db.remove_code_chunks(stale)
+            removed += stale
+
+            self.save_manifest(
+                name,
+                RepositoryManifest(
+                    commit=commit, tree=tree, files=files, chunks=chunk_counts
+                ),
+            )
+
+            # 5. Duplicates of removed or changed chunks lost their stored content, in this
+            # repository or others, and chunks that failed to embed have none, so their files
+            # are ingested again
+            stored += self.reindex_orphans()
 
+            # 6. Index the same chunks lexically, for exact identifier matches. Duplicates are only
+            # searchable through the chunk they're linked to, and orphans not at all until they
+            # are stored again.
+            self.lexical_index.remove(
+                [*removed, *dedup_index.links.keys(), *dedup_index.orphans]
+            )
+            self.lexical_index.update(dict(stored))
+            self.lexical_index.save()
             return True
         except Exception as e:
             logging.error(f"Failed to index repository: {str(e)}")
@@ -575,7 +990,7 @@ class GithubKnowledgeBase(BaseKnowledgeBase):
             logging.error(f"Failed to query repositories: {str(e)}")
             return [], ""
 
-    def __query_custom(
+    async def __query_custom(
         self,
         query: str,
         limit: int = 5,
@@ -594,39 +1009,129 @@ class GithubKnowledgeBase(BaseKnowledgeBase):
                       String answer to the query
         """
         try:
-            og_repos = self.repos
-            if git_repo is not None:
-                self.repos = [
-                    Repository(remote="github.com", repository=git_repo, branch="main")
-                ]
-                # TODO: Add the repo to the vector db if not there already.
-
-            query_vector = self.vector_db.vanilla_embed(query)
-            results = self.vector_db.get_top_k_code(limit, query_vector)
-
-            response = "<code_pages>"
-            for result in results.values():
-                code_page = CodePage(**json.loads(result["metadata"]))
-                similarity = result["similarity"]
-
-                response += f"<code_page_{code_page.primary_key}_similarity>{similarity}</code_page_{code_page.primary_key}_similarity>"
-                response += f"<code_page_{code_page.primary_key}_content>{code_page.content}</code_page_{code_page.primary_key}_content>"
-
-            if tb is not None:
-                cleaned_results = self.traceback_cleaner.clean(tb)
-                response += f"{json.dumps([step.model_dump() for step in cleaned_results])}"  # TODO not sure if we should surround this with tags? also untested rn.
+            # TODO: Scope the search to git_repo, and add the repo to the vector db if not there already.
+            query_vector = await self.async_vector_db.embed_query(query)
+            results = await self.async_vector_db.get_top_k_code(
+                limit * HYBRID_CANDIDATES_MULTIPLIER, query_vector
+            )
+            results = await self.afuse_with_lexical(query, results, limit, tb)
 
-            response += "</code_pages>"
-            self.repos = og_repos
+            # Cleaning the traceback scans code pages with the blocking client
+            response = (
+                await asyncio.to_thread(self.format_results, results, tb, query)
+                if tb is not None
+                else self.format_results(results, query=query)
+            )
             return [], response
 
         except Exception as e:
             logging.error(f"Failed to query documentation: {str(e)}")
             logging.error(traceback.format_exc())
-            self.repos = og_repos
             return [], str(e)
 
-    def query(
+    def __lexical_ranking(
+        self,
+        query: str,
+        vector_results: Dict[str, Any],
+        limit: int,
+        tb: Optional[str] = None,
+    ) -> Optional[List[Tuple[str, float]]]:
+        """
+        Fuse the ranking of a vector search with a BM25 search over the same code chunks by
+        reciprocal rank fusion.
+
+        Returns:
+            Optional[List[Tuple[str, float]]]: The best limit (key, fused score) pairs, or None if
+                no chunk matches the query lexically
+        """
+        lexical_query = f"{query} {tb}" if tb else query
+        lexical_hits = self.lexical_index.search(
+            lexical_query, limit * HYBRID_CANDIDATES_MULTIPLIER
+        )
+        if not lexical_hits:
+            return None
+
+        return reciprocal_rank_fusion(
+            [list(vector_results.keys()), [key for key, _ in lexical_hits]]
+        )[:limit]
+
+    async def afuse_with_lexical(
+        self,
+        query: str,
+        vector_results: Dict[str, Any],
+        limit: int,
+        tb: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Fuse vector search results with a BM25 search over the same code chunks by reciprocal rank
+        fusion. Identifiers in the traceback, if any, are part of the lexical query.
+
+        Args:
+            query: The search query
+            vector_results: The {id: {similarity, metadata}} mapping of a vector search, best first.
+                Should hold more than limit candidates, see HYBRID_CANDIDATES_MULTIPLIER.
+            limit: The number of fused results to keep
+            tb: Optional traceback of the search
+
+        Returns:
+            Dict[str, Any]: The best limit chunks in the same form, with their fused score as similarity
+        """
+        fused = self.__lexical_ranking(query, vector_results, limit, tb)
+        if fused is None:
+            return dict(list(vector_results.items())[:limit])
+
+        lexical_only = await self.async_vector_db.get_code_chunks(
+            [key for key, _ in fused if key not in vector_results]
+        )
+        results = {**vector_results, **lexical_only}
+        return {
+            key: {**results[key], "similarity": score}
+            for key, score in fused
+            if key in results
+        }
+
+    def format_results(
+        self, results: Dict[str, Any], tb: Optional[str] = None, query: str = ""
+    ) -> str:
+        """
+        Format the results of a code search into the string handed to the agent, within the
+        context packer's token budget.
+
+        Args:
+            results: The {id: {similarity, metadata}} mapping returned by VectorDB.get_top_k_code
+            tb: Optional traceback whose referenced code should be appended
+            query: The search query, whose terms each chunk is trimmed around. Identifiers in the
+                traceback count as query terms too.
+
+        Returns:
+            str: The formatted code pages
+        """
+        hits = []
+        for result in results.values():
+            code_page = CodePage(**json.loads(result["metadata"]))
+            sections = [("content", code_page.content)]
+            if code_page.start_line is not None:
+                sections.insert(
+                    0, ("lines", f"{code_page.start_line}-{code_page.end_line}")
+                )
+            hits.append(
+                ContextHit(
+                    tag=f"code_page_{code_page.primary_key}",
+                    similarity=result["similarity"],
+                    sections=sections,
+                )
+            )
+
+        extra = ""
+        if tb is not None:
+            cleaned_results = self.traceback_cleaner.clean(tb)
+            extra = f"{json.dumps([step.model_dump() for step in cleaned_results])}"  # TODO not sure if we should surround this with tags? also untested rn.
+
+        return self.context_packer.pack(
+            f"{query} {tb}" if tb else query, hits, "code_pages", extra
+        )
+
+    async def aquery(
         self,
         query: str,
         limit: int = 5,
@@ -646,9 +1151,9 @@ class GithubKnowledgeBase(BaseKnowledgeBase):
                       String answer to the query)
         """
         if INDEX_WITH_GREPTILE:
-            return self.__query_greptile(query, limit)
+            return await asyncio.to_thread(self.__query_greptile, query, limit)
         else:
-            return self.__query_custom(query, limit, tb, git_repo)
+            return await self.__query_custom(query, limit, tb, git_repo)
 
     def get_readme(self, repo_name: str) -> str:
         """
@@ -663,11 +1168,11 @@ class GithubKnowledgeBase(BaseKnowledgeBase):
         url = f"{GITHUB_API_BASE}/repos/{repo_name}/contents/README.md"
 
         try:
-            response = requests.get(url, headers=self.github_headers)
+            response = self.session.get(url, headers=self.github_headers)
             response.raise_for_status()
 
             content = response.json()
-            readme_response = requests.get(
+            readme_response = self.session.get(
                 content["download_url"], headers=self.github_headers
             )
             readme_response.raise_for_status()
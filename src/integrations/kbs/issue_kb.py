@@ -1,8 +1,8 @@
 from src.integrations.kbs.base_kb import BaseKnowledgeBase, KnowledgeBaseResponse
-from typing import List, Tuple, Optional
-from src.storage.vector import VectorDB
+from src.integrations.kbs.context_packer import ContextPacker, ContextHit
+from typing import Any, Dict, List, Tuple, Optional
+from src.storage.vector import VectorDB, AsyncVectorDB, get_vector_db
 from src.model.issue import Issue
-from anthropic import Anthropic
 from logger import logger
 from uuid import UUID
 import traceback
@@ -15,15 +15,21 @@ class IssueKnowledgeBase(BaseKnowledgeBase):
     Handles both Merge.dev API tickets and Issue model representations.
     """
 
-    def __init__(self, org_id: UUID):
+    def __init__(self, org_id: UUID, vector_db: Optional[VectorDB] = None):
         """
         Initialize issue knowledge base for an organization
 
         Args:
             org_id: Organization ID to scope the knowledge base
+            vector_db: Vector db to search and index with. Defaults to the org's shared one.
         """
         super().__init__(org_id)
-        self.vector_db = VectorDB(org_id)
+        self.vector_db = vector_db or get_vector_db(org_id)
+        self.async_vector_db = AsyncVectorDB(self.vector_db)
+        self.context_packer = ContextPacker()
+
+        from anthropic import Anthropic
+
         self.client = Anthropic()
 
     async def index(self, data: Issue = None) -> bool:
@@ -47,7 +53,7 @@ class IssueKnowledgeBase(BaseKnowledgeBase):
             logger.error(f"Failed to index issues: {str(e)}")
             return False
 
-    def query(
+    async def aquery(
         self, query: str, limit: int = 5, tb: Optional[str] = None, **kwargs
     ) -> Tuple[List[KnowledgeBaseResponse], str]:
         """
@@ -62,23 +68,41 @@ class IssueKnowledgeBase(BaseKnowledgeBase):
                       String answer to the query)
         """
         try:
-            query_vector = self.vector_db.vanilla_embed(query)
-            issues = self.vector_db.get_top_k_issues(limit, query_vector)
-            response = "<issues>"
-            for result in issues.values():
-                issue = Issue(**json.loads(result["metadata"]))
-                similarity = result["similarity"]
-
-                response += f"<issue_{issue.ticket_number}_similarity>{similarity}</issue_{issue.ticket_number}_similarity>"
-                response += f"<issue_{issue.ticket_number}_content>{issue.description}</issue_{issue.ticket_number}_content>"
-
-                comments = [comment.model_dump_json() for comment in issue.comments]
-                response += f"<issue_{issue.ticket_number}_comments>{comments}</issue_{issue.ticket_number}_comments>"
-
-            response += "</issues>"
-            return [], response
+            query_vector = await self.async_vector_db.embed_query(query)
+            issues = await self.async_vector_db.get_top_k_issues(limit, query_vector)
+            return [], self.format_results(issues, query)
 
         except Exception as e:
             logger.error(f"Failed to query issues: {str(e)}")
             logger.error(traceback.format_exc())
             return []
+
+    def format_results(self, issues: Dict[str, Any], query: str = "") -> str:
+        """
+        Format the results of an issue search into the string handed to the agent, within the
+        context packer's token budget.
+
+        Args:
+            issues: The {id: {similarity, metadata}} mapping returned by VectorDB.get_top_k_issues
+            query: The search query, whose terms each issue is trimmed around
+
+        Returns:
+            str: The formatted issues
+        """
+        hits = []
+        for result in issues.values():
+            issue = Issue(**json.loads(result["metadata"]))
+            comments = [comment.model_dump_json() for comment in issue.comments]
+
+            hits.append(
+                ContextHit(
+                    tag=f"issue_{issue.ticket_number}",
+                    similarity=result["similarity"],
+                    sections=[
+                        ("content", issue.description),
+                        ("comments", "\n".join(comments)),
+                    ],
+                )
+            )
+
+        return self.context_packer.pack(query, hits, "issues")
@@ -48,7 +48,7 @@ class RedditKnowledgeBase(BaseKnowledgeBase):
             logging.error(f"Failed to index Reddit data: {str(e)}")
             return False
 
-    def query(
+    async def aquery(
         self, query: str, limit: int = 5, tb: Optional[str] = None, **kwargs
     ) -> Tuple[List[KnowledgeBaseResponse], str]:
         """
@@ -0,0 +1,55 @@
+from src.integrations.kbs.documentation_kb import DocumentationKnowledgeBase
+from src.integrations.kbs.github_kb import GithubKnowledgeBase, Repository
+from src.integrations.kbs.issue_kb import IssueKnowledgeBase
+from src.integrations.kbs.web_kb import WebKnowledgeBase
+from src.storage.vector import get_vector_db
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+import threading
+
+
+class KnowledgeBaseSet:
+    """
+    The knowledge bases of an org, all backed by the org's shared vector db.
+    """
+
+    def __init__(
+        self, org_id: UUID, org_name: str, repos: Optional[List[Repository]] = None
+    ):
+        self.vector_db = get_vector_db(org_id)
+        self.github = GithubKnowledgeBase(
+            org_id=org_id, org_name=org_name, repos=repos, vector_db=self.vector_db
+        )
+        self.issue_kb = IssueKnowledgeBase(org_id, vector_db=self.vector_db)
+        self.documentation_kb = DocumentationKnowledgeBase(
+            org_id, vector_db=self.vector_db
+        )
+        self.web_kb = WebKnowledgeBase(org_id)
+
+
+_knowledge_bases: Dict[Tuple[UUID, str, Tuple[str, ...]], KnowledgeBaseSet] = {}
+_knowledge_bases_lock = threading.Lock()
+
+
+def get_knowledge_bases(
+    org_id: UUID, org_name: str, repos: Optional[List[Repository]] = None
+) -> KnowledgeBaseSet:
+    """
+    Get the knowledge bases of an org, built once per process and shared across threads.
+
+    Args:
+        org_id: Organization ID to scope the knowledge bases
+        org_name: Organization name for GitHub API calls
+        repos: The github repos the code knowledge base searches
+    """
+    key = (
+        org_id,
+        org_name,
+        tuple(f"{repo.remote}/{repo.repository}@{repo.branch}" for repo in repos or []),
+    )
+
+    with _knowledge_bases_lock:
+        if key not in _knowledge_bases:
+            _knowledge_bases[key] = KnowledgeBaseSet(org_id, org_name, repos)
+
+        return _knowledge_bases[key]
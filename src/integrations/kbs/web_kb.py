@@ -1,6 +1,7 @@
 from typing import Any, Coroutine, List, Tuple
 from uuid import UUID
 import requests
+import asyncio
 import json
 import os
 
@@ -51,7 +52,7 @@ class WebKnowledgeBase(BaseKnowledgeBase):
         response = requests.post(EXA_SEARCH_URL, headers=self.headers, json=payload)
         return response.json()
 
-    def query(
+    async def aquery(
         self, query: str, limit: int = 5, tb: str | None = None, **kwargs
     ) -> Tuple[List[KnowledgeBaseResponse], str]:
         """
@@ -66,7 +67,7 @@ class WebKnowledgeBase(BaseKnowledgeBase):
             Tuple[List[KnowledgeBaseResponse], str]: The results and the table used.
         """
 
-        results = self.exa_request_wrapper(query)
+        results = await asyncio.to_thread(self.exa_request_wrapper, query)
         return [], json.dumps(results["results"][:limit])
 
     def index(self, data: Any) -> Coroutine[Any, Any, bool]:
@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from enum import StrEnum
-from typing import List
+from typing import List, Optional
 from e2b.sandbox.commands.command_handle import CommandResult
 
 
@@ -15,6 +15,8 @@ class CodePage(BaseModel):
     org_id: str
     page_type: CodePageType
     sha: str
+    start_line: Optional[int] = None  # Lines of the file a chunk spans, from 1
+    end_line: Optional[int] = None
 
 
 class ExecutionResult(BaseModel):
@@ -1,4 +1,5 @@
 from pydantic import BaseModel
+from typing import Optional
 from uuid import UUID
 
 
@@ -6,3 +7,5 @@ class DocumentationPage(BaseModel):
     primary_key: str  # This ends up being a cryptographic hash, so str is fine.
     url: str
     content: str
+    start_line: Optional[int] = None  # Lines of the page a chunk spans, from 1
+    end_line: Optional[int] = None
@@ -2,7 +2,6 @@ from pydantic import BaseModel, HttpUrl, EmailStr, UUID4
 from typing import Optional, List, Tuple
 from uuid import UUID
 from datetime import datetime
-from discord.message import Attachment
 
 
 class Comment(BaseModel):
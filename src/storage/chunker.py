@@ -0,0 +1,295 @@
+from include.constants import (
+    CHUNK_MAX_TOKENS,
+    CHUNK_OVERLAP_TOKENS,
+    CHUNK_MIN_FILL,
+    CHARS_PER_TOKEN_ESTIMATE,
+)
+from src.storage.tokens import count_tokens
+from typing import Callable, Dict, List, Optional, Tuple
+from pydantic import BaseModel
+import ast
+import re
+import os
+
+# Boundary strengths, strongest first. A chunk is cut at the strongest boundary that leaves it at
+# least CHUNK_MIN_FILL full.
+TOP_LEVEL = 0  # Top-level definitions, first-level headings, issue comments
+NESTED = 1  # Methods, nested definitions, deeper headings
+STATEMENT = 2  # Other top-level statements
+PARAGRAPH = 3  # Blank lines
+
+PYTHON_EXTENSIONS = {".py", ".pyi"}
+SCRIPT_EXTENSIONS = {".ts", ".tsx", ".js", ".jsx", ".mjs", ".cjs"}
+MARKDOWN_EXTENSIONS = {".md", ".mdx", ".markdown"}
+
+SCRIPT_DECLARATION_PATTERN = re.compile(
+    r"^(export\s+)?(default\s+)?(declare\s+)?(async\s+)?(abstract\s+)?"
+    r"(function\*?|class|interface|type|enum|const|let|var|namespace|module)\b"
+)
+SCRIPT_MEMBER_PATTERN = re.compile(
+    r"^\s+(public\s+|private\s+|protected\s+|static\s+|readonly\s+|async\s+|get\s+|set\s+)*"
+    r"[A-Za-z_$][\w$]*\s*(<[^>]*>)?\s*\([^;]*$"
+)
+MARKDOWN_HEADING_PATTERN = re.compile(r"^(#{1,6})\s")
+MARKDOWN_FENCE_PATTERN = re.compile(r"^\s*(```|~~~)")
+LINE_PATTERN = re.compile(r"[^\n]*\n|[^\n]+$")
+
+
+class Chunk(BaseModel):
+    """
+    A piece of a document small enough to embed, with where it comes from.
+    """
+
+    text: str
+    path: Optional[str] = None  # File path, url or issue the chunk is from
+    start_line: int  # First line of the chunk in the document, from 1
+    end_line: int  # Last line of the chunk in the document, inclusive
+
+
+def split_lines(text: str) -> List[str]:
+    """
+    Split text into lines, keeping their newlines. Unlike str.splitlines, only newlines end a line,
+    so line numbers match those of the ast module and editors.
+    """
+    return LINE_PATTERN.findall(text)
+
+
+def blank_line_boundaries(lines: List[str]) -> Dict[int, int]:
+    """
+    Mark the line after each run of blank lines as a paragraph boundary.
+    """
+    return {
+        i: PARAGRAPH
+        for i in range(1, len(lines))
+        if lines[i].strip() and not lines[i - 1].strip()
+    }
+
+
+def python_boundaries(lines: List[str]) -> Dict[int, int]:
+    """
+    Mark where top-level and nested definitions (with their decorators and the comments right
+    above them) and other top-level statements start. Falls back to blank lines for code that
+    doesn't parse.
+    """
+    try:
+        tree = ast.parse("".join(lines))
+    except (SyntaxError, ValueError):
+        return blank_line_boundaries(lines)
+
+    boundaries = blank_line_boundaries(lines)
+
+    def mark(node: ast.AST, level: int):
+        decorators = getattr(node, "decorator_list", [])
+        start = min([node.lineno] + [decorator.lineno for decorator in decorators]) - 1
+        while start > 0 and lines[start - 1].lstrip().startswith("#"):
+            start -= 1
+        boundaries[start] = min(level, boundaries.get(start, PARAGRAPH))
+
+    definitions = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+    for node in tree.body:
+        mark(node, TOP_LEVEL if isinstance(node, definitions) else STATEMENT)
+        if isinstance(node, ast.ClassDef):
+            for child in node.body:
+                if isinstance(child, definitions):
+                    mark(child, NESTED)
+
+    return boundaries
+
+
+def script_boundaries(lines: List[str]) -> Dict[int, int]:
+    """
+    Mark where TypeScript/JavaScript declarations start: unindented ones as top-level, indented
+    method-like ones as nested. Comment and decorator lines right above a declaration go with it.
+    """
+    boundaries = blank_line_boundaries(lines)
+    for i, line in enumerate(lines):
+        if SCRIPT_DECLARATION_PATTERN.match(line):
+            level = TOP_LEVEL
+        elif SCRIPT_MEMBER_PATTERN.match(line) and not line.lstrip().startswith(
+            ("if", "for", "while", "switch", "return", "catch")
+        ):
+            level = NESTED
+        else:
+            continue
+
+        start = i
+        while start > 0 and lines[start - 1].lstrip().startswith(
+            ("//", "/*", "*", "@")
+        ):
+            start -= 1
+        boundaries[start] = min(level, boundaries.get(start, PARAGRAPH))
+
+    return boundaries
+
+
+def markdown_boundaries(lines: List[str]) -> Dict[int, int]:
+    """
+    Mark where headings start, first- and second-level ones as top-level. Headings inside fenced
+    code blocks are ignored.
+    """
+    boundaries = blank_line_boundaries(lines)
+    in_fence = False
+    for i, line in enumerate(lines):
+        if MARKDOWN_FENCE_PATTERN.match(line):
+            in_fence = not in_fence
+            continue
+
+        heading = MARKDOWN_HEADING_PATTERN.match(line)
+        if heading and not in_fence:
+            boundaries[i] = TOP_LEVEL if len(heading.group(1)) <= 2 else NESTED
+        elif in_fence:
+            boundaries.pop(i, None)
+
+    return boundaries
+
+
+def boundaries_for_path(path: Optional[str]) -> Callable[[List[str]], Dict[int, int]]:
+    """
+    Get the boundary finder for a file path, by extension.
+    """
+    extension = os.path.splitext(path or "")[1].lower()
+    if extension in PYTHON_EXTENSIONS:
+        return python_boundaries
+    elif extension in SCRIPT_EXTENSIONS:
+        return script_boundaries
+    elif extension in MARKDOWN_EXTENSIONS:
+        return markdown_boundaries
+
+    return blank_line_boundaries
+
+
+class Chunker:
+    """
+    Splits documents into chunks of at most max_tokens tokens, cutting at syntactic boundaries:
+    definitions in Python (through its AST) and TypeScript/JavaScript, headings in markdown, and
+    comments in issues. Lines are packed greedily, and each chunk is cut at the strongest boundary
+    that leaves it at least CHUNK_MIN_FILL full. Chunks that had to be cut at an arbitrary line
+    start with the last overlap_tokens of the previous chunk, so no statement loses its context.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = CHUNK_MAX_TOKENS,
+        overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+    ):
+        """
+        Args:
+            max_tokens: Tokens per chunk
+            overlap_tokens: Tokens repeated from the previous chunk when a chunk is cut mid-unit
+        """
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+
+    def chunk(self, text: str, path: Optional[str] = None) -> List[Chunk]:
+        """
+        Chunk a file, picking the splitter by the extension of its path.
+        """
+        lines = split_lines(text)
+        return self.__pack(lines, boundaries_for_path(path)(lines), path)
+
+    def chunk_markdown(self, text: str, path: Optional[str] = None) -> List[Chunk]:
+        """
+        Chunk a markdown document (e.g. a documentation page) by headings.
+        """
+        lines = split_lines(text)
+        return self.__pack(lines, markdown_boundaries(lines), path)
+
+    def chunk_issue(
+        self, description: str, comments: List[str], path: Optional[str] = None
+    ) -> List[Chunk]:
+        """
+        Chunk an issue, cutting between its description and comments first.
+        """
+        lines, boundaries = [], {}
+        for part in [description, *comments]:
+            part_lines = split_lines(part) or ["\n"]
+            if not part_lines[-1].endswith("\n"):
+                part_lines[-1] += "\n"
+
+            offset = len(lines)
+            for i, level in blank_line_boundaries(part_lines).items():
+                boundaries[offset + i] = level
+            if offset:
+                boundaries[offset] = TOP_LEVEL
+            lines.extend(part_lines)
+
+        return self.__pack(lines, boundaries, path)
+
+    def __split_long_lines(self, lines: List[str]) -> List[Tuple[str, int]]:
+        """
+        Split lines that can't fit in a chunk on their own (minified code, single-line pages) into
+        pieces, keeping the line number of each piece.
+        """
+        max_chars = self.max_tokens * CHARS_PER_TOKEN_ESTIMATE
+        pieces = []
+        for number, line in enumerate(lines):
+            for start in range(0, max(len(line), 1), max_chars):
+                pieces.append((line[start : start + max_chars], number))
+
+        return pieces
+
+    def __pack(
+        self, lines: List[str], boundaries: Dict[int, int], path: Optional[str]
+    ) -> List[Chunk]:
+        """
+        Pack lines into chunks of at most max_tokens, see Chunker.
+        """
+        pieces = self.__split_long_lines(lines)
+        if not pieces or not "".join(lines).strip():
+            return []
+
+        tokens = count_tokens([piece for piece, _ in pieces])
+        # Boundaries are per line, so only the first piece of a line can start a chunk there
+        levels = {}
+        for i, (_, number) in enumerate(pieces):
+            if number in boundaries and (i == 0 or pieces[i - 1][1] != number):
+                levels[i] = boundaries[number]
+
+        chunks = []
+        start = 0
+        while start < len(pieces):
+            end, total = start, 0
+            while end < len(pieces) and (
+                end == start or total + tokens[end] <= self.max_tokens
+            ):
+                total += tokens[end]
+                end += 1
+
+            cut, at_boundary = end, end == len(pieces)
+            if not at_boundary:
+                minimum = self.max_tokens * CHUNK_MIN_FILL
+                filled, candidates = 0, []
+                for i in range(start + 1, end + 1):
+                    filled += tokens[i - 1]
+                    if i in levels and filled >= minimum:
+                        candidates.append((levels[i], -i))
+                if candidates:
+                    _, position = min(candidates)
+                    cut, at_boundary = -position, True
+
+            text = "".join(piece for piece, _ in pieces[start:cut])
+            if text.strip():
+                chunks.append(
+                    Chunk(
+                        text=text,
+                        path=path,
+                        start_line=pieces[start][1] + 1,
+                        end_line=pieces[cut - 1][1] + 1,
+                    )
+                )
+
+            if cut >= len(pieces):
+                break
+
+            next_start = cut
+            if not at_boundary:
+                overlap = 0
+                while (
+                    next_start - 1 > start
+                    and overlap + tokens[next_start - 1] <= self.overlap_tokens
+                ):
+                    next_start -= 1
+                    overlap += tokens[next_start]
+            start = next_start
+
+        return chunks
@@ -0,0 +1,400 @@
+from include.constants import (
+    DEDUP_INDEX_DIR,
+    MINHASH_NUM_PERM,
+    MINHASH_BANDS,
+    MINHASH_SHINGLE_SIZE,
+    NEAR_DUPLICATE_THRESHOLD,
+)
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from functools import lru_cache
+from uuid import UUID
+import numpy as np
+import threading
+import logging
+import hashlib
+import json
+import zlib
+import re
+import os
+
+SHINGLE_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+# Universal hashing mod a prime below 2**32, so that a * x + b never overflows a uint64
+MINHASH_PRIME = np.uint64(4294967291)
+MINHASH_SEED = 0
+
+EXACT_DUPLICATE = "exact"
+NEAR_DUPLICATE = "near"
+
+
+def exact_fingerprint(text: str) -> str:
+    """
+    Hash of text with whitespace normalized, equal for chunks differing only in formatting.
+    """
+    return hashlib.sha1(" ".join(text.split()).encode("utf8")).hexdigest()
+
+
+@lru_cache(maxsize=None)
+def minhash_permutations(num_perm: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    The (a, b) coefficients of the num_perm hash functions x -> (a * x + b) mod MINHASH_PRIME.
+    Fixed by MINHASH_SEED, so signatures stay comparable across processes.
+    """
+    rng = np.random.default_rng(MINHASH_SEED)
+    return (
+        rng.integers(1, MINHASH_PRIME, num_perm, dtype=np.uint64),
+        rng.integers(0, MINHASH_PRIME, num_perm, dtype=np.uint64),
+    )
+
+
+def minhash_signature(
+    text: str, num_perm: int = MINHASH_NUM_PERM, shingle_size: int = MINHASH_SHINGLE_SIZE
+) -> np.ndarray:
+    """
+    MinHash signature of the token shingles of text. The share of equal values in the signatures
+    of two texts estimates the Jaccard similarity of their shingle sets.
+    """
+    tokens = SHINGLE_TOKEN_PATTERN.findall(text)
+    shingles = {
+        " ".join(tokens[i : i + shingle_size])
+        for i in range(max(len(tokens) - shingle_size + 1, 1))
+    }
+    hashes = np.fromiter(
+        (zlib.crc32(shingle.encode("utf8")) for shingle in shingles),
+        dtype=np.uint64,
+        count=len(shingles),
+    )
+
+    a, b = minhash_permutations(num_perm)
+    return ((hashes[:, None] * a + b) % MINHASH_PRIME).min(axis=0).astype(np.uint32)
+
+
+class DedupIndex:
+    """
+    Exact and near-duplicate index over the chunks of one org's collection. The first chunk seen
+    with some content is canonical and gets stored; later chunks with the same content (up to
+    whitespace), or with an estimated Jaccard similarity of at least NEAR_DUPLICATE_THRESHOLD,
+    are linked to it instead. Near duplicates are found with LSH over MinHash signatures.
+
+    Persisted under path as JSON metadata and a .npy file of signatures.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        threshold: float = NEAR_DUPLICATE_THRESHOLD,
+        num_perm: int = MINHASH_NUM_PERM,
+        bands: int = MINHASH_BANDS,
+    ):
+        self.path = path
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.lock = threading.RLock()
+
+        self.signatures: Dict[str, np.ndarray] = {}  # Canonical key -> signature
+        self.fingerprints: Dict[str, str] = {}  # Canonical key -> exact fingerprint
+        self.canonical_keys: Dict[str, str] = {}  # Exact fingerprint -> canonical key
+        self.links: Dict[str, Tuple[str, str]] = {}  # Duplicate key -> (canonical key, kind)
+        self.duplicates: Dict[str, Set[str]] = {}  # Canonical key -> keys of duplicates linked to it
+        self.sources: Dict[str, str] = {}  # Key -> source (e.g. repository) it was ingested from
+        self.orphans: Set[str] = set()  # Duplicates whose canonical chunk changed or was removed
+        self.buckets: List[Dict[bytes, Set[str]]] = [{} for _ in range(bands)]
+
+        if path is not None and os.path.exists(os.path.join(path, "index.json")):
+            self.__load()
+
+    def __len__(self) -> int:
+        return len(self.signatures) + len(self.links)
+
+    def __load(self):
+        with open(os.path.join(self.path, "index.json"), "r", encoding="utf8") as fp:
+            data = json.load(fp)
+
+        signatures = np.load(os.path.join(self.path, "signatures.npy"))
+        if len(signatures) != len(data["keys"]):
+            # Only possible if a save was interrupted between its two files
+            logging.error(
+                f"Dedup index at {self.path} has {len(data['keys'])} keys but {len(signatures)} "
+                "signatures, starting from an empty index"
+            )
+            return
+
+        for key, fingerprint, signature in zip(
+            data["keys"], data["fingerprints"], signatures
+        ):
+            self.__register(key, fingerprint, signature)
+
+        for key, link in data["links"].items():
+            self.__link(key, tuple(link))
+        self.sources = data["sources"]
+        self.orphans = set(data["orphans"])
+
+    def save(self):
+        """
+        Persist the index to disk. A no-op for in-memory indexes.
+
+        Each file is written aside and swapped in, so an interrupted save leaves the previous one
+        readable. index.json goes last, the signatures it refers to being in place by then.
+        """
+        if self.path is None:
+            return
+
+        with self.lock:
+            os.makedirs(self.path, exist_ok=True)
+            keys = list(self.signatures)
+            signatures = (
+                np.stack([self.signatures[key] for key in keys])
+                if keys
+                else np.zeros((0, self.num_perm), dtype=np.uint32)
+            )
+            target = os.path.join(self.path, "signatures.npy")
+            with open(f"{target}.tmp", "wb") as fp:
+                np.save(fp, signatures)
+            os.replace(f"{target}.tmp", target)
+
+            target = os.path.join(self.path, "index.json")
+            with open(f"{target}.tmp", "w", encoding="utf8") as fp:
+                json.dump(
+                    {
+                        "keys": keys,
+                        "fingerprints": [self.fingerprints[key] for key in keys],
+                        "links": self.links,
+                        "sources": self.sources,
+                        "orphans": sorted(self.orphans),
+                    },
+                    fp,
+                )
+            os.replace(f"{target}.tmp", target)
+
+    def __band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [
+            signature[band * self.rows : (band + 1) * self.rows].tobytes()
+            for band in range(self.bands)
+        ]
+
+    def __register(self, key: str, fingerprint: str, signature: np.ndarray):
+        """
+        Make a chunk canonical.
+        """
+        self.signatures[key] = signature
+        self.fingerprints[key] = fingerprint
+        self.canonical_keys.setdefault(fingerprint, key)
+        for buckets, band_key in zip(self.buckets, self.__band_keys(signature)):
+            buckets.setdefault(band_key, set()).add(key)
+
+    def __link(self, key: str, link: Tuple[str, str]):
+        """
+        Link a duplicate to its (canonical key, kind), replacing any previous link.
+        """
+        self.__unlink(key)
+        self.links[key] = link
+        self.duplicates.setdefault(link[0], set()).add(key)
+
+    def __unlink(self, key: str):
+        link = self.links.pop(key, None)
+        if link is None:
+            return
+
+        duplicates = self.duplicates.get(link[0])
+        if duplicates is not None:
+            duplicates.discard(key)
+            if not duplicates:
+                del self.duplicates[link[0]]
+
+    def __unregister(self, key: str):
+        """
+        Forget a chunk, canonical or not. Duplicates linked to it become orphans, since their
+        content is no longer stored.
+        """
+        self.__unlink(key)
+        if key not in self.signatures:
+            return
+
+        signature = self.signatures.pop(key)
+        fingerprint = self.fingerprints.pop(key)
+        if self.canonical_keys.get(fingerprint) == key:
+            del self.canonical_keys[fingerprint]
+
+        for buckets, band_key in zip(self.buckets, self.__band_keys(signature)):
+            bucket = buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del buckets[band_key]
+
+        for duplicate in self.duplicates.pop(key, set()):
+            del self.links[duplicate]
+            self.orphans.add(duplicate)
+
+    def find_duplicate(
+        self, text: str, signature: Optional[np.ndarray] = None
+    ) -> Optional[Tuple[str, str]]:
+        """
+        Find a canonical chunk that text duplicates.
+
+        Returns:
+            Optional[Tuple[str, str]]: The (canonical key, EXACT_DUPLICATE or NEAR_DUPLICATE), or
+                None if text is not a duplicate
+        """
+        with self.lock:
+            canonical = self.canonical_keys.get(exact_fingerprint(text))
+            if canonical is not None:
+                return canonical, EXACT_DUPLICATE
+
+            if signature is None:
+                signature = minhash_signature(text, self.num_perm)
+
+            candidates = set()
+            for buckets, band_key in zip(self.buckets, self.__band_keys(signature)):
+                candidates |= buckets.get(band_key, set())
+
+            best, best_similarity = None, self.threshold
+            for candidate in candidates:
+                similarity = float(np.mean(self.signatures[candidate] == signature))
+                if similarity >= best_similarity:
+                    best, best_similarity = candidate, similarity
+
+            return (best, NEAR_DUPLICATE) if best is not None else None
+
+    def deduplicate(
+        self, chunks: List[Tuple[str, str]], source: Optional[str] = None
+    ) -> List[Tuple[str, str]]:
+        """
+        Register chunks, linking those that duplicate a canonical chunk (or an earlier chunk of
+        the same call) to it.
+
+        Args:
+            chunks: (key, text) pairs
+            source: Where the chunks come from, e.g. the repository, for the report
+
+        Returns:
+            List[Tuple[str, str]]: The canonical chunks, the only ones to embed and store
+        """
+        with self.lock:
+            # Chunks whose content changed are forgotten before anything is matched against them
+            for key, text in chunks:
+                fingerprint = self.fingerprints.get(key)
+                if fingerprint is not None and fingerprint != exact_fingerprint(text):
+                    self.__unregister(key)
+
+            canonical = []
+            for key, text in chunks:
+                self.orphans.discard(key)
+                if source is not None:
+                    self.sources[key] = source
+
+                if key in self.signatures:
+                    canonical.append((key, text))
+                    continue
+
+                signature = minhash_signature(text, self.num_perm)
+                duplicate = self.find_duplicate(text, signature)
+                if duplicate is not None and duplicate[0] != key:
+                    self.__link(key, duplicate)
+                    continue
+
+                self.__unlink(key)
+                self.__register(key, exact_fingerprint(text), signature)
+                canonical.append((key, text))
+
+            return canonical
+
+    def remove(self, keys: Iterable[str]):
+        """
+        Forget chunks by key. Duplicates linked to removed canonical chunks become orphans, see
+        pop_orphans.
+        """
+        with self.lock:
+            for key in keys:
+                self.__unregister(key)
+                self.sources.pop(key, None)
+                self.orphans.discard(key)
+
+    def orphan(self, keys: Iterable[str]):
+        """
+        Forget the content of chunks, e.g. those that failed to be stored, keeping them as
+        orphans of their source to ingest again. Duplicates linked to them become orphans too.
+        """
+        with self.lock:
+            for key in keys:
+                self.__unregister(key)
+                self.orphans.add(key)
+
+    def pop_orphans(self, source: Optional[str] = None) -> Set[str]:
+        """
+        Get and clear the keys of duplicates whose canonical chunk changed or was removed. Their
+        content is not stored anywhere anymore, so they need to be ingested again.
+
+        Args:
+            source: Only pop the orphans ingested from this source, e.g. the repository being
+                synced, leaving the others for their own source
+        """
+        with self.lock:
+            orphans = {
+                key
+                for key in self.orphans
+                if source is None or self.sources.get(key) == source
+            }
+            self.orphans -= orphans
+            return orphans
+
+    def orphans_by_source(self) -> Dict[Optional[str], Set[str]]:
+        """
+        Get the keys of the orphans (see pop_orphans) by the source they were ingested from,
+        without clearing them. Ingesting an orphan again clears it.
+        """
+        with self.lock:
+            orphans: Dict[Optional[str], Set[str]] = {}
+            for key in self.orphans:
+                orphans.setdefault(self.sources.get(key), set()).add(key)
+
+            return orphans
+
+    def duplicates_of(self, key: str) -> List[str]:
+        """
+        Get the keys of the chunks linked to a canonical chunk.
+        """
+        with self.lock:
+            return sorted(self.duplicates.get(key, ()))
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        """
+        Get, for each source, how many of its chunks are stored and how many are exact or near
+        duplicates, and its dedup ratio (the share of chunks not stored).
+        """
+        with self.lock:
+            report: Dict[str, Dict[str, float]] = {}
+            rows = [(key, "stored") for key in self.signatures] + [
+                (key, kind) for key, (_, kind) in self.links.items()
+            ]
+            for key, kind in rows:
+                counts = report.setdefault(
+                    self.sources.get(key, "unknown"),
+                    {"chunks": 0, "stored": 0, EXACT_DUPLICATE: 0, NEAR_DUPLICATE: 0},
+                )
+                counts["chunks"] += 1
+                counts[kind] += 1
+
+            for counts in report.values():
+                counts["dedup_ratio"] = round(1 - counts["stored"] / counts["chunks"], 4)
+
+            return report
+
+
+_dedup_indexes: Dict[Tuple[UUID, str], DedupIndex] = {}
+_dedup_indexes_lock = threading.Lock()
+
+
+def get_dedup_index(org_id: UUID, collection_name: str) -> DedupIndex:
+    """
+    Get the dedup index of an org's collection, loaded from DEDUP_INDEX_DIR once per process.
+    """
+    with _dedup_indexes_lock:
+        key = (org_id, collection_name)
+        if key not in _dedup_indexes:
+            _dedup_indexes[key] = DedupIndex(
+                os.path.join(DEDUP_INDEX_DIR, str(org_id), collection_name)
+            )
+
+        return _dedup_indexes[key]
@@ -0,0 +1,267 @@
+from include.constants import (
+    EMBEDDING_CACHE_FILE,
+    EMBEDDING_CACHE_MAX_ENTRIES,
+    QUERY_EMBEDDING_CACHE_MAX_ENTRIES,
+    QUERY_EMBEDDING_CACHE_TTL_SECONDS,
+)
+from typing import Dict, List, Optional, Tuple
+from collections import OrderedDict
+from array import array
+import threading
+import hashlib
+import sqlite3
+import time
+import os
+
+
+class EmbeddingCache:
+    """
+    Persistent, content-addressed cache of embeddings. Entries are keyed by
+    (model name, output dimension, input type, sha256 of the text) and stored as packed
+    float32 blobs in sqlite. Once the cache holds more than max_entries vectors, the least
+    recently used ones are evicted.
+    """
+
+    def __init__(
+        self,
+        path: str = EMBEDDING_CACHE_FILE,
+        max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                dimension INTEGER NOT NULL,
+                input_type TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (model, dimension, input_type, text_hash)
+            )
+            """
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_last_access ON embeddings (last_access)"
+        )
+        self.conn.commit()
+
+        self.num_entries = self.conn.execute(
+            "SELECT COUNT(*) FROM embeddings"
+        ).fetchone()[0]
+
+    @staticmethod
+    def hash_text(text: str) -> str:
+        """
+        Get the content address of a piece of text.
+        """
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get_many(
+        self,
+        model: str,
+        dimension: int,
+        input_type: Optional[str],
+        texts: List[str],
+    ) -> List[Optional[List[float]]]:
+        """
+        Look up the embeddings for a list of texts.
+
+        Returns:
+            List[Optional[List[float]]]: The cached embedding for each text, or None on a miss
+        """
+        hashes = [self.hash_text(text) for text in texts]
+        found: Dict[str, List[float]] = {}
+        now = time.time()
+
+        with self.lock:
+            unique_hashes = list(dict.fromkeys(hashes))
+            # sqlite limits the number of bound parameters, so look keys up in slices
+            for start in range(0, len(unique_hashes), 500):
+                chunk = unique_hashes[start : start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self.conn.execute(
+                    f"""
+                    SELECT text_hash, vector FROM embeddings
+                    WHERE model = ? AND dimension = ? AND input_type = ?
+                    AND text_hash IN ({placeholders})
+                    """,
+                    [model, dimension, input_type or "", *chunk],
+                ).fetchall()
+
+                for text_hash, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[text_hash] = vector.tolist()
+
+            if found:
+                self.conn.executemany(
+                    """
+                    UPDATE embeddings SET last_access = ?
+                    WHERE model = ? AND dimension = ? AND input_type = ? AND text_hash = ?
+                    """,
+                    [
+                        (now, model, dimension, input_type or "", text_hash)
+                        for text_hash in found
+                    ],
+                )
+                self.conn.commit()
+
+            results = [found.get(text_hash) for text_hash in hashes]
+            num_hits = sum(1 for result in results if result is not None)
+            self.hits += num_hits
+            self.misses += len(results) - num_hits
+
+        return results
+
+    def put_many(
+        self,
+        model: str,
+        dimension: int,
+        input_type: Optional[str],
+        texts: List[str],
+        vectors: List[List[float]],
+    ):
+        """
+        Store the embeddings for a list of texts, evicting the least recently used entries if needed.
+        """
+        now = time.time()
+        rows = [
+            (
+                model,
+                dimension,
+                input_type or "",
+                self.hash_text(text),
+                array("f", vector).tobytes(),
+                now,
+            )
+            for text, vector in zip(texts, vectors)
+        ]
+
+        with self.lock:
+            before = self.conn.total_changes
+            self.conn.executemany(
+                """
+                INSERT OR IGNORE INTO embeddings
+                (model, dimension, input_type, text_hash, vector, last_access)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                rows,
+            )
+            self.num_entries += self.conn.total_changes - before
+
+            if self.num_entries > self.max_entries:
+                self.conn.execute(
+                    """
+                    DELETE FROM embeddings WHERE rowid IN (
+                        SELECT rowid FROM embeddings ORDER BY last_access ASC LIMIT ?
+                    )
+                    """,
+                    (self.num_entries - self.max_entries,),
+                )
+                self.num_entries = self.max_entries
+
+            self.conn.commit()
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Get the hit/miss counters of this cache since it was opened.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": self.num_entries,
+        }
+
+
+class QueryEmbeddingCache:
+    """
+    Bounded in-memory LRU cache of query embeddings, keyed by (model name, input type, normalized
+    query). Queries are normalized by collapsing whitespace, so an agent re-asking the same question
+    across knowledge bases or turns reuses the embedding. Entries older than ttl_seconds are
+    treated as misses.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = QUERY_EMBEDDING_CACHE_MAX_ENTRIES,
+        ttl_seconds: Optional[float] = QUERY_EMBEDDING_CACHE_TTL_SECONDS,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.entries: OrderedDict[Tuple[str, str, str], Tuple[float, List[float]]] = (
+            OrderedDict()
+        )
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        """
+        Normalize a query so that it matches the same query with different spacing.
+        """
+        return " ".join(query.split())
+
+    def get(
+        self, model: str, input_type: Optional[str], query: str
+    ) -> Optional[List[float]]:
+        """
+        Get the cached embedding of a query, or None on a miss.
+        """
+        key = (model, input_type or "", self.normalize(query))
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and (
+                self.ttl_seconds is None
+                or time.monotonic() - entry[0] <= self.ttl_seconds
+            ):
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+            if entry is not None:
+                del self.entries[key]
+
+            self.misses += 1
+            return None
+
+    def put(
+        self, model: str, input_type: Optional[str], query: str, vector: List[float]
+    ):
+        """
+        Cache the embedding of a query, evicting the least recently used one if full.
+        """
+        key = (model, input_type or "", self.normalize(query))
+
+        with self.lock:
+            self.entries[key] = (time.monotonic(), vector)
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Get the hit/miss counters of this cache.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self.entries),
+        }
@@ -0,0 +1,78 @@
+from include.constants import (
+    HASHING_EMBED_BIGRAM_WEIGHT,
+    HASHING_EMBED_TRIGRAM_WEIGHT,
+)
+from src.storage.lexical import tokenize_code
+from typing import List, Tuple
+from collections import Counter
+import numpy as np
+import zlib
+
+
+def hashed_features(text: str) -> Tuple[List[int], List[float]]:
+    """
+    Get the hashes and weights of the features of text: its identifier tokens (see
+    tokenize_code), the bigrams of consecutive tokens, and the character trigrams of each token,
+    so that related identifiers like `parse_config` and `ConfigParser` share features. Counts are
+    dampened to 1 + log(count).
+    """
+    tokens = tokenize_code(text)
+    features = Counter()
+    for token in tokens:
+        features[token.encode("utf8")] += 1.0
+    for first, second in zip(tokens, tokens[1:]):
+        features[f"{first} {second}".encode("utf8")] += HASHING_EMBED_BIGRAM_WEIGHT
+    for token in tokens:
+        padded = f"<{token}>"
+        for i in range(len(padded) - 2):
+            features[f"#{padded[i : i + 3]}".encode("utf8")] += (
+                HASHING_EMBED_TRIGRAM_WEIGHT
+            )
+
+    # crc32 rather than hash(), which is salted per process
+    return [zlib.crc32(feature) for feature in features], [
+        1 + np.log(weight) if weight >= 1 else weight for weight in features.values()
+    ]
+
+
+class HashingEmbedder:
+    """
+    Embeds text offline by feature hashing: each feature of the text (see hashed_features) adds
+    its weight to one of dimension buckets, with a sign taken from the same hash so collisions
+    cancel out on average. Vectors are L2-normalized, so cosine similarity measures the overlap
+    of weighted identifiers, bigrams and trigrams.
+
+    Deterministic across processes and machines, with no model to download, so debug runs and
+    benchmarks can index and search end to end without network access. Not a semantic model.
+    """
+
+    def __init__(self, dimension: int):
+        self.dimension = dimension
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed a batch of strings.
+
+        Returns:
+            np.ndarray: A (len(texts), dimension) float32 matrix of unit vectors. Texts without any
+                token get the zero vector.
+        """
+        rows, hashes, weights = [], [], []
+        for row, text in enumerate(texts):
+            text_hashes, text_weights = hashed_features(text)
+            rows.extend([row] * len(text_hashes))
+            hashes.extend(text_hashes)
+            weights.extend(text_weights)
+
+        hashes = np.asarray(hashes, dtype=np.uint32)
+        signs = np.where(hashes >> 31, -1.0, 1.0).astype(np.float32)
+
+        matrix = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        np.add.at(
+            matrix,
+            (np.asarray(rows, dtype=np.int64), (hashes % self.dimension).astype(np.int64)),
+            signs * np.asarray(weights, dtype=np.float32),
+        )
+
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.maximum(norms, 1e-12)
@@ -0,0 +1,252 @@
+from include.constants import LEXICAL_INDEX_DIR, BM25_K1, BM25_B, RRF_K
+from typing import Dict, Iterable, List, Optional, Tuple
+from collections import Counter
+from uuid import UUID
+import numpy as np
+import threading
+import logging
+import json
+import math
+import re
+import os
+
+IDENTIFIER_PATTERN = re.compile(r"[A-Za-z_][A-Za-z0-9_]*|\d+")
+CAMEL_CASE_PATTERN = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+
+
+def tokenize_code(text: str) -> List[str]:
+    """
+    Split text into lowercase identifier tokens. Each identifier is kept whole, and compound ones
+    also yield their snake_case and camelCase parts, so `retrieveContext`, `retrieve_context` and
+    "retrieve the context" all share the tokens retrieve and context.
+    """
+    tokens = []
+    for identifier in IDENTIFIER_PATTERN.findall(text):
+        if len(identifier) > 1:
+            tokens.append(identifier.lower())
+
+        parts = [
+            part.lower()
+            for word in identifier.split("_")
+            for part in CAMEL_CASE_PATTERN.findall(word)
+        ]
+        if len(parts) > 1:
+            tokens.extend(part for part in parts if len(part) > 1)
+
+    return tokens
+
+
+def reciprocal_rank_fusion(
+    rankings: List[List[str]], k: int = RRF_K
+) -> List[Tuple[str, float]]:
+    """
+    Fuse several rankings of the same kind of document into one, scoring each document by the sum of
+    1 / (k + rank) over the rankings it appears in.
+
+    Returns:
+        List[Tuple[str, float]]: (key, fused score) pairs, best first
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking):
+            scores[key] = scores.get(key, 0.0) + 1 / (k + rank + 1)
+
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class LexicalIndex:
+    """
+    BM25 inverted index over code chunks. Postings are stored as flat NumPy arrays (document ids
+    and term frequencies, grouped by term through an offsets array) and persisted under path as
+    .npy files that are memory-mapped back in.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.lock = threading.RLock()
+
+        self.terms: Dict[str, int] = {}
+        self.keys: List[str] = []
+        self.key_index: Dict[str, int] = {}
+        self.offsets = np.zeros((1,), dtype=np.int64)
+        self.postings = np.zeros((0,), dtype=np.int32)
+        self.tfs = np.zeros((0,), dtype=np.uint16)
+        self.lengths = np.zeros((0,), dtype=np.int32)
+
+        if path is not None and os.path.exists(os.path.join(path, "terms.json")):
+            self.__load()
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __load(self):
+        with open(os.path.join(self.path, "terms.json"), "r", encoding="utf8") as fp:
+            self.terms = {term: i for i, term in enumerate(json.load(fp))}
+        with open(os.path.join(self.path, "keys.json"), "r", encoding="utf8") as fp:
+            self.keys = json.load(fp)
+
+        self.key_index = {key: i for i, key in enumerate(self.keys)}
+        for name in ["offsets", "postings", "tfs", "lengths"]:
+            setattr(
+                self,
+                name,
+                np.load(os.path.join(self.path, f"{name}.npy"), mmap_mode="r"),
+            )
+
+    def save(self):
+        """
+        Persist the index to disk. A no-op for in-memory indexes.
+        """
+        if self.path is None:
+            return
+
+        with self.lock:
+            os.makedirs(self.path, exist_ok=True)
+            with open(os.path.join(self.path, "terms.json"), "w", encoding="utf8") as fp:
+                json.dump(list(self.terms), fp)
+            with open(os.path.join(self.path, "keys.json"), "w", encoding="utf8") as fp:
+                json.dump(self.keys, fp)
+
+            # Written aside and swapped in, since the current arrays may be memory-mapped from the
+            # files being replaced
+            for name in ["offsets", "postings", "tfs", "lengths"]:
+                target = os.path.join(self.path, f"{name}.npy")
+                with open(f"{target}.tmp", "wb") as fp:
+                    np.save(fp, getattr(self, name))
+                os.replace(f"{target}.tmp", target)
+
+        logging.info(f"Saved lexical index of {len(self.keys)} chunks to {self.path}")
+
+    def __posting_terms(self) -> np.ndarray:
+        """
+        Get the term id of every posting.
+        """
+        return np.repeat(
+            np.arange(len(self.offsets) - 1, dtype=np.int64), np.diff(self.offsets)
+        )
+
+    def __set_postings(
+        self, terms: np.ndarray, postings: np.ndarray, tfs: np.ndarray
+    ):
+        """
+        Replace the postings, grouping them by term.
+        """
+        order = np.argsort(terms, kind="stable")
+        self.postings = postings[order].astype(np.int32)
+        self.tfs = tfs[order].astype(np.uint16)
+        self.offsets = np.concatenate(
+            [[0], np.cumsum(np.bincount(terms, minlength=len(self.terms)))]
+        ).astype(np.int64)
+
+    def remove(self, keys: Iterable[str]):
+        """
+        Remove chunks from the index by key. Unknown keys are ignored.
+        """
+        with self.lock:
+            positions = [self.key_index[key] for key in keys if key in self.key_index]
+            if not positions:
+                return
+
+            keep = np.ones((len(self.keys),), dtype=bool)
+            keep[positions] = False
+            remap = np.cumsum(keep) - 1
+
+            mask = keep[self.postings]
+            self.__set_postings(
+                self.__posting_terms()[mask],
+                remap[self.postings[mask]],
+                self.tfs[mask],
+            )
+
+            self.keys = [key for key, kept in zip(self.keys, keep) if kept]
+            self.key_index = {key: i for i, key in enumerate(self.keys)}
+            self.lengths = np.asarray(self.lengths)[keep]
+
+    def update(self, docs: Dict[str, str]):
+        """
+        Index chunks, replacing any already indexed under the same key.
+
+        Args:
+            docs: Mapping of chunk key to chunk text
+        """
+        with self.lock:
+            self.remove(docs.keys())
+
+            terms, postings, tfs, lengths = [], [], [], []
+            for key, text in docs.items():
+                counts = Counter(tokenize_code(text))
+                doc = len(self.keys)
+                self.keys.append(key)
+                self.key_index[key] = doc
+                lengths.append(sum(counts.values()))
+
+                for term, tf in counts.items():
+                    terms.append(self.terms.setdefault(term, len(self.terms)))
+                    postings.append(doc)
+                    tfs.append(min(tf, np.iinfo(np.uint16).max))
+
+            self.__set_postings(
+                np.concatenate(
+                    [self.__posting_terms(), np.asarray(terms, dtype=np.int64)]
+                ),
+                np.concatenate([self.postings, np.asarray(postings, dtype=np.int32)]),
+                np.concatenate([self.tfs, np.asarray(tfs, dtype=np.uint16)]),
+            )
+            self.lengths = np.concatenate(
+                [self.lengths, np.asarray(lengths, dtype=np.int32)]
+            )
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        """
+        Get the k chunks with the highest BM25 score for a query.
+
+        Returns:
+            List[Tuple[str, float]]: (chunk key, score) pairs, best first. Chunks sharing no token
+                with the query are never returned.
+        """
+        with self.lock:
+            num_docs = len(self.keys)
+            if num_docs == 0:
+                return []
+
+            lengths = np.asarray(self.lengths, dtype=np.float32)
+            norms = BM25_K1 * (1 - BM25_B + BM25_B * lengths / max(lengths.mean(), 1))
+            scores = np.zeros((num_docs,), dtype=np.float32)
+
+            for token in set(tokenize_code(query)):
+                term = self.terms.get(token)
+                if term is None:
+                    continue
+
+                start, end = self.offsets[term], self.offsets[term + 1]
+                if start == end:
+                    continue
+
+                docs = self.postings[start:end]
+                tf = self.tfs[start:end].astype(np.float32)
+                idf = math.log(1 + (num_docs - (end - start) + 0.5) / (end - start + 0.5))
+                scores[docs] += idf * tf * (BM25_K1 + 1) / (tf + norms[docs])
+
+            matches = np.flatnonzero(scores)
+            if len(matches) > k:
+                matches = matches[np.argpartition(-scores[matches], k - 1)[:k]]
+            matches = matches[np.argsort(-scores[matches])]
+
+            return [(self.keys[i], float(scores[i])) for i in matches]
+
+
+_lexical_indexes: Dict[UUID, LexicalIndex] = {}
+_lexical_indexes_lock = threading.Lock()
+
+
+def get_lexical_index(org_id: UUID) -> LexicalIndex:
+    """
+    Get the lexical code index of an org, loaded from LEXICAL_INDEX_DIR once per process.
+    """
+    with _lexical_indexes_lock:
+        if org_id not in _lexical_indexes:
+            _lexical_indexes[org_id] = LexicalIndex(
+                os.path.join(LEXICAL_INDEX_DIR, str(org_id))
+            )
+
+        return _lexical_indexes[org_id]
@@ -0,0 +1,682 @@
+"""
+    In-process stand-in for the subset of the MilvusClient API that VectorDB uses. Vectors live in a
+    NumPy matrix per collection (persisted as memory-mappable .npy files), search is exact cosine
+    top-k, and filters use the same boolean expression syntax we send to Milvus.
+"""
+
+from typing import Any, Callable, Dict, List, Optional
+import numpy as np
+import threading
+import logging
+import weakref
+import atexit
+import json
+import re
+import os
+
+# Names of the pymilvus DataType members that mark a vector field, and the NumPy dtype they are
+# stored as (None for the client's default). Matched by name so that this module doesn't have to
+# import pymilvus.
+VECTOR_DTYPES = {
+    "FLOAT_VECTOR": None,
+    "FLOAT16_VECTOR": "float16",
+    "BFLOAT16_VECTOR": None,
+    "INT8_VECTOR": "int8",
+}
+
+TOKEN_PATTERN = re.compile(
+    r"""\s*(?:
+        (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+        |(?P<number>-?\d+(?:\.\d+)?)
+        |(?P<op>==|!=|>=|<=|>|<|\(|\)|\[|\]|,)
+        |(?P<word>[A-Za-z_][A-Za-z0-9_]*)
+    )""",
+    re.VERBOSE,
+)
+
+
+class FilterParser:
+    """
+    Compiles the Milvus boolean expressions VectorDB builds (==, !=, <, >, in, like, and, or, not)
+    into a predicate over a row dict.
+    """
+
+    def __init__(self, expr: str):
+        self.tokens = self.__tokenize(expr)
+        self.pos = 0
+
+    def __tokenize(self, expr: str) -> List[tuple]:
+        tokens = []
+        pos = 0
+        expr = expr.strip()
+        while pos < len(expr):
+            match = TOKEN_PATTERN.match(expr, pos)
+            if match is None or match.end() == pos:
+                raise ValueError(f"Unsupported filter expression: {expr}")
+
+            kind = match.lastgroup
+            value = match.group(kind)
+            if kind == "string":
+                value = value[1:-1].encode().decode("unicode_escape")
+            elif kind == "number":
+                value = float(value) if "." in value else int(value)
+            elif kind == "word" and value.lower() in ("and", "or", "not", "in", "like"):
+                kind, value = "keyword", value.lower()
+
+            tokens.append((kind, value))
+            pos = match.end()
+
+        return tokens
+
+    def __peek(self) -> Optional[tuple]:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def __next(self) -> tuple:
+        token = self.__peek()
+        if token is None:
+            raise ValueError("Unexpected end of filter expression")
+        self.pos += 1
+        return token
+
+    def __expect(self, kind: str, value: Any = None) -> tuple:
+        token = self.__next()
+        if token[0] != kind or (value is not None and token[1] != value):
+            raise ValueError(f"Expected {value or kind} in filter, got {token[1]}")
+        return token
+
+    def parse(self) -> Callable[[Dict[str, Any]], bool]:
+        if not self.tokens:
+            return lambda row: True
+
+        predicate = self.__parse_or()
+        if self.__peek() is not None:
+            raise ValueError(f"Unexpected token in filter: {self.__peek()[1]}")
+
+        return predicate
+
+    def __parse_or(self) -> Callable:
+        left = self.__parse_and()
+        while self.__peek() == ("keyword", "or"):
+            self.__next()
+            right = self.__parse_and()
+            left = (lambda l, r: lambda row: l(row) or r(row))(left, right)
+        return left
+
+    def __parse_and(self) -> Callable:
+        left = self.__parse_not()
+        while self.__peek() == ("keyword", "and"):
+            self.__next()
+            right = self.__parse_not()
+            left = (lambda l, r: lambda row: l(row) and r(row))(left, right)
+        return left
+
+    def __parse_not(self) -> Callable:
+        if self.__peek() == ("keyword", "not"):
+            self.__next()
+            inner = self.__parse_not()
+            return lambda row: not inner(row)
+
+        if self.__peek() == ("op", "("):
+            self.__next()
+            inner = self.__parse_or()
+            self.__expect("op", ")")
+            return inner
+
+        return self.__parse_comparison()
+
+    def __parse_value(self) -> Any:
+        kind, value = self.__next()
+        if kind in ("string", "number"):
+            return value
+        if kind == "word" and value in ("true", "false", "True", "False"):
+            return value.lower() == "true"
+        raise ValueError(f"Expected a literal in filter, got {value}")
+
+    def __parse_comparison(self) -> Callable:
+        _, field = self.__expect("word")
+        kind, op = self.__next()
+
+        if (kind, op) == ("keyword", "not"):
+            self.__expect("keyword", "in")
+            values = set(self.__parse_list())
+            return lambda row: row.get(field) not in values
+
+        if (kind, op) == ("keyword", "in"):
+            values = set(self.__parse_list())
+            return lambda row: row.get(field) in values
+
+        if (kind, op) == ("keyword", "like"):
+            pattern = self.__parse_value()
+            regex = re.compile(
+                "^"
+                + ".*".join(re.escape(part) for part in pattern.split("%"))
+                + "$",
+                re.DOTALL,
+            )
+            return lambda row: isinstance(row.get(field), str) and bool(
+                regex.match(row[field])
+            )
+
+        if kind != "op":
+            raise ValueError(f"Unsupported operator in filter: {op}")
+
+        value = self.__parse_value()
+        comparisons = {
+            "==": lambda a: a == value,
+            "!=": lambda a: a != value,
+            ">": lambda a: a is not None and a > value,
+            "<": lambda a: a is not None and a < value,
+            ">=": lambda a: a is not None and a >= value,
+            "<=": lambda a: a is not None and a <= value,
+        }
+        if op not in comparisons:
+            raise ValueError(f"Unsupported operator in filter: {op}")
+
+        compare = comparisons[op]
+        return lambda row: compare(row.get(field))
+
+    def __parse_list(self) -> List[Any]:
+        self.__expect("op", "[")
+        values = []
+        while self.__peek() != ("op", "]"):
+            values.append(self.__parse_value())
+            if self.__peek() == ("op", ","):
+                self.__next()
+        self.__expect("op", "]")
+        return values
+
+
+class LocalCollection:
+    """
+    A single collection: scalar rows, a matrix of their vectors, and a primary key index.
+    """
+
+    def __init__(
+        self,
+        primary_field: str,
+        vector_field: str,
+        dimension: int,
+        fields: List[str],
+        dtype: str = "float32",
+    ):
+        self.primary_field = primary_field
+        self.vector_field = vector_field
+        self.dimension = dimension
+        self.fields = fields
+        self.dtype = np.dtype(dtype)
+
+        self.rows: List[Dict[str, Any]] = []
+        self.index: Dict[Any, int] = {}
+        self.vectors = np.zeros((0, dimension), dtype=self.dtype)
+        self.norms = np.zeros((0,), dtype=np.float32)
+        self.size = 0
+
+        self.version = 0
+        self.dirty = False
+        self.mask_cache: Dict[str, np.ndarray] = {}
+
+    def __reserve(self, capacity: int):
+        """
+        Grow the vector matrix geometrically so appends are amortized O(1).
+        """
+        if capacity <= self.vectors.shape[0]:
+            return
+
+        new_capacity = max(capacity, 2 * self.vectors.shape[0], 64)
+        vectors = np.zeros((new_capacity, self.dimension), dtype=self.dtype)
+        vectors[: self.size] = self.vectors[: self.size]
+        norms = np.zeros((new_capacity,), dtype=np.float32)
+        norms[: self.size] = self.norms[: self.size]
+        self.vectors, self.norms = vectors, norms
+
+    def upsert(self, entities: List[Dict[str, Any]]):
+        self.__reserve(self.size + len(entities))
+        if not self.vectors.flags.writeable:
+            self.vectors = np.array(self.vectors)
+
+        for entity in entities:
+            row = {
+                key: value for key, value in entity.items() if key != self.vector_field
+            }
+            vector = np.asarray(entity[self.vector_field], dtype=np.float32)
+
+            key = row[self.primary_field]
+            position = self.index.get(key)
+            if position is None:
+                position = self.size
+                self.size += 1
+                self.rows.append(row)
+                self.index[key] = position
+            else:
+                self.rows[position] = row
+
+            self.vectors[position] = vector
+            self.norms[position] = np.linalg.norm(vector)
+
+        self.__touch()
+
+    def delete(self, positions: List[int]):
+        if not positions:
+            return
+
+        keep = np.ones((self.size,), dtype=bool)
+        keep[positions] = False
+
+        self.rows = [row for row, kept in zip(self.rows, keep) if kept]
+        self.vectors = np.array(self.vectors[: self.size][keep])
+        self.norms = np.array(self.norms[: self.size][keep])
+        self.size = len(self.rows)
+        self.index = {row[self.primary_field]: i for i, row in enumerate(self.rows)}
+
+        self.__touch()
+
+    def __touch(self):
+        self.version += 1
+        self.dirty = True
+        self.mask_cache.clear()
+
+    def positions(self, filter: str) -> np.ndarray:
+        """
+        Get the positions of the rows matching a filter. Results are cached until the next write,
+        so repeated searches scoped to the same org don't re-evaluate the filter per row.
+        """
+        if filter not in self.mask_cache:
+            predicate = FilterParser(filter).parse()
+            self.mask_cache[filter] = np.fromiter(
+                (i for i, row in enumerate(self.rows) if predicate(row)),
+                dtype=np.int64,
+            )
+
+        return self.mask_cache[filter]
+
+    def project(
+        self, position: int, output_fields: Optional[List[str]]
+    ) -> Dict[str, Any]:
+        row = self.rows[position]
+        fields = output_fields if output_fields else self.fields
+
+        projected = {}
+        for field in fields:
+            if field == self.vector_field:
+                projected[field] = self.vectors[position].astype(np.float32).tolist()
+            elif field in row:
+                projected[field] = row[field]
+
+        projected[self.primary_field] = row[self.primary_field]
+        return projected
+
+    def search(
+        self, queries: np.ndarray, limit: int, filter: str
+    ) -> List[List[tuple]]:
+        """
+        Exact cosine top-k over the rows matching filter.
+
+        Returns:
+            List[List[tuple]]: Per query, a list of (position, similarity) sorted best first
+        """
+        positions = self.positions(filter)
+        if len(positions) == 0:
+            return [[] for _ in queries]
+
+        if len(positions) == self.size:
+            candidates = self.vectors[: self.size]
+            norms = self.norms[: self.size]
+        else:
+            candidates = self.vectors[positions]
+            norms = self.norms[positions]
+
+        query_norms = np.linalg.norm(queries, axis=1)
+        scores = candidates.astype(np.float32, copy=False) @ queries.T
+        scores /= np.maximum(norms[:, None] * query_norms[None, :], 1e-12)
+
+        k = min(limit, len(positions))
+        results = []
+        for column in range(scores.shape[1]):
+            column_scores = scores[:, column]
+            top = np.argpartition(-column_scores, k - 1)[:k]
+            top = top[np.argsort(-column_scores[top])]
+            results.append(
+                [(int(positions[i]), float(column_scores[i])) for i in top]
+            )
+
+        return results
+
+
+class LocalQueryIterator:
+    """
+    Mirrors pymilvus's QueryIterator over a snapshot of the primary keys matching the filter.
+    Rows are looked up under the client's lock as batches are read, so concurrent deletes only
+    drop rows from later batches instead of shifting the positions being read.
+    """
+
+    def __init__(
+        self,
+        collection: LocalCollection,
+        lock: threading.RLock,
+        keys: List[Any],
+        batch_size: int,
+        output_fields: Optional[List[str]],
+    ):
+        self.collection = collection
+        self.lock = lock
+        self.keys = keys
+        self.batch_size = batch_size
+        self.output_fields = output_fields
+        self.offset = 0
+
+    def next(self) -> List[Dict[str, Any]]:
+        rows = []
+        with self.lock:
+            # Batches are refilled past deleted rows, and only come back empty at the end
+            while not rows and self.offset < len(self.keys):
+                batch = self.keys[self.offset : self.offset + self.batch_size]
+                self.offset += self.batch_size
+                for key in batch:
+                    position = self.collection.index.get(key)
+                    if position is not None:
+                        rows.append(self.collection.project(position, self.output_fields))
+
+        return rows
+
+    def close(self):
+        self.keys = []
+
+
+# Persistent clients still alive, flushed at interpreter exit. Weak, so that clients can still be
+# garbage collected.
+_persistent_clients: "weakref.WeakSet[LocalVectorClient]" = weakref.WeakSet()
+
+
+def _persist_clients_at_exit():
+    """
+    Persist the dirty collections of all persistent clients. Doesn't log, since logging handlers
+    may already be closed at exit.
+    """
+    for client in list(_persistent_clients):
+        client.persist()
+
+
+atexit.register(_persist_clients_at_exit)
+
+
+class LocalVectorClient:
+    """
+    Drop-in replacement for MilvusClient, backed by NumPy. If path is set, each collection is
+    persisted to {path}/{collection}/ on flush (and at interpreter exit), and memory-mapped back
+    in when the client is created. Files are written aside and swapped in, so a crash mid-flush
+    leaves the previous version of each file loadable.
+    """
+
+    def __init__(self, path: Optional[str] = None, dtype: str = "float32"):
+        self.path = path
+        self.dtype = dtype
+        self.collections: Dict[str, LocalCollection] = {}
+        self.lock = threading.RLock()
+
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+            for name in os.listdir(path):
+                if os.path.exists(os.path.join(path, name, "schema.json")):
+                    self.collections[name] = self.__load(name)
+
+            _persistent_clients.add(self)
+
+    def __collection_dir(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def __load(self, name: str) -> LocalCollection:
+        directory = self.__collection_dir(name)
+        with open(os.path.join(directory, "schema.json"), "r", encoding="utf8") as fp:
+            schema = json.load(fp)
+        with open(os.path.join(directory, "rows.json"), "r", encoding="utf8") as fp:
+            rows = json.load(fp)
+
+        collection = LocalCollection(**schema)
+        collection.rows = rows
+        collection.size = len(rows)
+        collection.index = {
+            row[collection.primary_field]: i for i, row in enumerate(rows)
+        }
+        collection.vectors = np.load(
+            os.path.join(directory, "vectors.npy"), mmap_mode="r"
+        )
+        collection.norms = np.load(os.path.join(directory, "norms.npy"))
+        return collection
+
+    @staticmethod
+    def __write(target: str, write: Callable[[Any], None], mode: str = "wb"):
+        """
+        Write a file aside and swap it in, since the current vectors may be memory-mapped from
+        the file being replaced. The temporary file is per process, so processes sharing the
+        directory never write into each other's.
+        """
+        temporary = f"{target}.{os.getpid()}.tmp"
+        encoding = None if "b" in mode else "utf8"
+        with open(temporary, mode, encoding=encoding) as fp:
+            write(fp)
+        os.replace(temporary, target)
+
+    def persist(self, collection_name: Optional[str] = None) -> List[str]:
+        """
+        Persist dirty collections to disk, see flush.
+
+        Returns:
+            List[str]: The names of the collections written
+        """
+        if self.path is None:
+            return []
+
+        written = []
+        with self.lock:
+            names = [collection_name] if collection_name else list(self.collections)
+            for name in names:
+                collection = self.collections[name]
+                if not collection.dirty:
+                    continue
+
+                directory = self.__collection_dir(name)
+                os.makedirs(directory, exist_ok=True)
+                schema = {
+                    "primary_field": collection.primary_field,
+                    "vector_field": collection.vector_field,
+                    "dimension": collection.dimension,
+                    "fields": collection.fields,
+                    "dtype": collection.dtype.name,
+                }
+                # Rows and vectors first, so the schema never describes files not written yet
+                self.__write(
+                    os.path.join(directory, "vectors.npy"),
+                    lambda fp: np.save(
+                        fp, np.ascontiguousarray(collection.vectors[: collection.size])
+                    ),
+                )
+                self.__write(
+                    os.path.join(directory, "norms.npy"),
+                    lambda fp: np.save(fp, collection.norms[: collection.size]),
+                )
+                self.__write(
+                    os.path.join(directory, "rows.json"),
+                    lambda fp: json.dump(collection.rows, fp),
+                    "w",
+                )
+                self.__write(
+                    os.path.join(directory, "schema.json"),
+                    lambda fp: json.dump(schema, fp),
+                    "w",
+                )
+                collection.dirty = False
+                written.append(name)
+
+        return written
+
+    def flush(self, collection_name: Optional[str] = None, **kwargs):
+        """
+        Persist dirty collections to disk. A no-op for purely in-memory clients.
+        """
+        if self.persist(collection_name):
+            logging.info(f"Flushed local vector collections to {self.path}")
+
+    def has_collection(self, collection_name: str, **kwargs) -> bool:
+        return collection_name in self.collections
+
+    def create_collection(
+        self, collection_name: str, schema: Any, **kwargs
+    ):
+        primary_field = next(field for field in schema.fields if field.is_primary)
+        vector_field = next(
+            field for field in schema.fields if field.dtype.name in VECTOR_DTYPES
+        )
+
+        with self.lock:
+            self.collections[collection_name] = LocalCollection(
+                primary_field=primary_field.name,
+                vector_field=vector_field.name,
+                dimension=vector_field.params["dim"],
+                fields=[field.name for field in schema.fields],
+                dtype=VECTOR_DTYPES[vector_field.dtype.name] or self.dtype,
+            )
+
+    def describe_collection(self, collection_name: str, **kwargs) -> Dict[str, Any]:
+        collection = self.collections[collection_name]
+        vector_types = {"int8": "INT8_VECTOR", "float16": "FLOAT16_VECTOR"}
+        return {
+            "collection_name": collection_name,
+            "fields": [
+                (
+                    {
+                        "name": field,
+                        "type": vector_types.get(collection.dtype.name, "FLOAT_VECTOR"),
+                        "params": {"dim": collection.dimension},
+                    }
+                    if field == collection.vector_field
+                    else {"name": field}
+                )
+                for field in collection.fields
+            ],
+        }
+
+    def add_collection_field(
+        self, collection_name: str, field_name: str, data_type: Any, **kwargs
+    ):
+        collection = self.collections[collection_name]
+        if field_name not in collection.fields:
+            collection.fields.append(field_name)
+
+    def create_index(self, collection_name: str, index_params: Any, **kwargs):
+        # Search is exact, so there's no index to build.
+        pass
+
+    def load_collection(self, collection_name: str, **kwargs):
+        pass
+
+    def upsert(self, collection_name: str, data: List[Dict[str, Any]], **kwargs):
+        with self.lock:
+            self.collections[collection_name].upsert(data)
+
+        return {"upsert_count": len(data)}
+
+    def insert(self, collection_name: str, data: List[Dict[str, Any]], **kwargs):
+        return self.upsert(collection_name, data)
+
+    def delete(
+        self,
+        collection_name: str,
+        ids: Optional[List[Any]] = None,
+        filter: str = "",
+        **kwargs,
+    ):
+        with self.lock:
+            collection = self.collections[collection_name]
+            if ids is not None:
+                ids = ids if isinstance(ids, list) else [ids]
+                positions = [collection.index[i] for i in ids if i in collection.index]
+            else:
+                positions = collection.positions(filter).tolist()
+
+            collection.delete(positions)
+
+        return {"delete_count": len(positions)}
+
+    def get(
+        self,
+        collection_name: str,
+        ids: Any,
+        output_fields: Optional[List[str]] = None,
+        **kwargs,
+    ) -> List[Dict[str, Any]]:
+        collection = self.collections[collection_name]
+        ids = ids if isinstance(ids, list) else [ids]
+
+        with self.lock:
+            return [
+                collection.project(collection.index[i], output_fields)
+                for i in ids
+                if i in collection.index
+            ]
+
+    def query(
+        self,
+        collection_name: str,
+        filter: str = "",
+        output_fields: Optional[List[str]] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        **kwargs,
+    ) -> List[Dict[str, Any]]:
+        collection = self.collections[collection_name]
+
+        with self.lock:
+            positions = collection.positions(filter)
+            end = offset + limit if limit is not None and limit >= 0 else None
+            return [
+                collection.project(int(position), output_fields)
+                for position in positions[offset:end]
+            ]
+
+    def query_iterator(
+        self,
+        collection_name: str,
+        batch_size: int = 1000,
+        filter: str = "",
+        output_fields: Optional[List[str]] = None,
+        **kwargs,
+    ) -> LocalQueryIterator:
+        collection = self.collections[collection_name]
+
+        with self.lock:
+            keys = [
+                collection.rows[position][collection.primary_field]
+                for position in collection.positions(filter)
+            ]
+
+        return LocalQueryIterator(collection, self.lock, keys, batch_size, output_fields)
+
+    def search(
+        self,
+        collection_name: str,
+        data: List[List[float]],
+        filter: str = "",
+        limit: int = 10,
+        output_fields: Optional[List[str]] = None,
+        **kwargs,
+    ) -> List[List[Dict[str, Any]]]:
+        collection = self.collections[collection_name]
+        queries = np.asarray(data, dtype=np.float32).reshape(
+            -1, collection.dimension
+        )
+
+        with self.lock:
+            hits = collection.search(queries, limit, filter)
+            return [
+                [
+                    {
+                        "id": collection.rows[position][collection.primary_field],
+                        "distance": similarity,
+                        "entity": collection.project(
+                            position, output_fields or [collection.primary_field]
+                        ),
+                    }
+                    for position, similarity in query_hits
+                ]
+                for query_hits in hits
+            ]
@@ -0,0 +1,133 @@
+from include.constants import (
+    VECTOR_STORAGE_FLOAT32,
+    VECTOR_STORAGE_FLOAT16,
+    VECTOR_STORAGE_INT8,
+)
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+import json
+
+MANIFEST_FILE = "manifest.json"
+
+VECTOR_KEY = "vector"
+FULL_VECTOR_KEY = "full_vector"
+STRING_ENCODING = "str"
+JSON_ENCODING = "json"
+
+STORAGE_MODE_DTYPES = {
+    VECTOR_STORAGE_FLOAT32: np.float32,
+    VECTOR_STORAGE_FLOAT16: np.float16,
+    VECTOR_STORAGE_INT8: np.int8,
+}
+
+
+def encode_strings(values: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Pack strings into one UTF-8 byte array and the offsets of each string in it.
+    """
+    encoded = [value.encode("utf8") for value in values]
+    offsets = np.zeros((len(encoded) + 1,), dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def decode_strings(data: np.ndarray, offsets: np.ndarray) -> List[str]:
+    """
+    Unpack strings packed by encode_strings.
+    """
+    raw = data.tobytes()
+    return [
+        raw[start:end].decode("utf8")
+        for start, end in zip(offsets[:-1].tolist(), offsets[1:].tolist())
+    ]
+
+
+def vectors_to_array(values: List[Any], mode: str) -> np.ndarray:
+    """
+    Stack vectors as returned by a vector client into a matrix of a storage mode's dtype. Milvus
+    returns float32 vectors as lists of floats, and float16 and int8 ones as raw bytes.
+    """
+    dtype = STORAGE_MODE_DTYPES[mode]
+    rows = []
+    for value in values:
+        if isinstance(value, list) and len(value) == 1 and isinstance(value[0], bytes):
+            value = value[0]
+        if isinstance(value, (bytes, bytearray)):
+            rows.append(np.frombuffer(value, dtype=dtype))
+        else:
+            rows.append(np.asarray(value, dtype=dtype))
+
+    return np.stack(rows) if rows else np.zeros((0, 0), dtype=dtype)
+
+
+def write_snapshot_part(
+    file: str,
+    rows: List[Dict[str, Any]],
+    fields: List[str],
+    vectors: np.ndarray,
+    full_vectors: Optional[np.ndarray] = None,
+):
+    """
+    Write rows to a compressed NPZ part, column by column. Fields whose values are all strings are
+    stored as UTF-8 bytes plus offsets, anything else (arrays, JSON) as JSON strings the same way.
+
+    Args:
+        file: The .npz file to write
+        rows: The rows, without their vectors
+        fields: The scalar fields to write
+        vectors: The stored vector of each row
+        full_vectors: The full-precision vector of each row, for collections that rerank
+    """
+    arrays = {VECTOR_KEY: vectors}
+    if full_vectors is not None:
+        arrays[FULL_VECTOR_KEY] = full_vectors
+
+    for field in fields:
+        values = [row.get(field) for row in rows]
+        if all(isinstance(value, str) for value in values):
+            encoding = STRING_ENCODING
+        else:
+            encoding = JSON_ENCODING
+            values = [json.dumps(value) for value in values]
+
+        data, offsets = encode_strings(values)
+        arrays[f"{encoding}.{field}.data"] = data
+        arrays[f"{encoding}.{field}.offsets"] = offsets
+
+    np.savez_compressed(file, **arrays)
+
+
+def read_snapshot_part(
+    file: str,
+) -> Tuple[List[Dict[str, Any]], np.ndarray, Optional[np.ndarray]]:
+    """
+    Read a part written by write_snapshot_part.
+
+    Returns:
+        Tuple[List[Dict[str, Any]], np.ndarray, Optional[np.ndarray]]: The rows without their
+            vectors, the stored vectors, and the full-precision vectors if the part has them
+    """
+    with np.load(file) as part:
+        vectors = part[VECTOR_KEY]
+        full_vectors = part[FULL_VECTOR_KEY] if FULL_VECTOR_KEY in part.files else None
+
+        rows: List[Dict[str, Any]] = [{} for _ in range(len(vectors))]
+        for key in part.files:
+            encoding, _, rest = key.partition(".")
+            if encoding not in (STRING_ENCODING, JSON_ENCODING) or not rest.endswith(
+                ".data"
+            ):
+                continue
+
+            field = rest[: -len(".data")]
+            values = decode_strings(
+                part[key], part[f"{encoding}.{field}.offsets"]
+            )
+            if encoding == JSON_ENCODING:
+                values = [json.loads(value) for value in values]
+
+            for row, value in zip(rows, values):
+                if value is not None:
+                    row[field] = value
+
+    return rows, vectors, full_vectors
@@ -0,0 +1,41 @@
+from include.constants import CONTEXT_TOKEN_ENCODING, CHARS_PER_TOKEN_ESTIMATE
+from typing import Any, List, Optional
+import threading
+import logging
+
+_encoding: Optional[Any] = None
+_encoding_loaded = False
+_encoding_lock = threading.Lock()
+
+
+def get_encoding() -> Optional[Any]:
+    """
+    Get the tiktoken encoding tokens are counted with, loaded once per process. None if it can't
+    be loaded, since tiktoken downloads encodings on first use.
+    """
+    global _encoding, _encoding_loaded
+
+    with _encoding_lock:
+        if not _encoding_loaded:
+            _encoding_loaded = True
+            try:
+                import tiktoken
+
+                _encoding = tiktoken.get_encoding(CONTEXT_TOKEN_ENCODING)
+            except Exception as e:
+                logging.warning(
+                    f"Failed to load the {CONTEXT_TOKEN_ENCODING} encoding, estimating token counts: {str(e)}"
+                )
+
+        return _encoding
+
+
+def count_tokens(texts: List[str]) -> List[int]:
+    """
+    Count the tokens of several strings.
+    """
+    encoding = get_encoding()
+    if encoding is None:
+        return [-(-len(text) // CHARS_PER_TOKEN_ESTIMATE) for text in texts]
+
+    return [len(tokens) for tokens in encoding.encode_ordinary_batch(texts)]
@@ -9,29 +9,99 @@ from include.constants import (
     DIMENSION_NVIDIA,
     SUPPORTED_MODELS,
     VOYAGE_CODE_EMBED,
+    HASHING_EMBED,
     DIMENSION_VOYAGE,
+    VOYAGE_MAX_BATCH_SIZE,
+    VOYAGE_MAX_BATCH_TOKENS,
+    OPENAI_MAX_BATCH_SIZE,
+    OPENAI_MAX_BATCH_TOKENS,
+    SENTENCE_TRANSFORMER_BATCH_SIZE,
+    HASHING_EMBED_BATCH_SIZE,
+    CHARS_PER_TOKEN_ESTIMATE,
+    UPSERT_BATCH_SIZE,
+    CHANGE_DETECTION_BATCH_SIZE,
+    QUERY_ITERATOR_BATCH_SIZE,
+    MILVUS_BACKEND,
+    LOCAL_BACKEND,
+    LOCAL_VECTOR_DIR,
+    VECTOR_STORAGE_FLOAT32,
+    VECTOR_STORAGE_FLOAT16,
+    VECTOR_STORAGE_INT8,
+    VECTOR_STORAGE_MODES,
+    RERANK_CANDIDATES_MULTIPLIER,
+    FULL_PRECISION_COLLECTION_SUFFIX,
+    COLLECTION_VECTOR_STORAGE,
+    ORG_NUM_PARTITIONS,
+    ORG_PARTITION_KEY_ISOLATION,
+    SNAPSHOT_VERSION,
+    SNAPSHOT_COLLECTIONS,
+    SNAPSHOT_PART_ROWS,
+    SNAPSHOT_INSERT_BATCH_SIZE,
+    SNAPSHOT_IMPORT_WORKERS,
 )
-from pymilvus import DataType, CollectionSchema, FieldSchema
 from src.model.documentation import DocumentationPage
-from sentence_transformers import SentenceTransformer
-from pymilvus.milvus_client.index import IndexParams
-from typing import List, Any, Dict, Union, Optional
+from typing import List, Any, Dict, Union, Optional, Tuple, Iterator, Set
+from src.storage.embedding_cache import EmbeddingCache, QueryEmbeddingCache
+from src.storage.dedup import get_dedup_index
+from src.storage.lexical import get_lexical_index
+from src.storage.snapshot import (
+    MANIFEST_FILE,
+    vectors_to_array,
+    write_snapshot_part,
+    read_snapshot_part,
+)
+from src.storage.local_vector import LocalVectorClient
+from src.storage.hashing_embedder import HashingEmbedder
+from src.storage.chunker import Chunker, Chunk
 from src.storage.supa import SupaClient
 from src.model.code import CodePage, CodePageType
 from src.model.issue import Comment
-from pymilvus import MilvusClient
 from typeguard import typechecked
+from pydantic import BaseModel
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+import numpy as np
+import threading
 import traceback
+import asyncio
+import weakref
+import hashlib
 import logging
 import json
-import voyageai
 from src.model.issue import Issue
 from dotenv import load_dotenv
-from openai import OpenAI
 from uuid import UUID
 import os
 
 PRIMARY_KEY_FIELD = "primary_key"
+QUERY_INPUT_TYPE = "query"
+CONTENT_HASH_FIELD = "content_hash"
+START_LINE_FIELD = "start_line"
+END_LINE_FIELD = "end_line"
+# Fields added to the issue, documentation and code collections after they were first created,
+# with the data type and arguments they are added with
+ADDED_FIELDS = {
+    CONTENT_HASH_FIELD: ("VARCHAR", {"max_length": 64}),
+    START_LINE_FIELD: ("INT64", {}),
+    END_LINE_FIELD: ("INT64", {}),
+}
+# Vectors are deliberately not returned by searches; they are never shown to the agent.
+SEARCH_OUTPUT_FIELDS = {
+    ISSUE: ["description", "comments", "org_id", "ticket_number"],
+    DOCUMENTATION: ["url", "content", START_LINE_FIELD, END_LINE_FIELD],
+    CODE: ["content", "org_id", "page_type", "sha", START_LINE_FIELD, END_LINE_FIELD],
+}
+# Options every collection partitioned by org is created with, so that searches and scans filtered on
+# org_id only touch that org's partitions (and segments, with isolation).
+TENANT_COLLECTION_OPTIONS = {
+    "num_partitions": ORG_NUM_PARTITIONS,
+    "properties": {"partitionkey.isolation": ORG_PARTITION_KEY_ISOLATION},
+}
+STORAGE_MODE_VECTOR_TYPES = {
+    VECTOR_STORAGE_FLOAT32: "FLOAT_VECTOR",
+    VECTOR_STORAGE_FLOAT16: "FLOAT16_VECTOR",
+    VECTOR_STORAGE_INT8: "INT8_VECTOR",
+}
 
 load_dotenv()
 
@@ -42,26 +112,91 @@ class EmbeddingModel:
     easily
     """
 
-    def __init__(self, model_name: str) -> None:
+    def __init__(
+        self,
+        model_name: str,
+        dimension: int = DIMENSION_VOYAGE,
+        cache: Optional[EmbeddingCache] = None,
+        query_cache: Optional[QueryEmbeddingCache] = None,
+    ) -> None:
         self.model_name = model_name
-        self.client = self.get_client(model_name)
+        self.dimension = dimension
+        self.cache = cache
+        self.query_cache = query_cache
+        self.__client = None
+        self.__async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+        if model_name.lower() not in [model.lower() for model in SUPPORTED_MODELS]:
+            raise ValueError(
+                f"embedding model not supported. Choose one of {','.join(SUPPORTED_MODELS)}"
+            )
+
+    @property
+    def client(self) -> Any:
+        """
+        The client to generate embeddings with, created on first use so that importing and
+        constructing the model doesn't pay for the embedding SDK until something is embedded.
+        """
+        if self.__client is None:
+            self.__client = self.get_client(self.model_name)
+
+        return self.__client
 
     def get_client(self, name: str) -> Any:
         """
         Get the client to generate embeddings over
         """
+        # Imported here since these SDKs (sentence_transformers especially) take seconds to import
         if name.lower() == OPENAI_EMBED.lower():
+            from openai import OpenAI
+
             return OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
         elif name.lower() == NVIDIA_EMBED.lower():
+            from sentence_transformers import SentenceTransformer
+
             return SentenceTransformer(name, trust_remote_code=True)
         elif name.lower() == VOYAGE_CODE_EMBED.lower():
+            import voyageai
+
             return voyageai.Client(api_key=os.environ.get("VOYAGE_API_KEY"))
+        elif name.lower() == HASHING_EMBED.lower():
+            return HashingEmbedder(self.dimension)
         else:
             raise ValueError(
                 f"embedding model not supported. Choose one of {','.join(SUPPORTED_MODELS)}"
             )
 
-    def encode(self, text: str, input_type: Optional[str] = None) -> List[List[float]]:
+    @property
+    def async_client(self) -> Any:
+        """
+        The async client to generate embeddings with on the running event loop. Async HTTP clients
+        are bound to the loop they were created on, so there is one per loop.
+        """
+        loop = asyncio.get_running_loop()
+        if loop not in self.__async_clients:
+            self.__async_clients[loop] = self.get_async_client(self.model_name)
+
+        return self.__async_clients[loop]
+
+    def get_async_client(self, name: str) -> Any:
+        """
+        Get the async client to generate embeddings over. Local models have none, they are run in
+        a worker thread instead.
+        """
+        if name.lower() == OPENAI_EMBED.lower():
+            from openai import AsyncOpenAI
+
+            return AsyncOpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+        elif name.lower() == VOYAGE_CODE_EMBED.lower():
+            import voyageai
+
+            return voyageai.AsyncClient(api_key=os.environ.get("VOYAGE_API_KEY"))
+
+        return None
+
+    def encode(self, text: str, input_type: Optional[str] = None) -> List[float]:
         """
         Encode the provided string.
 
@@ -69,27 +204,486 @@ class EmbeddingModel:
             text: The string to encode
             input_type: The type of input to encode, one of "document" or "query". Defaults to None. Only for voyage.
         """
+        return self.encode_batch([text], input_type)[0]
+
+    def encode_batch(
+        self, texts: List[str], input_type: Optional[str] = None
+    ) -> List[List[float]]:
+        """
+        Encode a list of strings, splitting them into as few remote calls as the provider's
+        batch size and token limits allow.
+
+        Args:
+            texts: The strings to encode
+            input_type: The type of input to encode, one of "document" or "query". Defaults to None. Only for voyage.
+
+        Returns:
+            List[List[float]]: One embedding per input string, in the same order
+        """
+        embeddings, missing = self.__lookup(texts, input_type)
+
+        computed = {}
+        for batch in self.__split_batches(missing):
+            computed.update(
+                self.__store(batch, self.__encode_batch(batch, input_type), input_type)
+            )
+
+        return [
+            vector if vector is not None else computed[text]
+            for text, vector in zip(texts, embeddings)
+        ]
+
+    async def aencode_batch(
+        self, texts: List[str], input_type: Optional[str] = None
+    ) -> List[List[float]]:
+        """
+        Async version of encode_batch. The remote calls for each batch are made concurrently.
+        """
+        embeddings, missing = self.__lookup(texts, input_type)
+
+        batches = list(self.__split_batches(missing))
+        computed = {}
+        for batch, vectors in zip(
+            batches,
+            await asyncio.gather(
+                *(self.__aencode_batch(batch, input_type) for batch in batches)
+            ),
+        ):
+            computed.update(self.__store(batch, vectors, input_type))
+
+        return [
+            vector if vector is not None else computed[text]
+            for text, vector in zip(texts, embeddings)
+        ]
+
+    def __lookup(
+        self, texts: List[str], input_type: Optional[str]
+    ) -> Tuple[List[Optional[List[float]]], List[str]]:
+        """
+        Get the cached embedding of each text (None if not cached), and the texts still to embed.
+        Each of those is embedded only once.
+        """
+        if self.cache is None:
+            return [None] * len(texts), list(dict.fromkeys(texts))
+
+        embeddings = self.cache.get_many(
+            self.model_name, self.dimension, input_type, texts
+        )
+        missing = list(
+            dict.fromkeys(
+                text for text, vector in zip(texts, embeddings) if vector is None
+            )
+        )
+        return embeddings, missing
+
+    def __store(
+        self, texts: List[str], vectors: List[List[float]], input_type: Optional[str]
+    ) -> Dict[str, List[float]]:
+        """
+        Add freshly computed embeddings to the cache, if any.
+
+        Returns:
+            Dict[str, List[float]]: The embedding of each text
+        """
+        if self.cache is not None:
+            self.cache.put_many(
+                self.model_name, self.dimension, input_type, texts, vectors
+            )
+
+        return dict(zip(texts, vectors))
+
+    def encode_queries(self, queries: List[str]) -> List[List[float]]:
+        """
+        Encode search queries with input_type="query", embedding only those not already in the
+        in-memory query cache, all in one batch.
+
+        Returns:
+            List[List[float]]: One embedding per query, in the same order
+        """
+        if self.query_cache is None:
+            return self.encode_batch(queries, input_type=QUERY_INPUT_TYPE)
+
+        embeddings, missing = self.__lookup_queries(queries)
+        vectors = (
+            self.encode_batch(missing, input_type=QUERY_INPUT_TYPE) if missing else []
+        )
+        return self.__store_queries(queries, embeddings, missing, vectors)
+
+    async def aencode_queries(self, queries: List[str]) -> List[List[float]]:
+        """
+        Async version of encode_queries.
+        """
+        if self.query_cache is None:
+            return await self.aencode_batch(queries, input_type=QUERY_INPUT_TYPE)
+
+        embeddings, missing = self.__lookup_queries(queries)
+        vectors = (
+            await self.aencode_batch(missing, input_type=QUERY_INPUT_TYPE)
+            if missing
+            else []
+        )
+        return self.__store_queries(queries, embeddings, missing, vectors)
+
+    def __lookup_queries(
+        self, queries: List[str]
+    ) -> Tuple[List[Optional[List[float]]], List[str]]:
+        """
+        Get the query cache's embedding of each query (None if not cached), and the distinct
+        normalized queries still to embed.
+        """
+        embeddings = [
+            self.query_cache.get(self.model_name, QUERY_INPUT_TYPE, query)
+            for query in queries
+        ]
+        missing = list(
+            dict.fromkeys(
+                self.query_cache.normalize(query)
+                for query, vector in zip(queries, embeddings)
+                if vector is None
+            )
+        )
+        return embeddings, missing
+
+    def __store_queries(
+        self,
+        queries: List[str],
+        embeddings: List[Optional[List[float]]],
+        missing: List[str],
+        vectors: List[List[float]],
+    ) -> List[List[float]]:
+        """
+        Add the embeddings of the missing queries to the query cache, and fill them in.
+        """
+        computed = {}
+        for query, vector in zip(missing, vectors):
+            self.query_cache.put(self.model_name, QUERY_INPUT_TYPE, query, vector)
+            computed[query] = vector
+
+        return [
+            (
+                vector
+                if vector is not None
+                else computed[self.query_cache.normalize(query)]
+            )
+            for query, vector in zip(queries, embeddings)
+        ]
+
+    def __batch_limits(self) -> Tuple[int, Optional[int]]:
+        """
+        Get the (max texts, max tokens) allowed in a single call to the embedding model.
+        """
+        if self.model_name.lower() == OPENAI_EMBED.lower():
+            return OPENAI_MAX_BATCH_SIZE, OPENAI_MAX_BATCH_TOKENS
+        elif self.model_name.lower() == VOYAGE_CODE_EMBED.lower():
+            return VOYAGE_MAX_BATCH_SIZE, VOYAGE_MAX_BATCH_TOKENS
+        elif self.model_name.lower() == HASHING_EMBED.lower():
+            return HASHING_EMBED_BATCH_SIZE, None
+
+        return SENTENCE_TRANSFORMER_BATCH_SIZE, None
+
+    def __split_batches(self, texts: List[str]) -> Iterator[List[str]]:
+        """
+        Split texts into batches that respect the model's batch size and token limits.
+        """
+        max_size, max_tokens = self.__batch_limits()
+
+        batch, batch_tokens = [], 0
+        for text in texts:
+            tokens = len(text) // CHARS_PER_TOKEN_ESTIMATE + 1
+            if batch and (
+                len(batch) >= max_size
+                or (max_tokens is not None and batch_tokens + tokens > max_tokens)
+            ):
+                yield batch
+                batch, batch_tokens = [], 0
+
+            batch.append(text)
+            batch_tokens += tokens
+
+        if batch:
+            yield batch
+
+    def __encode_batch(
+        self, texts: List[str], input_type: Optional[str] = None
+    ) -> List[List[float]]:
+        """
+        Encode a batch of strings that fits within the model's limits in a single call.
+        """
         if self.model_name.lower() == OPENAI_EMBED.lower():
             response = self.client.embeddings.create(
                 model=self.model_name,
-                input=text,
+                input=texts,
                 encoding_format="float",
             )
-            return response.data[0].embedding
-        elif self.model_name.lower() == NVIDIA_EMBED.lower():
-            return self.client.encode([text])[0]
+            return [
+                data.embedding for data in sorted(response.data, key=lambda d: d.index)
+            ]
+        elif self.model_name.lower() in (NVIDIA_EMBED.lower(), HASHING_EMBED.lower()):
+            return self.client.encode(texts).tolist()
         elif self.model_name.lower() == VOYAGE_CODE_EMBED.lower():
             return self.client.embed(
-                [text],
+                texts,
                 model=self.model_name,
                 input_type=input_type,
-                output_dimension=DIMENSION_VOYAGE,
-            ).embeddings[0]
+                output_dimension=self.dimension,
+            ).embeddings
         else:
             raise ValueError(
                 f"embedding model not supported. Choose one of {','.join(SUPPORTED_MODELS)}"
             )
 
+    async def __aencode_batch(
+        self, texts: List[str], input_type: Optional[str] = None
+    ) -> List[List[float]]:
+        """
+        Async version of __encode_batch.
+        """
+        if self.model_name.lower() == OPENAI_EMBED.lower():
+            response = await self.async_client.embeddings.create(
+                model=self.model_name,
+                input=texts,
+                encoding_format="float",
+            )
+            return [
+                data.embedding for data in sorted(response.data, key=lambda d: d.index)
+            ]
+        elif self.model_name.lower() in (NVIDIA_EMBED.lower(), HASHING_EMBED.lower()):
+            return (await asyncio.to_thread(self.client.encode, texts)).tolist()
+        elif self.model_name.lower() == VOYAGE_CODE_EMBED.lower():
+            return (
+                await self.async_client.embed(
+                    texts,
+                    model=self.model_name,
+                    input_type=input_type,
+                    output_dimension=self.dimension,
+                )
+            ).embeddings
+        else:
+            raise ValueError(
+                f"embedding model not supported. Choose one of {','.join(SUPPORTED_MODELS)}"
+            )
+
+
+class VectorStorage(BaseModel):
+    """
+    How a collection stores its vectors, see COLLECTION_VECTOR_STORAGE.
+    """
+
+    mode: str = VECTOR_STORAGE_FLOAT32
+    dimension: Optional[int] = None  # Matryoshka dimension to keep, None for all of them
+    rerank: bool = False  # Rerank top candidates against full-precision vectors in a companion collection
+
+
+def to_stored_vectors(
+    vectors: Union[List[List[float]], np.ndarray], storage: VectorStorage
+) -> np.ndarray:
+    """
+    Convert full-precision embeddings into the form a collection stores them in. Vectors are
+    truncated to the storage's Matryoshka dimension and renormalized, which is what the embedding
+    providers do for a smaller output dimension, then cast to float16 or scalar-quantized to int8.
+    """
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix[None, :]
+
+    if storage.dimension is not None and storage.dimension < matrix.shape[1]:
+        matrix = matrix[:, : storage.dimension]
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = matrix / np.maximum(norms, 1e-12)
+
+    if storage.mode == VECTOR_STORAGE_FLOAT16:
+        return matrix.astype(np.float16)
+    elif storage.mode == VECTOR_STORAGE_INT8:
+        # Cosine similarity ignores scale, so each vector is scaled to use the full int8 range.
+        scale = np.abs(matrix).max(axis=1, keepdims=True)
+        return np.round(matrix * (127 / np.maximum(scale, 1e-12))).astype(np.int8)
+
+    return matrix
+
+
+def to_vector_rows(matrix: np.ndarray) -> List[Any]:
+    """
+    Split a matrix of stored vectors into per-row values the vector db client accepts: lists of
+    floats for float32, and NumPy arrays for the float16 and int8 vector types.
+    """
+    if matrix.dtype == np.float32:
+        return matrix.tolist()
+
+    return list(matrix)
+
+
+def rerank_hits(
+    hits: List[Dict[str, Any]],
+    query_vector: List[float],
+    full_vectors: Dict[str, List[float]],
+    limit: int,
+) -> List[Dict[str, Any]]:
+    """
+    Rescore search hits by exact cosine similarity between the full-precision query and the
+    full-precision vectors of the hits, keeping the best limit. Hits missing from full_vectors keep
+    their approximate similarity.
+    """
+    query = np.asarray(query_vector, dtype=np.float32)
+    query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+    rescored = []
+    for hit in hits:
+        vector = full_vectors.get(hit["id"])
+        if vector is not None:
+            vector = np.asarray(vector, dtype=np.float32)
+            similarity = float(
+                vector @ query / max(float(np.linalg.norm(vector)), 1e-12)
+            )
+            hit = {**hit, "distance": similarity}
+
+        rescored.append(hit)
+
+    rescored.sort(key=lambda hit: hit["distance"], reverse=True)
+    return rescored[:limit]
+
+
+# Process-wide state shared by every VectorDB: one client per backend, one embedding model per
+# (model, dimension), and the set of collections already created and loaded.
+_clients: Dict[str, Any] = {}
+_embedding_models: Dict[Tuple[str, int], EmbeddingModel] = {}
+_vector_dbs: Dict[Tuple[UUID, str, str, int], "VectorDB"] = {}
+_loaded_collections: Set[Tuple[str, str]] = set()
+_collection_storage: Dict[Tuple[str, str], VectorStorage] = {}
+# Fields of ADDED_FIELDS that could not be added to an existing collection, see missing_fields
+_missing_fields: Dict[Tuple[str, str], Set[str]] = {}
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, Any]]" = (
+    weakref.WeakKeyDictionary()
+)
+_registry_lock = threading.RLock()
+_collections_lock = threading.Lock()
+
+
+def get_vector_client(backend: str = MILVUS_BACKEND) -> Any:
+    """
+    Get the client of a vector db backend, connecting on first use. The Milvus client keeps a
+    single pooled gRPC channel and is safe to share across threads.
+    """
+    with _registry_lock:
+        if backend not in _clients:
+            if backend == MILVUS_BACKEND:
+                from pymilvus import MilvusClient
+
+                _clients[backend] = MilvusClient(
+                    uri=os.environ.get("MILVUS_URL"),
+                    token=os.environ.get("MILVUS_TOKEN"),
+                    user=os.environ.get("MILVUS_USERNAME"),
+                )
+            elif backend == LOCAL_BACKEND:
+                _clients[backend] = LocalVectorClient(LOCAL_VECTOR_DIR)
+            else:
+                raise ValueError(
+                    f"vector db backend not supported. Choose one of {MILVUS_BACKEND},{LOCAL_BACKEND}"
+                )
+
+        return _clients[backend]
+
+
+def use_isolated_local_backend():
+    """
+    Point the local backend at a fresh in-memory store, forgetting its collections and the
+    vector dbs using them. For benchmarks that create the
+    same collections with different storage in one process, without touching anything persisted.
+    """
+    with _registry_lock, _collections_lock:
+        _clients[LOCAL_BACKEND] = LocalVectorClient()
+
+        for key in [key for key in _loaded_collections if key[0] == LOCAL_BACKEND]:
+            _loaded_collections.discard(key)
+        for key in [key for key in _collection_storage if key[0] == LOCAL_BACKEND]:
+            del _collection_storage[key]
+        for key in [key for key in _missing_fields if key[0] == LOCAL_BACKEND]:
+            del _missing_fields[key]
+        for key in [key for key in _vector_dbs if key[2] == LOCAL_BACKEND]:
+            del _vector_dbs[key]
+
+
+def get_embedding_model(model_name: str, dimension: int) -> EmbeddingModel:
+    """
+    Get the shared embedding model for a model name and output dimension, backed by the
+    persistent embedding cache. Every vector db using the model shares its query cache.
+    HASHING_EMBED is cheaper to recompute than to look up, so it gets no caches.
+    """
+    with _registry_lock:
+        key = (model_name, dimension)
+        if key not in _embedding_models:
+            is_local = model_name.lower() == HASHING_EMBED.lower()
+            _embedding_models[key] = EmbeddingModel(
+                model_name,
+                dimension,
+                cache=None if is_local else EmbeddingCache(),
+                query_cache=None if is_local else QueryEmbeddingCache(),
+            )
+
+        return _embedding_models[key]
+
+
+def get_vector_db(
+    org_id: UUID,
+    embedding_model_name: str = VOYAGE_CODE_EMBED,
+    dimension: int = DIMENSION_VOYAGE,
+    backend: str = MILVUS_BACKEND,
+) -> "VectorDB":
+    """
+    Get the vector db of an org, shared by every caller in the process. Safe to call from
+    multiple threads; the vector db is built once per org and configuration.
+    """
+    with _registry_lock:
+        key = (org_id, embedding_model_name, backend, dimension)
+        if key not in _vector_dbs:
+            _vector_dbs[key] = VectorDB(org_id, embedding_model_name, dimension, backend)
+
+        return _vector_dbs[key]
+
+
+class ThreadedAsyncClient:
+    """
+    Async facade over a blocking vector client, for backends without an async client of their own.
+    Every method call is run in a worker thread and awaited.
+    """
+
+    def __init__(self, client: Any):
+        self.client = client
+
+    def __getattr__(self, name: str) -> Any:
+        method = getattr(self.client, name)
+
+        async def call(*args, **kwargs):
+            return await asyncio.to_thread(method, *args, **kwargs)
+
+        return call
+
+
+def get_async_vector_client(backend: str = MILVUS_BACKEND) -> Any:
+    """
+    Get the async client of a vector db backend for the running event loop. The async Milvus client
+    holds a gRPC channel bound to the loop it was created on, so there is one per loop and backend.
+    """
+    loop = asyncio.get_running_loop()
+    with _registry_lock:
+        clients = _async_clients.setdefault(loop, {})
+        if backend not in clients:
+            if backend == MILVUS_BACKEND:
+                from pymilvus import AsyncMilvusClient
+
+                clients[backend] = AsyncMilvusClient(
+                    uri=os.environ.get("MILVUS_URL"),
+                    token=os.environ.get("MILVUS_TOKEN"),
+                    user=os.environ.get("MILVUS_USERNAME"),
+                )
+            elif backend == LOCAL_BACKEND:
+                clients[backend] = ThreadedAsyncClient(get_vector_client(backend))
+            else:
+                raise ValueError(
+                    f"vector db backend not supported. Choose one of {MILVUS_BACKEND},{LOCAL_BACKEND}"
+                )
+
+        return clients[backend]
+
 
 # VectorDB class wrapping Milvus client and an embedding model
 class VectorDB:
@@ -102,34 +696,251 @@ class VectorDB:
         user_id: UUID,
         embedding_model_name: str = VOYAGE_CODE_EMBED,
         dimension: int = DIMENSION_VOYAGE,
+        backend: str = MILVUS_BACKEND,
     ):
-        self.client = MilvusClient(
-            uri=os.environ.get("MILVUS_URL"),
-            token=os.environ.get("MILVUS_TOKEN"),
-            user=os.environ.get("MILVUS_USERNAME"),
-        )
+        """
+        Args:
+            user_id: The org this vector db is scoped to
+            embedding_model_name: The embedding model to embed content and queries with. In
+                DEBUG_MODE, always HASHING_EMBED, so nothing is sent to an embedding provider.
+            dimension: The dimension of the stored vectors
+            backend: Where vectors are stored. MILVUS_BACKEND for the remote Milvus service, or
+                LOCAL_BACKEND for an in-process NumPy store persisted under LOCAL_VECTOR_DIR.
+        """
+        self.backend = backend
+        self.client = get_vector_client(backend)
+
+        self.is_debug_mode = os.environ.get("DEBUG_MODE", "false").lower() == "true"
+        if self.is_debug_mode:
+            embedding_model_name = HASHING_EMBED
 
         self.embedding_model_name = embedding_model_name
-        self.model = EmbeddingModel(embedding_model_name)
+        self.model = get_embedding_model(embedding_model_name, dimension)
         self.dimension = dimension
 
-        self.supa_client = SupaClient(
-            user_id,
-        )
+        self.__supa_client: Optional[SupaClient] = None
 
-        self.is_debug_mode = os.environ.get("DEBUG_MODE").lower() == "true"
         self.user_id = user_id
-        self.chunk_size = 8192
+        self.chunker = Chunker()
+
+        # Collections are created and loaded the first time they are used, not up front.
+        self.__collection_creators = {
+            ISSUE: self.create_issue_collection,
+            DOCUMENTATION: self.create_documentation_collection,
+            CODE: self.create_code_collection,
+            RUNBOOK: self.create_runbook_collection,
+        }
+
+    @property
+    def supa_client(self) -> Optional[SupaClient]:
+        """
+        Supabase client of this org, connected on first use. The local backend is meant to run
+        without any remote services, supabase included, so it has none.
+        """
+        if self.__supa_client is None and self.backend == MILVUS_BACKEND:
+            self.__supa_client = SupaClient(self.user_id)
+
+        return self.__supa_client
+
+    def ensure_collection(
+        self, collection_name: str, storage: Optional[VectorStorage] = None
+    ):
+        """
+        Create and load a collection the first time any vector db in this process uses it.
+        Later calls are a set lookup.
+
+        Args:
+            storage: How to store the vectors if the collection is created, see
+                create_issue_collection. Ignored once the collection is loaded.
+        """
+        key = (self.backend, collection_name)
+        if key in _loaded_collections:
+            return
+
+        with _collections_lock:
+            if key in _loaded_collections:
+                return
+
+            if storage is None:
+                self.__collection_creators[collection_name]()
+            else:
+                self.__collection_creators[collection_name](storage)
+            _loaded_collections.add(key)
+
+    def vector_storage(self, collection_name: str) -> VectorStorage:
+        """
+        Get how a collection stores its vectors, creating and loading the collection if needed.
+        """
+        self.ensure_collection(collection_name)
+        return _collection_storage.get(
+            (self.backend, collection_name), VectorStorage()
+        )
+
+    def missing_fields(self, collection_name: str) -> Set[str]:
+        """
+        Get the fields of ADDED_FIELDS a collection lacks because adding them failed, e.g. on a
+        Milvus version without add_collection_field. They are left out of the rows written and the
+        fields read, and without CONTENT_HASH_FIELD every chunk is treated as changed.
+        """
+        self.ensure_collection(collection_name)
+        return _missing_fields.get((self.backend, collection_name), set())
+
+    def output_fields(self, collection_name: str) -> List[str]:
+        """
+        Get the SEARCH_OUTPUT_FIELDS of a collection that it has, see missing_fields.
+        """
+        missing = self.missing_fields(collection_name)
+        return [
+            field for field in SEARCH_OUTPUT_FIELDS[collection_name] if field not in missing
+        ]
+
+    def __resolve_storage(
+        self, collection_name: str, storage: Optional[VectorStorage]
+    ) -> VectorStorage:
+        """
+        Get the storage a collection should be created with, defaulting to COLLECTION_VECTOR_STORAGE.
+        """
+        if storage is None:
+            storage = VectorStorage(
+                **COLLECTION_VECTOR_STORAGE.get(collection_name, {})
+            )
+
+        if storage.mode not in VECTOR_STORAGE_MODES:
+            raise ValueError(
+                f"vector storage mode not supported. Choose one of {','.join(VECTOR_STORAGE_MODES)}"
+            )
+        if storage.dimension is not None and not 0 < storage.dimension <= self.dimension:
+            raise ValueError(
+                f"vector storage dimension must be between 1 and {self.dimension}"
+            )
+
+        return storage
+
+    def __vector_field(self, storage: VectorStorage) -> Any:
+        """
+        Get the schema of the vector field for a storage mode.
+        """
+        from pymilvus import DataType, FieldSchema
+
+        return FieldSchema(
+            name="vector",
+            dtype=DataType[STORAGE_MODE_VECTOR_TYPES[storage.mode]],
+            dim=storage.dimension or self.dimension,
+        )
+
+    def vector_index_params(self, storage: VectorStorage) -> Any:
+        """
+        Get the vector index of a storage mode. Milvus only indexes int8 vectors, and only isolates
+        partition key segments, with HNSW.
+        """
+        from pymilvus.milvus_client.index import IndexParams
+
+        index_params = IndexParams()
+        index_params.add_index(
+            "vector",
+            index_type=(
+                "HNSW"
+                if storage.mode == VECTOR_STORAGE_INT8 or ORG_PARTITION_KEY_ISOLATION
+                else "AUTOINDEX"
+            ),
+            metric_type="COSINE",
+        )
+        return index_params
+
+    def __warn_if_not_partitioned(self, collection_name: str):
+        """
+        Warn when a collection predates org_id being its partition key, and still searches every
+        tenant's rows.
+        """
+        if self.backend != MILVUS_BACKEND:
+            return
+
+        fields = self.client.describe_collection(collection_name)["fields"]
+        if not any(
+            field["name"] == "org_id" and field.get("is_partition_key")
+            for field in fields
+        ):
+            logging.warning(
+                f"{collection_name} is not partitioned by org_id, run scripts/migrate_org_partition_key.py"
+            )
+
+    def __existing_storage(
+        self, collection_name: str, storage: VectorStorage
+    ) -> VectorStorage:
+        """
+        Get the storage of a collection that already exists. Its vector type and dimension can't
+        change after creation, so they win over the configured ones.
+        """
+        fields = self.client.describe_collection(collection_name)["fields"]
+        field = next((field for field in fields if field["name"] == "vector"), None)
+        if field is None or "type" not in field:
+            return storage
+
+        vector_type = getattr(field["type"], "name", field["type"])
+        dimension = int(field.get("params", {}).get("dim", self.dimension))
+        modes = {value: key for key, value in STORAGE_MODE_VECTOR_TYPES.items()}
+        existing = VectorStorage(
+            mode=modes.get(vector_type, VECTOR_STORAGE_FLOAT32),
+            dimension=dimension if dimension != self.dimension else None,
+            rerank=storage.rerank,
+        )
+
+        if existing != storage:
+            logging.warning(
+                f"{collection_name} was created with {existing.mode} vectors of dimension "
+                f"{dimension}, ignoring the configured {storage.mode}/{storage.dimension}"
+            )
+
+        return existing
+
+    def __register_storage(self, collection_name: str, storage: VectorStorage):
+        """
+        Record how a collection stores its vectors, and create and load its full-precision
+        companion collection if it reranks. The companion lives in the same backend, so every
+        process reranking against a Milvus collection sees the same vectors.
+        """
+        _collection_storage[(self.backend, collection_name)] = storage
+        if not storage.rerank:
+            return
+
+        from pymilvus import DataType, CollectionSchema, FieldSchema
+
+        companion = self.full_precision_collection(collection_name)
+        if not self.client.has_collection(companion):
+            schema = CollectionSchema(
+                fields=[
+                    FieldSchema(
+                        name=PRIMARY_KEY_FIELD,
+                        dtype=DataType.VARCHAR,
+                        is_primary=True,
+                        max_length=1024,
+                    ),
+                    FieldSchema(
+                        name="vector", dtype=DataType.FLOAT_VECTOR, dim=self.dimension
+                    ),
+                ],
+                description=f"Full-precision {collection_name} vectors",
+            )
+            self.client.create_collection(companion, schema=schema)
+            self.client.create_index(companion, self.vector_index_params(VectorStorage()))
 
-        self.create_issue_collection()
-        self.create_documentation_collection()
-        self.create_code_collection()
+        self.client.load_collection(companion)
+
+    @staticmethod
+    def full_precision_collection(collection_name: str) -> str:
+        """
+        Get the name of the companion collection holding the float32 vectors of a collection that
+        reranks, keyed by the same primary keys.
+        """
+        return f"{collection_name}{FULL_PRECISION_COLLECTION_SUFFIX}"
 
     def create_runbook_collection(self):
         """
         Create a runbook collection if doesn't exist, and load it into memory. If exists in db
         already, then we just load into memory
         """
+        from pymilvus import DataType, CollectionSchema, FieldSchema
+
         fields = [
             FieldSchema(
                 name="id", dtype=DataType.VARCHAR, is_primary=True, max_length=36
@@ -150,15 +961,22 @@ class VectorDB:
 
         if not self.client.has_collection(RUNBOOK):
             self.client.create_collection(RUNBOOK, schema=schema)
-            self.client.create_index(RUNBOOK, IndexParams("vector"))
+            self.client.create_index(RUNBOOK, self.vector_index_params(VectorStorage()))
 
         self.client.load_collection(RUNBOOK)
 
-    def create_issue_collection(self):
+    def create_issue_collection(self, storage: Optional[VectorStorage] = None):
         """
         Create an issue collection if doesn't exist, and load it into memory. If exists in db
         already, then we just load into memory
+
+        Args:
+            storage: How to store the vectors if the collection is created. Defaults to the
+                collection's entry in COLLECTION_VECTOR_STORAGE.
         """
+        from pymilvus import DataType, CollectionSchema, FieldSchema
+
+        storage = self.__resolve_storage(ISSUE, storage)
         fields = [
             FieldSchema(
                 name=PRIMARY_KEY_FIELD,
@@ -166,7 +984,7 @@ class VectorDB:
                 is_primary=True,
                 max_length=36,
             ),
-            FieldSchema(name="vector", dtype=DataType.FLOAT_VECTOR, dim=self.dimension),
+            self.__vector_field(storage),
             FieldSchema(name="description", dtype=DataType.VARCHAR, max_length=65535),
             FieldSchema(
                 name="comments",
@@ -175,8 +993,18 @@ class VectorDB:
                 max_capacity=36,
                 max_length=65535,
             ),
-            FieldSchema(name="org_id", dtype=DataType.VARCHAR, max_length=36),
+            FieldSchema(
+                name="org_id",
+                dtype=DataType.VARCHAR,
+                max_length=36,
+                is_partition_key=True,
+            ),
             FieldSchema(name="ticket_number", dtype=DataType.VARCHAR, max_length=36),
+            FieldSchema(
+                name=CONTENT_HASH_FIELD, dtype=DataType.VARCHAR, max_length=64
+            ),
+            FieldSchema(name=START_LINE_FIELD, dtype=DataType.INT64, nullable=True),
+            FieldSchema(name=END_LINE_FIELD, dtype=DataType.INT64, nullable=True),
             FieldSchema(
                 name="metadata", dtype=DataType.JSON
             ),  # TODO remove this when the issue table becomes set in stone. This is for backwards compatibility in case we need to add new fields.
@@ -184,16 +1012,31 @@ class VectorDB:
         schema = CollectionSchema(fields=fields, description="Issue collection")
 
         if not self.client.has_collection(ISSUE):
-            self.client.create_collection(ISSUE, schema=schema)
-            self.client.create_index(ISSUE, IndexParams("vector"))
+            self.client.create_collection(
+                ISSUE, schema=schema, **TENANT_COLLECTION_OPTIONS
+            )
+            self.client.create_index(ISSUE, self.vector_index_params(storage))
+        else:
+            self.__ensure_added_fields(ISSUE)
+            self.__warn_if_not_partitioned(ISSUE)
+            storage = self.__existing_storage(ISSUE, storage)
+
+        self.__register_storage(ISSUE, storage)
 
         self.client.load_collection(ISSUE)
 
-    def create_documentation_collection(self):
+    def create_documentation_collection(self, storage: Optional[VectorStorage] = None):
         """
         Create a documentation collection if doesn't exist, and load it into memory. If exists in db
         already, then we just load into memory
+
+        Args:
+            storage: How to store the vectors if the collection is created. Defaults to the
+                collection's entry in COLLECTION_VECTOR_STORAGE.
         """
+        from pymilvus import DataType, CollectionSchema, FieldSchema
+
+        storage = self.__resolve_storage(DOCUMENTATION, storage)
         fields = [
             FieldSchema(
                 name=PRIMARY_KEY_FIELD,
@@ -201,24 +1044,49 @@ class VectorDB:
                 is_primary=True,
                 max_length=64,  # 16 bytes -> 32 hex characters for SHA3-256 hash
             ),
-            FieldSchema(name="vector", dtype=DataType.FLOAT_VECTOR, dim=self.dimension),
+            self.__vector_field(storage),
             FieldSchema(name="url", dtype=DataType.VARCHAR, max_length=2048),
             FieldSchema(name="content", dtype=DataType.VARCHAR, max_length=65535),
-            FieldSchema(name="org_id", dtype=DataType.VARCHAR, max_length=36),
-        ]
-        schema = CollectionSchema(fields=fields, description="Documentation collection")
-
+            FieldSchema(
+                name="org_id",
+                dtype=DataType.VARCHAR,
+                max_length=36,
+                is_partition_key=True,
+            ),
+            FieldSchema(
+                name=CONTENT_HASH_FIELD, dtype=DataType.VARCHAR, max_length=64
+            ),
+            FieldSchema(name=START_LINE_FIELD, dtype=DataType.INT64, nullable=True),
+            FieldSchema(name=END_LINE_FIELD, dtype=DataType.INT64, nullable=True),
+        ]
+        schema = CollectionSchema(fields=fields, description="Documentation collection")
+
         if not self.client.has_collection(DOCUMENTATION):
-            self.client.create_collection(DOCUMENTATION, schema=schema)
-            self.client.create_index(DOCUMENTATION, IndexParams("vector"))
+            self.client.create_collection(
+                DOCUMENTATION, schema=schema, **TENANT_COLLECTION_OPTIONS
+            )
+            self.client.create_index(DOCUMENTATION, self.vector_index_params(storage))
+        else:
+            self.__ensure_added_fields(DOCUMENTATION)
+            self.__warn_if_not_partitioned(DOCUMENTATION)
+            storage = self.__existing_storage(DOCUMENTATION, storage)
+
+        self.__register_storage(DOCUMENTATION, storage)
 
         self.client.load_collection(DOCUMENTATION)
 
-    def create_code_collection(self):
+    def create_code_collection(self, storage: Optional[VectorStorage] = None):
         """
         Create a code collection if doesn't exist, and load it into memory. If exists in db
         already, then we just load into memory
+
+        Args:
+            storage: How to store the vectors if the collection is created. Defaults to the
+                collection's entry in COLLECTION_VECTOR_STORAGE.
         """
+        from pymilvus import DataType, CollectionSchema, FieldSchema
+
+        storage = self.__resolve_storage(CODE, storage)
         fields = [
             FieldSchema(
                 name=PRIMARY_KEY_FIELD,
@@ -226,25 +1094,131 @@ class VectorDB:
                 is_primary=True,
                 max_length=1024,
             ),
-            FieldSchema(name="vector", dtype=DataType.FLOAT_VECTOR, dim=self.dimension),
+            self.__vector_field(storage),
             FieldSchema(name="content", dtype=DataType.VARCHAR, max_length=65535),
-            FieldSchema(name="org_id", dtype=DataType.VARCHAR, max_length=36),
+            FieldSchema(
+                name="org_id",
+                dtype=DataType.VARCHAR,
+                max_length=36,
+                is_partition_key=True,
+            ),
             FieldSchema(name="page_type", dtype=DataType.VARCHAR, max_length=32),
             FieldSchema(name="sha", dtype=DataType.VARCHAR, max_length=64),
+            FieldSchema(
+                name=CONTENT_HASH_FIELD, dtype=DataType.VARCHAR, max_length=64
+            ),
+            FieldSchema(name=START_LINE_FIELD, dtype=DataType.INT64, nullable=True),
+            FieldSchema(name=END_LINE_FIELD, dtype=DataType.INT64, nullable=True),
         ]
         schema = CollectionSchema(fields=fields, description="Code collection")
 
         if not self.client.has_collection(CODE):
-            self.client.create_collection(CODE, schema=schema)
-            self.client.create_index(CODE, IndexParams("vector"))
+            self.client.create_collection(
+                CODE, schema=schema, **TENANT_COLLECTION_OPTIONS
+            )
+            self.client.create_index(CODE, self.vector_index_params(storage))
+        else:
+            self.__ensure_added_fields(CODE)
+            self.__warn_if_not_partitioned(CODE)
+            storage = self.__existing_storage(CODE, storage)
+
+        self.__register_storage(CODE, storage)
 
         self.client.load_collection(CODE)
 
-    def vanilla_embed(self, text: str) -> List[float]:
+    def __ensure_added_fields(self, collection_name: str):
         """
-        Embed a string using the embedding model.
+        Add the fields of ADDED_FIELDS missing from a collection created before they existed.
+        Rows written before a field was added have it null: a null content hash gets the row
+        re-embedded once, and null lines mean the chunk's line range is unknown. Fields that can't
+        be added are recorded, see missing_fields.
         """
-        return self.model.encode(text)
+        from pymilvus import DataType
+
+        existing = {
+            field["name"]
+            for field in self.client.describe_collection(collection_name)["fields"]
+        }
+        for name, (data_type, kwargs) in ADDED_FIELDS.items():
+            if name in existing:
+                continue
+
+            try:
+                self.client.add_collection_field(
+                    collection_name,
+                    name,
+                    getattr(DataType, data_type),
+                    nullable=True,
+                    **kwargs,
+                )
+            except Exception as e:
+                logging.error(
+                    f"Failed to add {name} to {collection_name}, leaving it out of every row: {str(e)}"
+                )
+                logging.error(traceback.format_exc())
+                _missing_fields.setdefault((self.backend, collection_name), set()).add(
+                    name
+                )
+
+    @staticmethod
+    def content_hash(text: str) -> str:
+        """
+        Hash the embeddable text of a chunk, to detect whether it changed since it was last indexed.
+        """
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get_changed_keys(
+        self, collection_name: str, hashes: Dict[str, str]
+    ) -> Set[str]:
+        """
+        Find the chunks whose content differs from what's stored, fetching only the primary key
+        and content hash of existing rows, CHANGE_DETECTION_BATCH_SIZE keys per query.
+
+        Args:
+            collection_name: The collection to check against
+            hashes: Mapping of chunk primary key to the content hash of its new text
+
+        Returns:
+            Set[str]: Primary keys of the chunks that are new or changed and need embedding. All
+                of them if the collection has no content hash, see missing_fields.
+        """
+        keys = list(hashes.keys())
+        changed = set(keys)
+        if CONTENT_HASH_FIELD in self.missing_fields(collection_name):
+            return changed
+
+        for start in range(0, len(keys), CHANGE_DETECTION_BATCH_SIZE):
+            batch = keys[start : start + CHANGE_DETECTION_BATCH_SIZE]
+            try:
+                rows = self.client.get(
+                    collection_name,
+                    ids=batch,
+                    output_fields=[PRIMARY_KEY_FIELD, CONTENT_HASH_FIELD],
+                )
+            except Exception as e:
+                logging.error(
+                    f"Failed to get content hashes from {collection_name}: {str(e)}"
+                )
+                continue
+
+            for row in rows:
+                key = row[PRIMARY_KEY_FIELD]
+                if row.get(CONTENT_HASH_FIELD) == hashes[key]:
+                    changed.discard(key)
+
+        return changed
+
+    def embed_query(self, query: str) -> List[float]:
+        """
+        Embed a search query, reusing the embedding if the same query was embedded recently.
+        """
+        return self.model.encode_queries([query])[0]
+
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """
+        Embed several search queries in one call, skipping those embedded recently.
+        """
+        return self.model.encode_queries(queries)
 
     def __issue_to_embeddable_string(self, issue: Issue) -> str:
         """
@@ -279,9 +1253,6 @@ class VectorDB:
         Returns:
             List[float]: The embedding vector
         """
-        if self.is_debug_mode:
-            return [0.0] * self.dimension
-
         if isinstance(data, Issue):
             text = self.__issue_to_embeddable_string(data)
         elif isinstance(data, DocumentationPage):
@@ -291,126 +1262,263 @@ class VectorDB:
 
         return self.model.encode(text)
 
-    def add_issue(self, issue: Issue):
+    def __embed_and_upsert(
+        self, collection_name: str, entities: List[Dict[str, Any]], texts: List[str]
+    ) -> List[str]:
         """
-        Add a new issue to the vector db by splitting it into chunks.
+        Embed the texts in bulk and upsert them alongside their entities, UPSERT_BATCH_SIZE at a time.
+        entities[i] gets the vector for texts[i]. Collections that rerank also get the full-precision
+        vectors written to its companion collection.
+
+        Returns:
+            List[str]: Primary keys of the entities of the batches that failed to embed or upsert
         """
-        chunks = self.__chunk_data(self.__issue_to_embeddable_string(issue))
-
-        for i, chunk in enumerate(chunks):
-            chunk_key = f"{issue.primary_key}-{i}"
-            prev_data = self.client.get(ISSUE, chunk_key)
-            if len(prev_data) > 0:
-                # Need to load comments in to comply with Issue model
-                comments = [
-                    Comment.model_validate_json(comment_json)
-                    for comment_json in prev_data[0]["comments"]
-                ]
-                prev_data[0]["comments"] = comments
-                prev_data_issue = Issue(**prev_data[0])
-
-                # compare content, if there's even a slight difference, we should update the issue vector.
-                if self.__issue_to_embeddable_string(prev_data_issue) == chunk:
-                    continue
+        storage = self.vector_storage(collection_name)
+        missing = self.missing_fields(collection_name)
+        failed = []
+        for start in range(0, len(entities), UPSERT_BATCH_SIZE):
+            batch = [
+                {field: value for field, value in entity.items() if field not in missing}
+                for entity in entities[start : start + UPSERT_BATCH_SIZE]
+            ]
+            batch_texts = texts[start : start + UPSERT_BATCH_SIZE]
 
             try:
-                vector = self.vanilla_embed(chunk)
+                vectors = self.model.encode_batch(batch_texts)
+                for entity, vector in zip(
+                    batch, to_vector_rows(to_stored_vectors(vectors, storage))
+                ):
+                    entity["vector"] = vector
+
+                self.client.upsert(collection_name, data=batch)
+
+                if storage.rerank:
+                    self.client.upsert(
+                        self.full_precision_collection(collection_name),
+                        data=[
+                            {PRIMARY_KEY_FIELD: entity[PRIMARY_KEY_FIELD], "vector": vector}
+                            for entity, vector in zip(batch, vectors)
+                        ],
+                    )
             except Exception as e:
-                logging.error(f"Failed to embed chunk {i}: {str(e)}")
+                logging.error(
+                    f"Failed to embed and upsert {len(batch_texts)} chunks for {collection_name}: {str(e)}"
+                )
                 logging.error(traceback.format_exc())
+                failed.extend(entity[PRIMARY_KEY_FIELD] for entity in batch)
 
-            entity = [
-                {
-                    PRIMARY_KEY_FIELD: f"{issue.primary_key}-{i}",
-                    "vector": vector,
-                    "description": issue.description,
-                    "comments": [
-                        comment.model_dump_json() for comment in issue.comments
-                    ],
-                    "org_id": str(issue.org_id),
-                    "ticket_number": issue.ticket_number,
-                    "metadata": {},  # Nothing for now, but we can add new fields here in the future.
-                }
-            ]
+        return failed
 
-            self.client.upsert(ISSUE, data=entity)
+    def __orphan_failed(self, collection_name: str, failed: List[str]):
+        """
+        Turn chunks that failed to be stored into orphans of the dedup index (see
+        DedupIndex.orphan), so that nothing gets linked to content that isn't stored, and the
+        chunks get ingested again.
+        """
+        if not failed:
+            return
 
-    def get_all_issues(self, filter_by_org_id: bool = True) -> List[Issue]:
+        index = get_dedup_index(self.user_id, collection_name)
+        index.orphan(failed)
+        index.save()
+
+    def __drop_unchanged(
+        self, collection_name: str, entities: List[Dict[str, Any]], texts: List[str]
+    ) -> Tuple[List[Dict[str, Any]], List[str]]:
         """
-        Get all issues from the vector db
+        Filter out the entities whose content hash matches what's already stored in the collection.
+        """
+        changed = self.get_changed_keys(
+            collection_name,
+            {entity[PRIMARY_KEY_FIELD]: entity[CONTENT_HASH_FIELD] for entity in entities},
+        )
+        logging.info(
+            f"{len(changed)} of {len(entities)} chunks in {collection_name} are new or changed"
+        )
+
+        kept = [
+            (entity, text)
+            for entity, text in zip(entities, texts)
+            if entity[PRIMARY_KEY_FIELD] in changed
+        ]
+        return [entity for entity, _ in kept], [text for _, text in kept]
+
+    def __deduplicate(
+        self,
+        collection_name: str,
+        chunks: List[Tuple[str, str]],
+        source: Optional[str] = None,
+    ) -> List[Tuple[str, str]]:
+        """
+        Drop the chunks that duplicate one already stored in the collection (or an earlier one of
+        the same batch), see DedupIndex. Chunks that were stored before but are duplicates now are
+        deleted from the collection.
+
+        Args:
+            chunks: (primary key, text) pairs
+            source: Where the chunks come from, e.g. the repository, for the dedup report
+
+        Returns:
+            List[Tuple[str, str]]: The canonical chunks, the only ones to embed and store
+        """
+        index = get_dedup_index(self.user_id, collection_name)
+        linked_before = {key for key, _ in chunks if key in index.links}
+        canonical = index.deduplicate(chunks, source)
+        index.save()
+
+        kept = {key for key, _ in canonical}
+        newly_linked = [
+            key for key, _ in chunks if key not in kept and key not in linked_before
+        ]
+        if newly_linked:
+            self.__delete(collection_name, newly_linked)
+
+        logging.info(
+            f"{len(chunks) - len(canonical)} of {len(chunks)} chunks from {source or collection_name} are duplicates"
+        )
+        return canonical
+
+    def add_issue(self, issue: Issue):
+        """
+        Add a new issue to the vector db by splitting it into chunks.
+        """
+        self.add_issues([issue])
+
+    def issue_chunks(self, issue: Issue) -> List[Chunk]:
+        """
+        Split an issue into the chunks it is stored as, cutting between its description and
+        comments first.
+        """
+        return self.chunker.chunk_issue(
+            issue.description,
+            [
+                f"{comment.requestor_name}: {comment.comment}"
+                for comment in issue.comments
+            ],
+            path=issue.ticket_number or issue.primary_key,
+        )
+
+    def add_issues(self, issues: List[Issue]):
+        """
+        Add many issues to the vector db, embedding and upserting their chunks in bulk.
+        """
+        entities, texts = [], []
+        for issue in issues:
+            for i, chunk in enumerate(self.issue_chunks(issue)):
+                entities.append(
+                    {
+                        PRIMARY_KEY_FIELD: f"{issue.primary_key}-{i}",
+                        "description": issue.description,
+                        "comments": [
+                            comment.model_dump_json() for comment in issue.comments
+                        ],
+                        "org_id": str(issue.org_id),
+                        "ticket_number": issue.ticket_number,
+                        CONTENT_HASH_FIELD: self.content_hash(chunk.text),
+                        START_LINE_FIELD: chunk.start_line,
+                        END_LINE_FIELD: chunk.end_line,
+                        "metadata": {},  # Nothing for now, but we can add new fields here in the future.
+                    }
+                )
+                texts.append(chunk.text)
+
+        entities, texts = self.__drop_unchanged(ISSUE, entities, texts)
+        self.__embed_and_upsert(ISSUE, entities, texts)
+
+    def iter_rows(
+        self,
+        collection_name: str,
+        filter: str = "",
+        output_fields: Optional[List[str]] = None,
+        batch_size: int = QUERY_ITERATOR_BATCH_SIZE,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Stream the rows of a collection matching a filter. Uses a server-side query iterator, so
+        each batch costs the same no matter how deep into the collection we are, and only one
+        batch is held in memory at a time.
+
+        Args:
+            collection_name: The collection to scan
+            filter: Milvus boolean expression rows must match
+            output_fields: The fields to return for each row. Defaults to the primary key only.
+            batch_size: The number of rows to fetch per round trip
+        """
+        self.ensure_collection(collection_name)
+        iterator = self.client.query_iterator(
+            collection_name=collection_name,
+            batch_size=batch_size,
+            filter=filter,
+            output_fields=output_fields or [PRIMARY_KEY_FIELD],
+        )
+
+        try:
+            while True:
+                batch = iterator.next()
+                if not batch:
+                    break
+
+                yield from batch
+        finally:
+            iterator.close()
+
+    def iter_issue_rows(
+        self,
+        output_fields: Optional[List[str]] = None,
+        filter_by_org_id: bool = True,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Stream raw issue rows with the requested projection, e.g. [PRIMARY_KEY_FIELD] for ids only.
+        """
+        filter = self.org_filter() if filter_by_org_id else ""
+        return self.iter_rows(ISSUE, filter, output_fields)
+
+    def iter_issues(
+        self, filter_by_org_id: bool = True, include_vectors: bool = False
+    ) -> Iterator[Issue]:
+        """
+        Stream all issues from the vector db, optionally without their vectors.
         """
-        # Get all primary keys from the collection
         output_fields = [
             PRIMARY_KEY_FIELD,
             "description",
             "comments",
             "org_id",
-            "vector",
             "ticket_number",
         ]
-        batch_size = 100
-        offset = 0
-        all_results = []
-
-        while True:
-            filter = f"org_id == '{str(self.user_id)}'" if filter_by_org_id else ""
-            results = self.client.query(
-                collection_name=ISSUE,
-                output_fields=output_fields,
-                limit=batch_size,
-                offset=offset,
-                filter=filter,
-            )
+        if include_vectors:
+            output_fields.append("vector")
 
-            all_results.extend(results)
-            offset += batch_size
-
-            if len(results) < batch_size:
-                break
-
-        retval = []
-        for issue in all_results:
+        for issue in self.iter_issue_rows(output_fields, filter_by_org_id):
             issue["comments"] = [
                 Comment.model_validate_json(comment_json)
                 for comment_json in issue["comments"]
             ]
-            retval.append(Issue(**issue))
+            yield Issue(**issue)
 
-        return retval
+    def get_all_issues(self, filter_by_org_id: bool = True) -> List[Issue]:
+        """
+        Get all issues from the vector db
+        """
+        return list(self.iter_issues(filter_by_org_id, include_vectors=True))
 
     def get_top_k_issues(self, k: int, query_vector: List[float]) -> Dict[str, Any]:
         """
         Get top k issues matching the org_id of this vector db instance
         """
-        search_params = {"metric_type": "COSINE", "params": {"nprobe": 10}}
-
-        # TODO enforce org id filter over search for this and other collections.
-        filter = f'org_id == "{str(self.user_id)}"'
-        results = self.client.search(
-            collection_name=ISSUE,
-            data=[query_vector],
-            anns_field="vector",
-            search_params=search_params,
-            limit=k,
-            output_fields=[
-                "vector",
-                "description",
-                "comments",
-                "org_id",
-                "ticket_number",
-            ],
-            filter=filter,
-        )
+        hits = self.__search(ISSUE, [query_vector], k, self.org_filter())[0]
+        return self.__issue_hits_to_results(hits)
 
+    def __issue_hits_to_results(self, hits: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Convert raw search hits over the issue collection to {id: {similarity, metadata}}.
+        """
         issues = {}
-        for result in results[
-            0
-        ]:  # TODO make sure we're returning the ticket number correctly, not doing that right at the moment. The primary key is returned, and the ticket number is null.
+        for result in hits:  # TODO make sure we're returning the ticket number correctly, not doing that right at the moment. The primary key is returned, and the ticket number is null.
             issue_id = result["id"]
             distance = result["distance"]
             problem_description = result["entity"]["description"]
             comments = result["entity"]["comments"]
-            vector = result["entity"]["vector"]
+            vector = result["entity"].get("vector")
             ticket_number = result["entity"]["ticket_number"]
 
             loaded_comments = [
@@ -436,34 +1544,89 @@ class VectorDB:
         """
         Add documentation page to vector db
         """
+        self.add_documentation_pages([doc])
 
-        prev_data = self.client.get(DOCUMENTATION, doc.primary_key)
-        if len(prev_data) > 0:
-            # compare content, if there's even a slight difference, we should update the issue vector.
-            prev_data_doc = DocumentationPage(**prev_data[0])
-            if self.__docu_page_to_embeddable_string(
-                prev_data_doc
-            ) == self.__docu_page_to_embeddable_string(doc):
-                return  # Page content is the same as existing page, just continue.
-
-        vector = self.embed(doc)
-        entity = [
-            {
-                PRIMARY_KEY_FIELD: str(doc.primary_key),
-                "vector": vector,
-                "url": doc.url,
-                "content": doc.content,
-                "org_id": str(self.user_id),
-            }
+    def add_documentation_pages(
+        self, docs: List[DocumentationPage], source: Optional[str] = None
+    ):
+        """
+        Add many documentation pages to the vector db, split by headings into chunks that are
+        embedded and upserted in bulk. Chunks duplicating one already stored are linked to it
+        instead, see DedupIndex.
+
+        Args:
+            docs: The pages to add
+            source: Where the pages come from, e.g. the documentation site, for the dedup report
+        """
+        self.__remove_unchunked_pages([str(doc.primary_key) for doc in docs])
+
+        chunks = {}
+        for doc in docs:
+            for i, chunk in enumerate(
+                self.chunker.chunk_markdown(doc.content, path=doc.url)
+            ):
+                chunks[f"{doc.primary_key}-{i}"] = (
+                    doc,
+                    chunk,
+                    self.__docu_page_to_embeddable_string(
+                        doc.model_copy(update={"content": chunk.text})
+                    ),
+                )
+
+        entities, texts = [], []
+        for key, text in self.__deduplicate(
+            DOCUMENTATION, [(key, text) for key, (_, _, text) in chunks.items()], source
+        ):
+            doc, chunk, _ = chunks[key]
+            entities.append(
+                {
+                    PRIMARY_KEY_FIELD: key,
+                    "url": doc.url,
+                    "content": chunk.text,
+                    "org_id": str(self.user_id),
+                    CONTENT_HASH_FIELD: self.content_hash(text),
+                    START_LINE_FIELD: chunk.start_line,
+                    END_LINE_FIELD: chunk.end_line,
+                }
+            )
+            texts.append(text)
+
+        entities, texts = self.__drop_unchanged(DOCUMENTATION, entities, texts)
+        self.__orphan_failed(
+            DOCUMENTATION, self.__embed_and_upsert(DOCUMENTATION, entities, texts)
+        )
+
+    def __remove_unchunked_pages(self, keys: List[str]):
+        """
+        Delete the rows of pages stored whole, under their page key, before documentation was
+        chunked. They are known to the dedup index under that key.
+        """
+        index = get_dedup_index(self.user_id, DOCUMENTATION)
+        unchunked = [
+            key for key in keys if key in index.signatures or key in index.links
         ]
+        if not unchunked:
+            return
 
-        self.client.upsert(DOCUMENTATION, data=entity)
+        index.remove(unchunked)
+        index.save()
+        self.ensure_collection(DOCUMENTATION)
+        self.client.delete(DOCUMENTATION, ids=unchunked)
 
     def get_all_documentation(self, keys: List[str]) -> List[DocumentationPage]:
         """
-        Get all documentation pages from the vector db
+        Get the stored chunks of documentation pages from the vector db, by page key
         """
-        docs = self.client.get(DOCUMENTATION, ids=keys)
+        if not keys:
+            return []
+
+        self.ensure_collection(DOCUMENTATION)
+        pages = " or ".join(f'{PRIMARY_KEY_FIELD} like "{key}-%"' for key in keys)
+        docs = self.client.query(
+            DOCUMENTATION,
+            filter=pages,
+            output_fields=[PRIMARY_KEY_FIELD, *self.output_fields(DOCUMENTATION)],
+        )
         return [DocumentationPage(**doc) for doc in docs]
 
     def get_top_k_documentation(
@@ -472,25 +1635,22 @@ class VectorDB:
         """
         Get top k documentation pages
         """
-        search_params = {"metric_type": "COSINE", "params": {"nprobe": 10}}
-        filter = f"org_id == '{str(self.user_id)}'"
-        results = self.client.search(
-            collection_name=DOCUMENTATION,
-            data=[query_vector],
-            anns_field="vector",
-            search_params=search_params,
-            limit=k,
-            output_fields=["vector", "url", "content"],
-            filter=filter,
-        )
+        hits = self.__search(DOCUMENTATION, [query_vector], k, self.org_filter())[0]
+        return self.__documentation_hits_to_results(hits)
 
+    def __documentation_hits_to_results(
+        self, hits: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """
+        Convert raw search hits over the documentation collection to {id: {similarity, metadata}}.
+        """
         docs = {}
-        for result in results[0]:
+        for result in hits:
             doc_id = result["id"]
             distance = result["distance"]
             url = result["entity"]["url"]
             content = result["entity"]["content"]
-            vector = result["entity"]["vector"]
+            vector = result["entity"].get("vector")
 
             doc = DocumentationPage(
                 primary_key=doc_id,
@@ -498,6 +1658,8 @@ class VectorDB:
                 org_id=self.user_id,
                 url=url,
                 content=content,
+                start_line=result["entity"].get(START_LINE_FIELD),
+                end_line=result["entity"].get(END_LINE_FIELD),
             )
 
             docs[doc_id] = {
@@ -507,83 +1669,163 @@ class VectorDB:
 
         return docs
 
-    def __chunk_data(self, content: str) -> List[str]:
+    def add_code_file(self, file: CodePage):
+        """
+        Add a code file to the vector db
+        """
+        self.add_code_files([file])
+
+    def code_chunks(self, file: CodePage) -> List[Tuple[str, Chunk]]:
         """
-        Chunk the data into several smaller chunks, each of character length of num_tokens_from_string(content, self.model.model_name).
+        Split a code file into the (primary key, chunk) pairs it is stored as, cutting at the
+        definitions of its language.
         """
-        chunks = [
-            content[i : i + self.chunk_size]
-            for i in range(0, len(content), self.chunk_size)
+        return [
+            (f"{file.primary_key}-{i}", chunk)
+            for i, chunk in enumerate(
+                self.chunker.chunk(file.content, path=file.primary_key)
+            )
         ]
-        return chunks
 
-    def add_code_file(self, file: CodePage):
+    def add_code_files(
+        self, files: List[CodePage], source: Optional[str] = None
+    ) -> List[Tuple[str, str]]:
         """
-        Add a code file to the vector db
+        Add many code files to the vector db, embedding and upserting their chunks in bulk.
+        Chunks duplicating one already stored (vendored or generated code, copied examples) are
+        linked to it instead, see DedupIndex.
+
+        Args:
+            files: The files to add
+            source: Where the files come from, e.g. the repository, for the dedup report
+
+        Returns:
+            List[Tuple[str, str]]: The (primary key, content) of the chunks stored for the files
         """
-        chunks = self.__chunk_data(file.content)
+        return self.add_code_chunks(
+            [(file, key, chunk) for file in files for key, chunk in self.code_chunks(file)],
+            source,
+        )
 
-        for i, chunk in enumerate(chunks):
-            chunk_key = f"{file.primary_key}-{i}"
+    def add_code_chunks(
+        self,
+        chunks: List[Tuple[CodePage, str, Chunk]],
+        source: Optional[str] = None,
+    ) -> List[Tuple[str, str]]:
+        """
+        Add code files already split by code_chunks, see add_code_files.
 
-            try:
-                prev_data = self.client.get(CODE, chunk_key)
-            except Exception as e:
-                logging.error(f"Failed to get previous data for {chunk_key}: {str(e)}")
-                # logging.error(traceback.format_exc())
-                prev_data = []
-
-            if len(prev_data) > 0:
-                # compare content, if there's even a slight difference, we should update the code vector.
-                prev_data_code = CodePage(**prev_data[0])
-                if (
-                    self.__code_to_embeddable_string(prev_data_code) == chunk
-                ):  # This is ok so long as the code to embeddable string is just the content.
-                    continue
+        Args:
+            chunks: (file, primary key, chunk) triples
+            source: Where the files come from, e.g. the repository, for the dedup report
 
-            try:
-                vector = self.vanilla_embed(chunk)
-            except Exception as e:
-                logging.error(f"Failed to embed chunk {i}: {str(e)}")
-                logging.error(traceback.format_exc())
+        Returns:
+            List[Tuple[str, str]]: The (primary key, content) of the chunks stored. Chunks that
+                failed to embed or upsert are left out, and become orphans of the dedup index to
+                ingest again, see DedupIndex.orphan.
+        """
+        files_by_key, chunks_by_key = {}, {}
+        for file, key, chunk in chunks:
+            files_by_key[key] = file
+            chunks_by_key[key] = chunk
 
-            entity = [
+        canonical = self.__deduplicate(
+            CODE, [(key, chunk.text) for key, chunk in chunks_by_key.items()], source
+        )
+
+        entities, texts = [], []
+        for key, text in canonical:
+            file, chunk = files_by_key[key], chunks_by_key[key]
+            entities.append(
                 {
-                    PRIMARY_KEY_FIELD: f"{file.primary_key}-{i}",
-                    "vector": vector,
-                    "content": chunk,
+                    PRIMARY_KEY_FIELD: key,
+                    "content": text,
                     "org_id": str(file.org_id),
                     "page_type": file.page_type.value,
                     "sha": file.sha,
+                    CONTENT_HASH_FIELD: self.content_hash(text),
+                    START_LINE_FIELD: chunk.start_line,
+                    END_LINE_FIELD: chunk.end_line,
                 }
-            ]
+            )
+            texts.append(text)
+
+        entities, texts = self.__drop_unchanged(CODE, entities, texts)
+        failed = self.__embed_and_upsert(CODE, entities, texts)
+        self.__orphan_failed(CODE, failed)
+
+        failed = set(failed)
+        return [(key, text) for key, text in canonical if key not in failed]
+
+    def remove_code_chunks(self, keys: List[str]):
+        """
+        Delete code chunks by primary key, e.g. those of deleted files, from the collection and
+        the dedup index. Duplicates linked to removed chunks become orphans, see
+        DedupIndex.pop_orphans.
+        """
+        if not keys:
+            return
+
+        index = get_dedup_index(self.user_id, CODE)
+        index.remove(keys)
+        index.save()
+        self.__delete(CODE, keys)
 
-            self.client.upsert(CODE, data=entity)
+    def __delete(self, collection_name: str, keys: List[str]):
+        """
+        Delete rows by primary key, along with their full-precision vectors if the collection reranks.
+        """
+        storage = self.vector_storage(collection_name)
+        self.client.delete(collection_name, ids=keys)
+        if storage.rerank:
+            self.client.delete(self.full_precision_collection(collection_name), ids=keys)
 
     def get_top_k_code(self, k: int, query_vector: List[float]) -> Dict[str, Any]:
         """
         Get top k code files
         """
-        search_params = {"metric_type": "COSINE", "params": {"nprobe": 10}}
-        filter = f"org_id == '{str(self.user_id)}'"
-        results = self.client.search(
-            collection_name=CODE,
-            data=[query_vector],
-            anns_field="vector",
-            search_params=search_params,
-            limit=k,
-            output_fields=["vector", "content", "org_id", "page_type", "sha"],
-            filter=filter,
+        hits = self.__search(CODE, [query_vector], k, self.org_filter())[0]
+        return self.__code_hits_to_results(hits)
+
+    def get_code_chunks(self, keys: List[str]) -> Dict[str, Any]:
+        """
+        Get code chunks of this org by primary key, in the {id: {similarity, metadata}} form of
+        get_top_k_code with a similarity of 0.
+        """
+        if not keys:
+            return {}
+
+        self.ensure_collection(CODE)
+        rows = self.client.get(
+            CODE, ids=keys, output_fields=[PRIMARY_KEY_FIELD, *self.output_fields(CODE)]
         )
+        return self.code_rows_to_results(rows)
 
+    def code_rows_to_results(self, rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Convert code rows fetched by primary key to the form of get_code_chunks, dropping rows of
+        other orgs.
+        """
+        return self.__code_hits_to_results(
+            [
+                {"id": row[PRIMARY_KEY_FIELD], "distance": 0.0, "entity": row}
+                for row in rows
+                if row.get("org_id") == str(self.user_id)
+            ]
+        )
+
+    def __code_hits_to_results(self, hits: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Convert raw search hits over the code collection to {id: {similarity, metadata}}.
+        """
         code = {}
-        for result in results[0]:
+        for result in hits:
             code_id = result["id"]
             distance = result["distance"]
             content = result["entity"]["content"]
             org_id = result["entity"]["org_id"]
             page_type = result["entity"]["page_type"]
-            vector = result["entity"]["vector"]
+            vector = result["entity"].get("vector")
             sha = result["entity"]["sha"]
 
             code_file = CodePage(
@@ -593,6 +1835,8 @@ class VectorDB:
                 content=content,
                 page_type=page_type,
                 sha=sha,
+                start_line=result["entity"].get(START_LINE_FIELD),
+                end_line=result["entity"].get(END_LINE_FIELD),
             )
 
             code[code_id] = {
@@ -602,32 +1846,601 @@ class VectorDB:
 
         return code
 
-    def get_code_pages(self, filename_filter: Optional[str] = None) -> List[CodePage]:
+    def org_filter(self) -> str:
         """
-        Get all code pages from the vector db
+        Get the filter expression scoping a search or scan to this vector db's org. org_id is the
+        partition key, so Milvus only visits this org's partitions for it.
+        """
+        return f"org_id == '{str(self.user_id)}'"
+
+    def search_request(
+        self,
+        collection_name: str,
+        query_vectors: List[List[float]],
+        k: int,
+        filter: str,
+    ) -> Dict[str, Any]:
+        """
+        Build the arguments of a vector client search over a collection for several query vectors.
+        If the collection reranks, RERANK_CANDIDATES_MULTIPLIER times as many candidates are asked
+        for, see rerank_search_hits.
+        """
+        storage = self.vector_storage(collection_name)
+        return {
+            "collection_name": collection_name,
+            "data": to_vector_rows(to_stored_vectors(query_vectors, storage)),
+            "anns_field": "vector",
+            "search_params": {"metric_type": "COSINE", "params": {"nprobe": 10}},
+            "limit": k * RERANK_CANDIDATES_MULTIPLIER if storage.rerank else k,
+            "output_fields": self.output_fields(collection_name),
+            "filter": filter,
+        }
+
+    def rerank_search_hits(
+        self,
+        collection_name: str,
+        query_vectors: List[List[float]],
+        hits: List[List[Dict[str, Any]]],
+        k: int,
+        full_vectors: Dict[str, List[float]],
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Rescore the candidates of a search against their full-precision vectors, if the collection
+        reranks, keeping the best k of each query.
+
+        Args:
+            full_vectors: The full-precision vector of each candidate, see get_full_vectors
+        """
+        if not self.vector_storage(collection_name).rerank:
+            return hits
+
+        return [
+            rerank_hits(query_hits, query_vector, full_vectors, k)
+            for query_vector, query_hits in zip(query_vectors, hits)
+        ]
+
+    def get_full_vectors(
+        self, collection_name: str, hits: List[List[Dict[str, Any]]]
+    ) -> Dict[str, List[float]]:
+        """
+        Get the full-precision vectors of search candidates from the companion collection.
+        Collections that don't rerank have none. Candidates missing from it, e.g. rows written
+        before the collection reranked, keep their approximate similarity.
+        """
+        if not self.vector_storage(collection_name).rerank:
+            return {}
+
+        candidate_ids = list(
+            dict.fromkeys(hit["id"] for query_hits in hits for hit in query_hits)
+        )
+        full_vectors = {
+            row[PRIMARY_KEY_FIELD]: row["vector"]
+            for row in self.client.get(
+                self.full_precision_collection(collection_name),
+                ids=candidate_ids,
+                output_fields=[PRIMARY_KEY_FIELD, "vector"],
+            )
+        }
+        if len(full_vectors) < len(candidate_ids):
+            logging.warning(
+                f"{len(candidate_ids) - len(full_vectors)} of {len(candidate_ids)} {collection_name} candidates have no full-precision vector, not reranking them"
+            )
+
+        return full_vectors
+
+    def __search(
+        self,
+        collection_name: str,
+        query_vectors: List[List[float]],
+        k: int,
+        filter: str,
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Search a collection for several query vectors in one round trip, reranking the candidates
+        if the collection does.
+
+        Returns:
+            List[List[Dict[str, Any]]]: The raw hits for each query vector, in order
+        """
+        hits = self.client.search(
+            **self.search_request(collection_name, query_vectors, k, filter)
+        )
+        return self.rerank_search_hits(
+            collection_name,
+            query_vectors,
+            hits,
+            k,
+            self.get_full_vectors(collection_name, hits),
+        )
+
+    def hits_to_results(
+        self, collection_name: str, hits: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """
+        Convert raw search hits over a collection to the {id: {similarity, metadata}} mapping the
+        get_top_k_* methods return.
+        """
+        hits_to_results = {
+            ISSUE: self.__issue_hits_to_results,
+            DOCUMENTATION: self.__documentation_hits_to_results,
+            CODE: self.__code_hits_to_results,
+        }
+        return hits_to_results[collection_name](hits)
+
+    def group_searches(
+        self, searches: List[Tuple[str, List[float], int, Optional[str]]]
+    ) -> Dict[Tuple[str, str], List[int]]:
+        """
+        Group searches over the same collection and filter, see search_many.
+
+        Returns:
+            Dict[Tuple[str, str], List[int]]: The indices of the searches of each (collection, filter)
+        """
+        groups: Dict[Tuple[str, str], List[int]] = {}
+        for i, (collection_name, _, _, filter) in enumerate(searches):
+            key = (collection_name, filter if filter is not None else self.org_filter())
+            groups.setdefault(key, []).append(i)
+
+        return groups
+
+    def search_many(
+        self, searches: List[Tuple[str, List[float], int, Optional[str]]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Run many searches, grouping those over the same collection and filter into a single
+        multi-vector search call.
+
+        Args:
+            searches: (collection name, query vector, k, filter) tuples. A filter of None scopes
+                the search to this vector db's org.
+
+        Returns:
+            List[Dict[str, Any]]: For each search, in order, the same {id: {similarity, metadata}}
+                mapping the matching get_top_k_* method returns
+        """
+        results: List[Dict[str, Any]] = [{} for _ in searches]
+        for (collection_name, filter), indices in self.group_searches(searches).items():
+            limit = max(searches[i][2] for i in indices)
+            hits = self.__search(
+                collection_name, [searches[i][1] for i in indices], limit, filter
+            )
+
+            for i, query_hits in zip(indices, hits):
+                results[i] = self.hits_to_results(
+                    collection_name, query_hits[: searches[i][2]]
+                )
+
+        return results
+
+    def iter_code_pages(
+        self, filename_filter: Optional[str] = None
+    ) -> Iterator[CodePage]:
+        """
+        Stream all code pages of this org from the vector db, optionally only those whose
+        primary key contains filename_filter.
         """
-        # Get all primary keys from the collection
         output_fields = [PRIMARY_KEY_FIELD, "content", "org_id", "page_type", "sha"]
-        batch_size = 100
-        offset = 0
-        all_results = []
-        expr = f"page_type == '{CodePageType.CODE.value}' and org_id == '{str(self.user_id)}'"
+        expr = f"{self.org_filter()} and page_type == '{CodePageType.CODE.value}'"
         if filename_filter is not None:
             expr += f' and {PRIMARY_KEY_FIELD} like "%{filename_filter}%"'
 
-        while True:
-            results = self.client.query(
-                collection_name=CODE,
-                output_fields=output_fields,
-                limit=batch_size,
-                offset=offset,
-                filter=expr,
+        for code in self.iter_rows(CODE, expr, output_fields):
+            yield CodePage(**code)
+
+    def get_code_pages(self, filename_filter: Optional[str] = None) -> List[CodePage]:
+        """
+        Get all code pages from the vector db
+        """
+        return list(self.iter_code_pages(filename_filter))
+
+    def __snapshot_part_vectors(
+        self, collection_name: str, rows: List[Dict[str, Any]], storage: VectorStorage
+    ) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """
+        Take the stored vectors out of exported rows, and get their full-precision vectors from
+        the companion collection if the collection reranks and all of them are there.
+        """
+        vectors = vectors_to_array([row.pop("vector") for row in rows], storage.mode)
+        if not storage.rerank:
+            return vectors, None
+
+        keys = [row[PRIMARY_KEY_FIELD] for row in rows]
+        full_vectors = {
+            row[PRIMARY_KEY_FIELD]: row["vector"]
+            for row in self.client.get(
+                self.full_precision_collection(collection_name),
+                ids=keys,
+                output_fields=[PRIMARY_KEY_FIELD, "vector"],
+            )
+        }
+        if len(full_vectors) < len(keys):
+            logging.warning(
+                f"{len(keys) - len(full_vectors)} of {len(keys)} rows of {collection_name} have no full-precision vector, exporting stored vectors only"
+            )
+            return vectors, None
+
+        return vectors, np.asarray([full_vectors[key] for key in keys], dtype=np.float32)
+
+    def __export_part(
+        self,
+        path: str,
+        collection_name: str,
+        index: int,
+        rows: List[Dict[str, Any]],
+        fields: List[str],
+    ) -> Dict[str, Any]:
+        """
+        Write a part of a collection's snapshot, see export_snapshot.
+        """
+        storage = self.vector_storage(collection_name)
+        vectors, full_vectors = self.__snapshot_part_vectors(
+            collection_name, rows, storage
+        )
+
+        file = f"{collection_name}-{index:05d}.npz"
+        write_snapshot_part(os.path.join(path, file), rows, fields, vectors, full_vectors)
+        return {"file": file, "rows": len(rows)}
+
+    def export_snapshot(
+        self, path: str, collections: Optional[List[str]] = None
+    ) -> Dict[str, int]:
+        """
+        Write every row of this org to a snapshot directory, to be restored with import_snapshot
+        without embedding anything again. Each collection is written as compressed NPZ parts of
+        SNAPSHOT_PART_ROWS rows holding the stored vectors, the full-precision vectors if the
+        collection reranks, and the scalar fields column by column. manifest.json, written last,
+        lists the parts and how the vectors were stored.
+
+        Args:
+            path: The directory to write the snapshot to
+            collections: The collections to export. Defaults to SNAPSHOT_COLLECTIONS.
+
+        Returns:
+            Dict[str, int]: The number of rows exported from each collection
+        """
+        os.makedirs(path, exist_ok=True)
+        manifest = {
+            "version": SNAPSHOT_VERSION,
+            "org_id": str(self.user_id),
+            "embedding_model": self.embedding_model_name,
+            "dimension": self.dimension,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "collections": {},
+        }
+
+        counts = {}
+        for collection_name in collections or SNAPSHOT_COLLECTIONS:
+            storage = self.vector_storage(collection_name)
+            field_names = [
+                field["name"]
+                for field in self.client.describe_collection(collection_name)["fields"]
+            ]
+            scalar_fields = [name for name in field_names if name != "vector"]
+
+            parts, rows = [], []
+            for row in self.iter_rows(collection_name, self.org_filter(), field_names):
+                rows.append(row)
+                if len(rows) < SNAPSHOT_PART_ROWS:
+                    continue
+
+                parts.append(
+                    self.__export_part(
+                        path, collection_name, len(parts), rows, scalar_fields
+                    )
+                )
+                rows = []
+            if rows:
+                parts.append(
+                    self.__export_part(
+                        path, collection_name, len(parts), rows, scalar_fields
+                    )
+                )
+
+            counts[collection_name] = sum(part["rows"] for part in parts)
+            logging.info(
+                f"Exported {counts[collection_name]} rows of {collection_name} to {path}"
             )
 
-            all_results.extend(results)
-            offset += batch_size
+            manifest["collections"][collection_name] = {
+                "rows": counts[collection_name],
+                "storage": storage.model_dump(),
+                "fields": scalar_fields,
+                "parts": [part["file"] for part in parts],
+            }
+
+        with open(os.path.join(path, MANIFEST_FILE), "w", encoding="utf8") as fp:
+            json.dump(manifest, fp, indent=2)
+
+        return counts
+
+    def __snapshot_vectors(
+        self,
+        collection_name: str,
+        vectors: np.ndarray,
+        full_vectors: Optional[np.ndarray],
+        snapshot_storage: VectorStorage,
+    ) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """
+        Convert the vectors of a snapshot part into the form the collection stores them in, and
+        get the full-precision vectors for its companion collection if it reranks.
+
+        Returns:
+            Tuple[np.ndarray, Optional[np.ndarray]]: The vectors to store, and the full-precision
+                vectors if the collection reranks and the snapshot has them
+        """
+        storage = self.vector_storage(collection_name)
+        is_full_precision = (
+            snapshot_storage.mode == VECTOR_STORAGE_FLOAT32
+            and snapshot_storage.dimension is None
+        )
+        if full_vectors is None and is_full_precision:
+            full_vectors = vectors
+
+        if snapshot_storage != storage:
+            if full_vectors is not None:
+                vectors = to_stored_vectors(full_vectors, storage)
+            elif (storage.dimension or self.dimension) <= vectors.shape[1]:
+                logging.warning(
+                    f"Converting {snapshot_storage.mode} vectors of dimension {vectors.shape[1]} from the snapshot of {collection_name} without their full-precision vectors"
+                )
+                vectors = to_stored_vectors(vectors.astype(np.float32), storage)
+            else:
+                raise ValueError(
+                    f"{collection_name} stores vectors of dimension {storage.dimension or self.dimension}, but its snapshot only has {vectors.shape[1]}"
+                )
+
+        return vectors, full_vectors if storage.rerank else None
+
+    def import_snapshot(
+        self, path: str, collections: Optional[List[str]] = None
+    ) -> Dict[str, int]:
+        """
+        Restore a snapshot written by export_snapshot into this org, without embedding anything.
+        Rows are inserted SNAPSHOT_INSERT_BATCH_SIZE at a time by SNAPSHOT_IMPORT_WORKERS threads,
+        or upserted if the org already has rows in the collection. Vectors are converted if the
+        collection stores them differently than the snapshot, and the lexical code index is
+        rebuilt from the restored code chunks.
+
+        Args:
+            path: The snapshot directory
+            collections: The collections to restore. Defaults to all those in the snapshot.
+
+        Returns:
+            Dict[str, int]: The number of rows restored into each collection
+        """
+        with open(os.path.join(path, MANIFEST_FILE), "r", encoding="utf8") as fp:
+            manifest = json.load(fp)
+
+        if manifest["version"] != SNAPSHOT_VERSION:
+            raise ValueError(
+                f"Snapshot version {manifest['version']} is not supported, expected {SNAPSHOT_VERSION}"
+            )
+        if (manifest["embedding_model"], manifest["dimension"]) != (
+            self.embedding_model_name,
+            self.dimension,
+        ):
+            raise ValueError(
+                f"Snapshot vectors come from {manifest['embedding_model']} ({manifest['dimension']}), not {self.embedding_model_name} ({self.dimension})"
+            )
+        if manifest["org_id"] != str(self.user_id):
+            logging.warning(
+                f"Restoring the snapshot of org {manifest['org_id']} into org {self.user_id}"
+            )
+
+        counts = {}
+        for collection_name, snapshot in manifest["collections"].items():
+            if collections is not None and collection_name not in collections:
+                continue
+
+            snapshot_storage = VectorStorage(**snapshot["storage"])
+            missing = self.missing_fields(collection_name)
+            has_rows = bool(
+                self.client.query(
+                    collection_name,
+                    filter=self.org_filter(),
+                    output_fields=[PRIMARY_KEY_FIELD],
+                    limit=1,
+                )
+            )
+            write = self.client.upsert if has_rows else self.client.insert
+            lexical_index = (
+                get_lexical_index(self.user_id) if collection_name == CODE else None
+            )
+
+            counts[collection_name] = 0
+            with ThreadPoolExecutor(max_workers=SNAPSHOT_IMPORT_WORKERS) as executor:
+                for part in snapshot["parts"]:
+                    rows, vectors, full_vectors = read_snapshot_part(
+                        os.path.join(path, part)
+                    )
+                    vectors, full_vectors = self.__snapshot_vectors(
+                        collection_name, vectors, full_vectors, snapshot_storage
+                    )
+                    for row, vector in zip(rows, to_vector_rows(vectors)):
+                        row["vector"] = vector
+                        row["org_id"] = str(self.user_id)
+                        for field in missing:
+                            row.pop(field, None)
+
+                    # Parts are written one at a time, so at most one is held in memory
+                    batches = [
+                        rows[start : start + SNAPSHOT_INSERT_BATCH_SIZE]
+                        for start in range(0, len(rows), SNAPSHOT_INSERT_BATCH_SIZE)
+                    ]
+                    list(
+                        executor.map(
+                            lambda batch: write(collection_name, data=batch), batches
+                        )
+                    )
+
+                    if full_vectors is not None:
+                        self.client.upsert(
+                            self.full_precision_collection(collection_name),
+                            data=[
+                                {
+                                    PRIMARY_KEY_FIELD: row[PRIMARY_KEY_FIELD],
+                                    "vector": vector,
+                                }
+                                for row, vector in zip(rows, full_vectors.tolist())
+                            ],
+                        )
+                    if lexical_index is not None:
+                        lexical_index.update(
+                            {row[PRIMARY_KEY_FIELD]: row["content"] for row in rows}
+                        )
+
+                    counts[collection_name] += len(rows)
+                    logging.info(
+                        f"Restored {counts[collection_name]} of {snapshot['rows']} rows of {collection_name}"
+                    )
+
+            self.client.flush(collection_name)
+            if lexical_index is not None:
+                lexical_index.save()
+
+        return counts
+
+
+class AsyncVectorDB:
+    """
+    Async counterpart of VectorDB's search path, for use on an event loop. Queries are embedded
+    with the providers' async clients and searched with the async Milvus client, so lookups for
+    one or many requests can be in flight at once. Collection setup, writes and the conversion of
+    hits are left to the wrapped VectorDB.
+    """
+
+    def __init__(self, vector_db: VectorDB):
+        """
+        Args:
+            vector_db: The vector db of the org to search
+        """
+        self.vector_db = vector_db
+        self.user_id = vector_db.user_id
+        self.model = vector_db.model
+
+    @property
+    def client(self) -> Any:
+        """
+        The async vector client of the running event loop.
+        """
+        return get_async_vector_client(self.vector_db.backend)
+
+    async def ensure_collection(self, collection_name: str):
+        """
+        Create and load a collection the first time any vector db in this process uses it. Creating
+        goes through the blocking client, so it happens in a worker thread.
+        """
+        if (self.vector_db.backend, collection_name) not in _loaded_collections:
+            await asyncio.to_thread(self.vector_db.ensure_collection, collection_name)
+
+    async def embed_query(self, query: str) -> List[float]:
+        """
+        Embed a search query, reusing the embedding if the same query was embedded recently.
+        """
+        return (await self.model.aencode_queries([query]))[0]
+
+    async def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """
+        Embed several search queries in one call, skipping those embedded recently.
+        """
+        return await self.model.aencode_queries(queries)
+
+    async def __search(
+        self,
+        collection_name: str,
+        query_vectors: List[List[float]],
+        k: int,
+        filter: str,
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Search a collection for several query vectors in one round trip, reranking the candidates
+        if the collection does.
+
+        Returns:
+            List[List[Dict[str, Any]]]: The raw hits for each query vector, in order
+        """
+        await self.ensure_collection(collection_name)
+        hits = await self.client.search(
+            **self.vector_db.search_request(collection_name, query_vectors, k, filter)
+        )
+
+        full_vectors = {}
+        if self.vector_db.vector_storage(collection_name).rerank:
+            full_vectors = await asyncio.to_thread(
+                self.vector_db.get_full_vectors, collection_name, hits
+            )
+
+        return self.vector_db.rerank_search_hits(
+            collection_name, query_vectors, hits, k, full_vectors
+        )
+
+    async def get_top_k_issues(
+        self, k: int, query_vector: List[float]
+    ) -> Dict[str, Any]:
+        """
+        Get top k issues matching the org_id of this vector db instance
+        """
+        hits = await self.__search(ISSUE, [query_vector], k, self.vector_db.org_filter())
+        return self.vector_db.hits_to_results(ISSUE, hits[0])
+
+    async def get_top_k_documentation(
+        self, k: int, query_vector: List[float]
+    ) -> Dict[str, Any]:
+        """
+        Get top k documentation pages
+        """
+        hits = await self.__search(
+            DOCUMENTATION, [query_vector], k, self.vector_db.org_filter()
+        )
+        return self.vector_db.hits_to_results(DOCUMENTATION, hits[0])
+
+    async def get_top_k_code(self, k: int, query_vector: List[float]) -> Dict[str, Any]:
+        """
+        Get top k code files
+        """
+        hits = await self.__search(CODE, [query_vector], k, self.vector_db.org_filter())
+        return self.vector_db.hits_to_results(CODE, hits[0])
+
+    async def get_code_chunks(self, keys: List[str]) -> Dict[str, Any]:
+        """
+        Get code chunks of this org by primary key, see VectorDB.get_code_chunks.
+        """
+        if not keys:
+            return {}
+
+        await self.ensure_collection(CODE)
+        rows = await self.client.get(
+            CODE,
+            ids=keys,
+            output_fields=[PRIMARY_KEY_FIELD, *self.vector_db.output_fields(CODE)],
+        )
+        return self.vector_db.code_rows_to_results(rows)
+
+    async def search_many(
+        self, searches: List[Tuple[str, List[float], int, Optional[str]]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Run many searches, see VectorDB.search_many. The search of each collection and filter is
+        made concurrently.
+        """
+        groups = list(self.vector_db.group_searches(searches).items())
+        group_hits = await asyncio.gather(
+            *(
+                self.__search(
+                    collection_name,
+                    [searches[i][1] for i in indices],
+                    max(searches[i][2] for i in indices),
+                    filter,
+                )
+                for (collection_name, filter), indices in groups
+            )
+        )
 
-            if len(results) < batch_size:
-                break
+        results: List[Dict[str, Any]] = [{} for _ in searches]
+        for ((collection_name, _), indices), hits in zip(groups, group_hits):
+            for i, query_hits in zip(indices, hits):
+                results[i] = self.vector_db.hits_to_results(
+                    collection_name, query_hits[: searches[i][2]]
+                )
 
-        return [CodePage(**code) for code in all_results]
+        return results
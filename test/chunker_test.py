@@ -0,0 +1,33 @@
+from src.storage.chunker import Chunker
+
+
+def test_chunker_cuts_python_at_definitions():
+    functions = [
+        f"def function_{i}(value):\n"
+        + "".join(f"    value = value + {j}\n" for j in range(12))
+        + "    return value\n\n\n"
+        for i in range(6)
+    ]
+    source = "import os\n\n\n" + "".join(functions)
+
+    chunks = Chunker(max_tokens=120, overlap_tokens=16).chunk(source, "module.py")
+
+    assert len(chunks) > 1
+    assert all(chunk.path == "module.py" for chunk in chunks)
+    assert all(chunk.text.lstrip().startswith("def ") for chunk in chunks[1:])
+    lines = source.splitlines(keepends=True)
+    for chunk in chunks:
+        assert "".join(lines[chunk.start_line - 1 : chunk.end_line]) == chunk.text
+    assert chunks[-1].end_line == len(lines)
+
+
+def test_chunker_cuts_issues_between_comments():
+    comments = [f"user{i}: " + "this still happens on my machine " * 8 for i in range(4)]
+
+    chunks = Chunker(max_tokens=120, overlap_tokens=16).chunk_issue(
+        "Crash on startup\n\nSteps to reproduce: run it", comments, "#42"
+    )
+
+    assert len(chunks) > 1
+    assert chunks[0].text.startswith("Crash on startup")
+    assert all(chunk.text.startswith("user") for chunk in chunks[1:])
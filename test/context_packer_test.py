@@ -0,0 +1,36 @@
+from src.integrations.kbs.context_packer import ContextPacker, ContextHit, relevant_window
+from src.storage.tokens import count_tokens
+
+FILLER = "\n".join(f"unrelated_line_{i} = compute_value({i})" for i in range(200))
+TARGET = "def retrieve_context(query):\n    return vector_store.search(query)"
+
+
+def test_relevant_window_keeps_query_terms():
+    text = f"{FILLER}\n{TARGET}\n{FILLER}"
+    window, tokens = relevant_window(text, {"retrieve", "context"}, 100)
+
+    assert TARGET in window
+    assert window.startswith("...") and window.endswith("...")
+    assert tokens <= 100
+    assert relevant_window(TARGET, {"retrieve"}, 100)[0] == TARGET
+
+    window, _ = relevant_window(FILLER, {"retrieve"}, 100)
+    assert window.startswith("unrelated_line_0 ") and window.endswith("...")
+    assert len(window) > 200
+
+
+def test_pack_respects_budget_and_drops_duplicates():
+    hits = [
+        ContextHit(tag="code_page_a", similarity=0.9, sections=[("content", TARGET)]),
+        ContextHit(tag="code_page_b", similarity=0.8, sections=[("content", TARGET)]),
+        ContextHit(tag="code_page_c", similarity=0.7, sections=[("content", FILLER)]),
+    ]
+    packed = ContextPacker(budget=200, max_hit_tokens=150).pack(
+        "retrieve_context", hits, "code_pages"
+    )
+
+    assert packed.startswith("<code_pages>") and packed.endswith("</code_pages>")
+    assert "<code_page_a_content>" in packed
+    assert "code_page_b" not in packed
+    assert "<code_page_c_content>unrelated_line_0" in packed
+    assert sum(count_tokens([packed])) < 200 + 50
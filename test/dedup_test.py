@@ -0,0 +1,66 @@
+from src.storage.dedup import DedupIndex, EXACT_DUPLICATE, NEAR_DUPLICATE
+import tempfile
+
+VENDORED = "\n".join(
+    f"def helper_{i}(value):\n    return transform(value, {i}) + offset_{i}" for i in range(50)
+)
+
+
+def test_dedup_links_exact_and_near_duplicates():
+    with tempfile.TemporaryDirectory() as index_dir:
+        index = DedupIndex(index_dir)
+        near = VENDORED.replace("offset_49", "offset_fifty")
+        canonical = index.deduplicate(
+            [
+                ("app/vendor/lib.py-0", VENDORED),
+                ("web/vendor/lib.py-0", VENDORED.replace("\n", "\n\n")),
+                ("docs/example.py-0", near),
+                ("app/main.py-0", "def main():\n    run_server(port=8080)"),
+            ],
+            source="org/repo",
+        )
+        index.save()
+
+        assert [key for key, _ in canonical] == ["app/vendor/lib.py-0", "app/main.py-0"]
+        assert index.links["web/vendor/lib.py-0"] == ("app/vendor/lib.py-0", EXACT_DUPLICATE)
+        assert index.links["docs/example.py-0"] == ("app/vendor/lib.py-0", NEAR_DUPLICATE)
+        assert index.report()["org/repo"]["dedup_ratio"] == 0.5
+
+        # Changing the canonical chunk promotes a duplicate ingested with it
+        reopened = DedupIndex(index_dir)
+        assert reopened.duplicates_of("app/vendor/lib.py-0") == [
+            "docs/example.py-0",
+            "web/vendor/lib.py-0",
+        ]
+        canonical = reopened.deduplicate(
+            [
+                ("web/vendor/lib.py-0", VENDORED),
+                ("app/vendor/lib.py-0", "# emptied"),
+            ]
+        )
+        assert {key for key, _ in canonical} == {
+            "web/vendor/lib.py-0",
+            "app/vendor/lib.py-0",
+        }
+        assert reopened.pop_orphans() == {"docs/example.py-0"}
+        assert reopened.duplicates_of("app/vendor/lib.py-0") == []
+
+
+def test_dedup_pops_orphans_by_source():
+    index = DedupIndex()
+    index.deduplicate([("lib.py-0", VENDORED)], source="org/lib")
+    index.deduplicate([("app/lib.py-0", VENDORED)], source="org/app")
+    index.deduplicate([("web/lib.py-0", VENDORED)], source="org/web")
+
+    index.remove(["lib.py-0"])
+    assert index.pop_orphans(source="org/app") == {"app/lib.py-0"}
+    assert index.pop_orphans() == {"web/lib.py-0"}
+
+
+def test_dedup_orphans_chunks_that_failed_to_be_stored():
+    index = DedupIndex()
+    index.deduplicate([("lib.py-0", VENDORED), ("copy.py-0", VENDORED)], source="org/lib")
+
+    index.orphan(["lib.py-0"])
+    assert "lib.py-0" not in index.signatures
+    assert index.pop_orphans(source="org/lib") == {"lib.py-0", "copy.py-0"}
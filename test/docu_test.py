@@ -20,7 +20,7 @@ def test_index_docu_page():
     vector_db.add_documentation_page(page)
 
     all_docs = vector_db.get_all_documentation([docu_pkey])
-    assert any(doc.primary_key == docu_pkey for doc in all_docs)
+    assert any(doc.primary_key.startswith(f"{docu_pkey}-") for doc in all_docs)
 
 
 async def test_index_docu_via_kb():
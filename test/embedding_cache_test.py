@@ -0,0 +1,63 @@
+from src.storage.embedding_cache import EmbeddingCache, QueryEmbeddingCache
+import tempfile
+import time
+import os
+
+MODEL = "voyage-code-3"
+DIMENSION = 4
+
+
+def test_embedding_cache_roundtrip():
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = EmbeddingCache(os.path.join(cache_dir, "embeddings.sqlite3"))
+        cache.put_many(MODEL, DIMENSION, None, ["def foo(): pass"], [[0.5] * 4])
+
+        assert cache.get_many(MODEL, DIMENSION, None, ["def foo(): pass"]) == [
+            [0.5] * 4
+        ]
+        # Same text under a different key component is a miss
+        assert cache.get_many(MODEL, DIMENSION, "query", ["def foo(): pass"]) == [None]
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+        # Survives reopening
+        reopened = EmbeddingCache(os.path.join(cache_dir, "embeddings.sqlite3"))
+        assert reopened.get_many(MODEL, DIMENSION, None, ["def foo(): pass"]) == [
+            [0.5] * 4
+        ]
+
+
+def test_embedding_cache_evicts_least_recently_used():
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = EmbeddingCache(
+            os.path.join(cache_dir, "embeddings.sqlite3"), max_entries=2
+        )
+        cache.put_many(MODEL, DIMENSION, None, ["a"], [[1.0] * 4])
+        cache.put_many(MODEL, DIMENSION, None, ["b"], [[2.0] * 4])
+        cache.get_many(MODEL, DIMENSION, None, ["a"])
+        cache.put_many(MODEL, DIMENSION, None, ["c"], [[3.0] * 4])
+
+        assert cache.get_many(MODEL, DIMENSION, None, ["a", "b", "c"]) == [
+            [1.0] * 4,
+            None,
+            [3.0] * 4,
+        ]
+
+
+def test_query_embedding_cache_normalizes_evicts_and_expires():
+    cache = QueryEmbeddingCache(max_entries=2, ttl_seconds=None)
+    cache.put(MODEL, "query", "how do I  add memory?", [1.0] * 4)
+
+    assert cache.get(MODEL, "query", " how do I add memory? ") == [1.0] * 4
+    assert cache.get(MODEL, None, "how do I add memory?") is None
+
+    cache.put(MODEL, "query", "b", [2.0] * 4)
+    cache.get(MODEL, "query", "how do I add memory?")
+    cache.put(MODEL, "query", "c", [3.0] * 4)
+    assert cache.get(MODEL, "query", "b") is None
+    assert cache.get(MODEL, "query", "how do I add memory?") == [1.0] * 4
+
+    expiring = QueryEmbeddingCache(ttl_seconds=0.01)
+    expiring.put(MODEL, "query", "a", [1.0] * 4)
+    time.sleep(0.02)
+    assert expiring.get(MODEL, "query", "a") is None
@@ -10,7 +10,7 @@ import os
 
 from src.integrations.kbs.github_kb import GithubKnowledgeBase, Repository
 from src.core.event.tool_actions.handle_issue import HandleIssue
-from src.storage.vector import VectorDB
+from src.storage.vector import VectorDB, PRIMARY_KEY_FIELD
 
 from include.constants import (
     DEFAULT_TEST_TRAIN_RATIO,
@@ -65,7 +65,7 @@ class Orchestrator:
                 issues = json.load(fp)
         else:
             logging.info(f"No cached closed issues found. Fetching from github...")
-            issues = self.github_kb.get_all_issues_json(
+            issues = self.github_kb.get_all_issues_graphql(
                 self.test_repo_name,
                 "closed",
                 ["bug", "help wanted", "question"] if self.enable_labels else None,
@@ -102,13 +102,10 @@ class Orchestrator:
         logging.info(
             f"Checking how many issues are already indexed in the vector db..."
         )
-        indexed_issues = self.vector_db.get_all_issues()
+        # Rows are keyed by chunk ({issue primary key}-{chunk index}), and only ids are needed here.
         indexed_issues_ids = set(
-            [
-                issue.primary_key
-                for issue in indexed_issues
-                if issue.org_id == self.org_id
-            ]
+            row[PRIMARY_KEY_FIELD].rsplit("-", 1)[0]
+            for row in self.vector_db.iter_issue_rows([PRIMARY_KEY_FIELD])
         )
         num_indexed_issues = len(indexed_issues_ids)
 
@@ -0,0 +1,34 @@
+from src.integrations.kbs.github_archive import read_archive_file, git_blob_sha
+from include.constants import MAX_INDEXED_FILE_BYTES
+import tarfile
+import io
+
+
+def test_read_archive_file_strips_root_and_filters(tmp_path):
+    files = {
+        "app/main.py": b"def main():\n    return 1\n",
+        "README.md": b"# Readme\n",
+        "logo.png": b"\x89PNG",
+        "data.bin": b"\x00\x01\x02",
+        "big.json": b"[" + b"0," * MAX_INDEXED_FILE_BYTES + b"0]",
+    }
+    archive_path = str(tmp_path / "repo.tar.gz")
+    with tarfile.open(archive_path, "w:gz") as archive:
+        root = tarfile.TarInfo("acme-repo-abc123")
+        root.type = tarfile.DIRTYPE
+        archive.addfile(root)
+        for path, content in files.items():
+            member = tarfile.TarInfo(f"acme-repo-abc123/{path}")
+            member.size = len(content)
+            archive.addfile(member, io.BytesIO(content))
+
+    pages = list(read_archive_file(archive_path, "org"))
+
+    assert [page.primary_key for page in pages] == ["app/main.py", "README.md"]
+    assert pages[1].content == "# Readme\n"
+    # Same as `git hash-object README.md`
+    assert pages[1].sha == git_blob_sha(b"# Readme\n")
+    assert git_blob_sha(b"") == "e69de29bb2d1d6434b8b29ae775ad8c2e48c5391"
+
+    only = list(read_archive_file(archive_path, "org", paths={"README.md"}))
+    assert [page.primary_key for page in only] == ["README.md"]
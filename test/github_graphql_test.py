@@ -0,0 +1,45 @@
+from src.integrations.kbs.github_graphql import graphql_issue_to_json
+
+
+def test_graphql_issue_to_json_matches_rest_shape():
+    node = {
+        "id": "I_kwDO",
+        "databaseId": 1234,
+        "number": 7,
+        "title": "Crash on startup",
+        "body": "Steps to reproduce",
+        "state": "CLOSED",
+        "createdAt": "2024-01-01T00:00:00Z",
+        "updatedAt": "2024-01-02T00:00:00Z",
+        "closedAt": "2024-01-03T00:00:00Z",
+        "url": "https://github.com/acme/widgets/issues/7",
+        "author": None,
+        "labels": {"nodes": [{"name": "bug", "color": "d73a4a", "description": None}]},
+    }
+    comment = {
+        "databaseId": 99,
+        "body": "Fixed in #8",
+        "createdAt": "2024-01-02T00:00:00Z",
+        "updatedAt": "2024-01-02T00:00:00Z",
+        "url": "https://github.com/acme/widgets/issues/7#issuecomment-99",
+        "author": {"login": "maintainer"},
+    }
+
+    issue = graphql_issue_to_json(node, "acme/widgets", [comment])
+
+    assert issue["id"] == 1234 and issue["number"] == 7
+    assert issue["state"] == "closed"
+    assert issue["closed_at"] == "2024-01-03T00:00:00Z"
+    assert issue["user"] == {"login": "ghost"}
+    assert [label["name"] for label in issue["labels"]] == ["bug"]
+    assert issue["comments"] == [
+        {
+            "id": 99,
+            "body": "Fixed in #8",
+            "user": {"login": "maintainer"},
+            "created_at": "2024-01-02T00:00:00Z",
+            "updated_at": "2024-01-02T00:00:00Z",
+            "html_url": "https://github.com/acme/widgets/issues/7#issuecomment-99",
+        }
+    ]
+    assert "comments" not in graphql_issue_to_json(node, "acme/widgets")
@@ -0,0 +1,66 @@
+from src.integrations.kbs.github_http import github_map, CachingSession, ResponseCache
+from include.constants import GITHUB_MAX_CONCURRENCY
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import threading
+import time
+
+
+def test_github_map_keeps_order_and_bounds_concurrency():
+    lock = threading.Lock()
+    in_flight, peak = 0, 0
+
+    def fetch(i: int) -> int:
+        nonlocal in_flight, peak
+        with lock:
+            in_flight += 1
+            peak = max(peak, in_flight)
+        time.sleep(0.01)
+        with lock:
+            in_flight -= 1
+        return i * i
+
+    assert list(github_map(fetch, range(64))) == [i * i for i in range(64)]
+    assert 1 < peak <= GITHUB_MAX_CONCURRENCY
+
+
+def test_caching_session_serves_304s_from_cache(tmp_path):
+    statuses = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.headers.get("If-None-Match") == '"v1"':
+                self.send_response(304)
+                self.send_header("ETag", '"v1"')
+                self.end_headers()
+                statuses.append(304)
+                return
+
+            body = b'[{"number": 1}]'
+            self.send_response(200)
+            self.send_header("ETag", '"v1"')
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            statuses.append(200)
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/issues"
+
+    try:
+        session = CachingSession(ResponseCache(str(tmp_path / "cache.sqlite3")))
+        first = session.get(url, params={"page": 1}, headers={"Authorization": "a"})
+        second = session.get(url, params={"page": 1}, headers={"Authorization": "a"})
+        other_token = session.get(url, params={"page": 1}, headers={"Authorization": "b"})
+    finally:
+        server.shutdown()
+
+    assert statuses == [200, 304, 200]
+    assert first.json() == second.json() == other_token.json() == [{"number": 1}]
+    assert second.status_code == 200
+    assert session.cache.stats()["hits"] == 1
+    assert session.cache.stats()["entries"] == 2
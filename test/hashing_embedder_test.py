@@ -0,0 +1,21 @@
+from src.storage.hashing_embedder import HashingEmbedder
+import numpy as np
+
+
+def test_hashing_embedder_is_deterministic_and_meaningful():
+    embedder = HashingEmbedder(256)
+    texts = [
+        "def parse_config(path): return load_yaml(path)",
+        "class ConfigParser: parses the yaml config",
+        "SELECT count(*) FROM orders WHERE total > 100",
+        "",
+    ]
+
+    vectors = embedder.encode(texts)
+    assert vectors.shape == (4, 256)
+    assert np.array_equal(vectors, HashingEmbedder(256).encode(texts))
+    assert np.allclose(np.linalg.norm(vectors[:3], axis=1), 1.0)
+    assert not vectors[3].any()
+
+    query = embedder.encode(["config parser"])[0]
+    assert query @ vectors[1] > query @ vectors[0] > query @ vectors[2]
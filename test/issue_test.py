@@ -26,7 +26,7 @@ async def test_issue_kb():
 
     # Test querying indexed tickets
     query = "multimodal query issues"
-    results = await issue_kb.query(query, limit=2)
+    results = await issue_kb.aquery(query, limit=2)
     logging.info("\nQuery results:")
     for result in results:
         logging.info(f"\nSource: {result.source}")
@@ -60,7 +60,7 @@ async def test_issue_kb():
 
     # Test broader query
     query = "configuration problems"
-    results = await issue_kb.query(query, limit=3)
+    results = await issue_kb.aquery(query, limit=3)
     logging.info("\nBroader query results:")
     for result in results:
         logging.info(f"\nSource: {result.source}")
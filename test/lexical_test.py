@@ -0,0 +1,38 @@
+from src.storage.lexical import LexicalIndex, tokenize_code, reciprocal_rank_fusion
+import tempfile
+
+DOCS = {
+    "memory/main.py-0": "def retrieve_context(query):\n    return vector_store.search(query)",
+    "memory/client.py-0": "class MemoryClient:\n    def add(self, messages): pass",
+    "memory/errors.py-0": "class RateLimitError(Exception):\n    pass",
+}
+
+
+def test_tokenize_code_splits_identifiers():
+    tokens = tokenize_code("raise RateLimitError in retrieve_context")
+    assert "ratelimiterror" in tokens
+    assert {"rate", "limit", "error", "retrieve", "context"} <= set(tokens)
+
+
+def test_lexical_index_search_update_and_persistence():
+    with tempfile.TemporaryDirectory() as index_dir:
+        index = LexicalIndex(index_dir)
+        index.update(DOCS)
+
+        assert index.search("why does retrieve_context fail", 2)[0][0] == "memory/main.py-0"
+        assert index.search("RateLimitError raised", 1)[0][0] == "memory/errors.py-0"
+
+        index.update({"memory/main.py-0": "def unrelated(): pass"})
+        index.remove(["memory/client.py-0"])
+        index.save()
+
+        reopened = LexicalIndex(index_dir)
+        assert len(reopened) == 2
+        assert reopened.search("retrieve_context", 5) == []
+        assert reopened.search("MemoryClient", 5) == []
+        assert reopened.search("rate limit", 5)[0][0] == "memory/errors.py-0"
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([["a", "b"], ["b", "c"]])
+    assert [key for key, _ in fused] == ["b", "a", "c"]
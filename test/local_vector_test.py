@@ -0,0 +1,78 @@
+from pymilvus import DataType, CollectionSchema, FieldSchema
+from src.storage.local_vector import LocalVectorClient
+import tempfile
+
+COLLECTION = "code"
+ORG_A = "802f083b-5d7e-4418-bebc-6052f5634f8e"
+ORG_B = "a54c3511-0424-4663-8309-1d7ba3953aa6"
+
+schema = CollectionSchema(
+    fields=[
+        FieldSchema(
+            name="primary_key", dtype=DataType.VARCHAR, is_primary=True, max_length=64
+        ),
+        FieldSchema(name="vector", dtype=DataType.FLOAT_VECTOR, dim=3),
+        FieldSchema(name="content", dtype=DataType.VARCHAR, max_length=64),
+        FieldSchema(name="org_id", dtype=DataType.VARCHAR, max_length=36),
+    ]
+)
+rows = [
+    {"primary_key": "a.py-0", "vector": [1.0, 0.0, 0.0], "content": "a", "org_id": ORG_A},
+    {"primary_key": "b.py-0", "vector": [0.0, 1.0, 0.0], "content": "b", "org_id": ORG_A},
+    {"primary_key": "c.py-0", "vector": [1.0, 0.1, 0.0], "content": "c", "org_id": ORG_B},
+]
+
+
+def test_local_search_respects_org_filter():
+    client = LocalVectorClient()
+    client.create_collection(COLLECTION, schema=schema)
+    client.upsert(COLLECTION, data=rows)
+
+    results = client.search(
+        COLLECTION,
+        data=[[1.0, 0.0, 0.0]],
+        limit=2,
+        output_fields=["content"],
+        filter=f"org_id == '{ORG_A}'",
+    )
+
+    assert [hit["id"] for hit in results[0]] == ["a.py-0", "b.py-0"]
+    assert abs(results[0][0]["distance"] - 1.0) < 1e-6
+    assert results[0][0]["entity"]["content"] == "a"
+
+
+def test_local_query_filters_and_persistence():
+    with tempfile.TemporaryDirectory() as path:
+        client = LocalVectorClient(path)
+        client.create_collection(COLLECTION, schema=schema)
+        client.upsert(COLLECTION, data=rows)
+        client.delete(COLLECTION, filter='primary_key like "b.py-%"')
+        client.flush()
+
+        reopened = LocalVectorClient(path)
+        keys = [
+            row["primary_key"]
+            for row in reopened.query(
+                COLLECTION, filter='primary_key in ["a.py-0", "b.py-0", "c.py-0"]'
+            )
+        ]
+        assert keys == ["a.py-0", "c.py-0"]
+
+        reopened.upsert(
+            COLLECTION,
+            data=[{**rows[0], "content": "changed"}],
+        )
+        assert reopened.get(COLLECTION, "a.py-0")[0]["content"] == "changed"
+
+
+def test_local_query_iterator_skips_rows_deleted_while_iterating():
+    client = LocalVectorClient()
+    client.create_collection(COLLECTION, schema=schema)
+    client.upsert(COLLECTION, data=rows)
+
+    iterator = client.query_iterator(COLLECTION, batch_size=1, output_fields=["content"])
+    assert [row["content"] for row in iterator.next()] == ["a"]
+
+    client.delete(COLLECTION, ids=["b.py-0"])
+    assert [row["content"] for row in iterator.next()] == ["c"]
+    assert iterator.next() == []
@@ -0,0 +1,37 @@
+from src.core.event.poll import IssueSyncCursor, get_issues_updated_since
+
+
+class FakeGithubKb:
+    def __init__(self, issues):
+        self.issues = issues
+        self.since = None
+
+    def get_all_issues_json(self, repo_name, state=None, since=None):
+        self.since = since
+        return [issue for issue in self.issues if issue["updated_at"] >= since]
+
+
+def test_issue_cursor_skips_handled_issues():
+    issues = [
+        {"number": 1, "updated_at": "2024-01-02T00:00:00Z"},
+        {"number": 2, "updated_at": "2024-01-02T00:00:00Z"},
+        {"number": 3, "updated_at": "2024-01-01T12:00:00Z"},
+    ]
+    cursor = IssueSyncCursor(since="2024-01-01T00:00:00Z")
+    cursor.advance(issues)
+    assert cursor.since == "2024-01-02T00:00:00Z" and cursor.seen == [1, 2]
+
+    github_kb = FakeGithubKb(
+        issues
+        + [
+            {"number": 2, "updated_at": "2024-01-03T00:00:00Z"},
+            {"number": 4, "updated_at": "2024-01-02T00:00:00Z"},
+        ]
+    )
+    updated = get_issues_updated_since("repo", github_kb, cursor)
+
+    assert github_kb.since == "2024-01-02T00:00:00Z"
+    assert [(issue["number"], issue["updated_at"][:10]) for issue in updated] == [
+        (2, "2024-01-03"),
+        (4, "2024-01-02"),
+    ]
@@ -0,0 +1,83 @@
+from include.constants import CODE, LOCAL_BACKEND
+from src.model.code import CodePage, CodePageType
+from src.storage.lexical import get_lexical_index
+from src.storage.snapshot import (
+    write_snapshot_part,
+    read_snapshot_part,
+    vectors_to_array,
+)
+from src.storage.vector import VectorDB, VectorStorage, use_isolated_local_backend
+from uuid import UUID
+import numpy as np
+
+ORG_A = UUID("802f083b-5d7e-4418-bebc-6052f5634f8e")
+ORG_B = UUID("a54c3511-0424-4663-8309-1d7ba3953aa6")
+
+
+def test_snapshot_part_roundtrip(tmp_path):
+    rows = [
+        {"primary_key": "a-0", "description": "héllo", "comments": ["x", "y"]},
+        {"primary_key": "b-0", "description": "", "comments": []},
+    ]
+    vectors = vectors_to_array([b"\x01\xff", [3, -4]], "int8")
+    assert vectors.tolist() == [[1, -1], [3, -4]]
+
+    file = str(tmp_path / "issue-00000.npz")
+    write_snapshot_part(file, rows, ["primary_key", "description", "comments"], vectors)
+
+    read_rows, read_vectors, full_vectors = read_snapshot_part(file)
+    assert read_rows == rows
+    assert read_vectors.dtype == np.int8
+    assert np.array_equal(read_vectors, vectors)
+    assert full_vectors is None
+
+
+def test_snapshot_export_import_roundtrip(tmp_path, monkeypatch):
+    monkeypatch.setenv("DEBUG_MODE", "true")
+    monkeypatch.setattr("src.storage.dedup.DEDUP_INDEX_DIR", str(tmp_path / "dedup"))
+    monkeypatch.setattr("src.storage.lexical.LEXICAL_INDEX_DIR", str(tmp_path / "lexical"))
+
+    def count_rows(vector_db):
+        return len(
+            vector_db.client.query(
+                CODE, filter=vector_db.org_filter(), output_fields=["org_id"]
+            )
+        )
+
+    use_isolated_local_backend()
+    source = VectorDB(ORG_A, backend=LOCAL_BACKEND)
+    source.ensure_collection(CODE, VectorStorage())
+    source.add_code_files(
+        [
+            CodePage(
+                primary_key=f"src/handler_{i}.py",
+                content=f"def handle_{i}(request):\n    return respond(request, status={200 + i})\n",
+                org_id=str(ORG_A),
+                page_type=CodePageType.CODE,
+                sha=str(i),
+            )
+            for i in range(5)
+        ]
+    )
+    assert source.export_snapshot(str(tmp_path / "snapshot"), [CODE]) == {CODE: 5}
+
+    # Restored into another org, in a fresh store whose collection keeps int8 vectors and reranks
+    use_isolated_local_backend()
+    target = VectorDB(ORG_B, backend=LOCAL_BACKEND)
+    target.ensure_collection(CODE, VectorStorage(mode="int8", rerank=True))
+    assert target.import_snapshot(str(tmp_path / "snapshot")) == {CODE: 5}
+    assert count_rows(target) == 5
+    # The snapshot's float32 vectors are the full-precision ones to rerank against
+    full_precision = target.client.query(
+        target.full_precision_collection(CODE), filter="", output_fields=["primary_key"]
+    )
+    assert len(full_precision) == 5
+
+    # Restoring again upserts over the existing rows rather than duplicating them
+    assert target.import_snapshot(str(tmp_path / "snapshot")) == {CODE: 5}
+    assert count_rows(target) == 5
+
+    results = target.get_top_k_code(3, target.embed_query("handle_2 request status"))
+    assert len(results) == 3
+    assert all(str(ORG_B) in result["metadata"] for result in results.values())
+    assert get_lexical_index(ORG_B).search("handle_2", 1)[0][0] == "src/handler_2.py-0"
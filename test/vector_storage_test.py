@@ -0,0 +1,30 @@
+from src.storage.vector import VectorStorage, to_stored_vectors, rerank_hits
+import numpy as np
+
+
+def test_to_stored_vectors_truncates_and_quantizes():
+    vectors = np.random.default_rng(0).standard_normal((4, 64)).astype(np.float32)
+
+    stored = to_stored_vectors(vectors, VectorStorage(mode="int8", dimension=16))
+    assert stored.dtype == np.int8
+    assert stored.shape == (4, 16)
+    assert np.abs(stored).max() == 127
+
+    truncated = to_stored_vectors(vectors, VectorStorage(dimension=16))
+    assert np.allclose(np.linalg.norm(truncated, axis=1), 1.0)
+
+    assert to_stored_vectors(vectors, VectorStorage(mode="float16")).dtype == np.float16
+
+
+def test_rerank_hits_rescores_with_full_vectors():
+    hits = [{"id": "a", "distance": 0.9}, {"id": "b", "distance": 0.8}]
+    full_vectors = {"a": [0.0, 1.0], "b": [1.0, 0.0]}
+
+    reranked = rerank_hits(hits, [1.0, 0.0], full_vectors, limit=1)
+    assert reranked == [{"id": "b", "distance": 1.0}]
+
+
+def test_rerank_hits_leaves_the_query_untouched():
+    queries = np.array([[3.0, 4.0]], dtype=np.float32)
+    rerank_hits([{"id": "a", "distance": 0.5}], queries[0], {"a": [1.0, 0.0]}, limit=1)
+    assert queries.tolist() == [[3.0, 4.0]]